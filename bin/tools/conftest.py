@@ -0,0 +1,7 @@
+"""
+Configuration of the pytest checks in this directory (test_*.py). They can be run via the following command
+	python3 -m pytest -q path/to/this/directory
+"""
+
+# perceptron_test.py is a tool (its test_weights() and test_train_splitter() aren't pytest checks)
+collect_ignore = ["perceptron_test.py"]
@@ -13,6 +13,7 @@ import sys									# Used to read arguments
 import os									# Used to run external commands
 import multiprocessing as mp				# Used to parallelize workload
 from queue import Empty						# Used for Empty exception
+from noxim_cache import run_noxim			# Used to run noxim via cache of simulation results
 
 PIRs = [0.01] + [i/10 for i in range(1,11)]	# PIRs to test on
 SRC = 48
@@ -68,11 +69,8 @@ def worker_gen(ID, jobs, root_directory):
 				log_file_path_baseline = working_directory + "/logs/" + str(pir) + "_baseline"
 				log_file_path_attack = working_directory + "/logs/" + str(pir) + "_attack"
 				
-				cmd_baseline = "./../noxim -topology MESH -dimx " + str(DIM_X) + " -dimy " + str(DIM_Y) + " -traffic table " + baseline_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml > " + log_file_path_baseline
-				cmd_attack = "./../noxim -topology MESH -dimx " + str(DIM_X) + " -dimy " + str(DIM_Y) + " -traffic table " + attack_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml > " + log_file_path_attack
-
-				os.system(cmd_baseline)
-				os.system(cmd_attack)
+				run_noxim(baseline_file_path, None, log_file_path_baseline, DIM_X, DIM_Y)	# Features are not required
+				run_noxim(attack_file_path, None, log_file_path_attack, DIM_X, DIM_Y)
 				#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
@@ -0,0 +1,173 @@
+"""
+This module implements the index based views of datasets used while training.
+A dataset is never copied to concatenate or split it. Instead, the samples stay in a single buffer (a list of rows or the columns of a feature store)
+and the stages work on arrays of indices into it i.e.
+	1.) Concatenation of datasets is a list of references to the rows of both the datasets
+	2.) Stratified splitting into testing and training is a permutation of indices
+Hence the memory needed while training stays close to a single copy of the samples.
+Stores can also be sampled down to a fixed number of samples of every class in a single streaming pass (refer to reservoir_sample()).
+Identical samples can be replaced by a single sample with the number of occurrences as weight (refer to deduplicate() and split_counts()).
+The module can be imported by tools in this directory via the following line
+	import feature_dataset
+"""
+
+import numpy as np		# Used to generate permutations
+import feature_store	# Used to read and write sampled stores
+
+# Samples are read from the stores in chunks of these many rows while sampling
+RESERVOIR_CHUNK_ROWS = 1 << 20
+
+
+
+"""
+Concatenates datasets without copying their rows
+Args:
+	datasets	: List of lists of rows
+Rets:
+	List of rows of all the datasets in order. The rows are shared with the input datasets
+"""
+def concatenate(datasets):
+	merged = []
+	for dataset in datasets:
+		merged += dataset	# Only references to the rows are added
+	return merged
+
+
+
+"""
+Splits a dataset into testing and training after shuffling it. The split is stratified i.e. every class is split in the same ratio.
+Args:
+	labels			: Array of annotation of every sample
+	training_ratio	: Fraction of samples of every class used for training
+Rets:
+	test_indices	: Array of shuffled indices of testing samples
+	train_indices	: Array of shuffled indices of training samples
+"""
+def split_indices(labels, training_ratio):
+	labels = np.asarray(labels)
+	test_indices = [np.empty(0, dtype = np.intp)]
+	train_indices = [np.empty(0, dtype = np.intp)]
+	for label in np.unique(labels):
+		indices = np.random.permutation(np.flatnonzero(labels == label))
+		split_index = int(training_ratio * len(indices))
+		train_indices.append(indices[:split_index])
+		test_indices.append(indices[split_index:])
+
+	# Mix the classes
+	return np.random.permutation(np.concatenate(test_indices)), np.random.permutation(np.concatenate(train_indices))
+
+
+
+"""
+Selects rows of a dataset without copying them
+Args:
+	rows	: List of rows
+	indices	: Array of indices of the required rows
+Rets:
+	List of rows in the order of indices. The rows are shared with the input
+"""
+def take_rows(rows, indices):
+	return [rows[idx] for idx in indices.tolist()]
+
+
+
+"""
+Replaces identical samples (same features and annotation) by a single sample. The cycle of the first occurrence is kept.
+Args:
+	cycles, features, labels	: Columns of samples
+Rets:
+	cycles, features, labels	: Columns of unique samples
+	counts						: Array of number of occurrences of every unique sample
+"""
+def deduplicate(cycles, features, labels):
+	data = np.empty((len(labels), features.shape[1] + 1), dtype = np.float64)
+	data[:, : -1] = features
+	data[:, -1] = labels
+	keys = data.view(np.dtype((np.void, data.dtype.itemsize * data.shape[1]))).ravel()	# Every row is compared as a single key of raw bytes
+	unique_keys, first_indices, counts = np.unique(keys, return_index = True, return_counts = True)
+	order = np.argsort(first_indices)	# Keep the order of first occurrences
+	first_indices = first_indices[order]
+	return cycles[first_indices], features[first_indices], labels[first_indices], counts[order]
+
+
+
+"""
+Splits weighted samples into testing and training after shuffling them. The occurrences of a sample are split between the two i.e.
+the split has the same distribution as split_indices() on the samples repeated as many times as their count
+(the training occurrences of every class are drawn without replacement via a multivariate hypergeometric distribution).
+Args:
+	labels			: Array of annotation of every unique sample
+	counts			: Array of number of occurrences of every unique sample
+	training_ratio	: Fraction of occurrences of every class used for training
+Rets:
+	test_indices	: Array of shuffled indices of unique samples with at least one testing occurrence
+	test_counts		: Array of number of testing occurrences of the samples in test_indices
+	train_indices	: Array of shuffled indices of unique samples with at least one training occurrence
+	train_counts	: Array of number of training occurrences of the samples in train_indices
+"""
+def split_counts(labels, counts, training_ratio):
+	labels = np.asarray(labels)
+	counts = np.asarray(counts, dtype = np.int64)
+	generator = np.random.default_rng()
+	train_counts = np.zeros(len(counts), dtype = np.int64)
+	for label in np.unique(labels):
+		indices = np.flatnonzero(labels == label)
+		split_index = int(training_ratio * counts[indices].sum())
+		train_counts[indices] = generator.multivariate_hypergeometric(counts[indices], split_index)
+	test_counts = counts - train_counts
+
+	# Mix the samples
+	test_indices = np.random.permutation(np.flatnonzero(test_counts))
+	train_indices = np.random.permutation(np.flatnonzero(train_counts))
+	return test_indices, test_counts[test_indices], train_indices, train_counts[train_indices]
+
+
+
+"""
+Samples at most class_size samples of every class (annotation) from the stores in a single streaming pass and writes them to a store.
+It's a weighted reservoir (Efraimidis and Spirakis) i.e. every sample gets the key log(u) / weight, where u is uniform in (0, 1), and
+the samples with the largest keys are kept. With equal weights, every subset of a class is equally likely to be kept.
+Only the reservoirs and a chunk of RESERVOIR_CHUNK_ROWS samples are held in memory.
+Args:
+	src_paths		: List of paths of source stores
+	dst_path		: Path of destination store. An existing store at the same path is overwritten
+	class_size		: Maximum number of samples of every class
+	sources			: List of source (e.g. benchmark) of every store. None if all the samples have the same weight
+	source_weights	: Dictionary of weight of a source. Sources which aren't present have weight 1 and sources with weight 0 are skipped.
+					  None if all the sources have weight 1
+Rets:
+	sampled	: Dictionary of number of samples kept for every class
+"""
+def reservoir_sample(src_paths, dst_path, class_size, sources = None, source_weights = None):
+	if(source_weights is None):
+		source_weights = {}
+	reservoirs = {}	# {label : (keys, source indices, cycles, features, labels)}
+	for src_idx, src_path in enumerate(src_paths):
+		weight = 1.0 if sources is None else source_weights.get(sources[src_idx], 1.0)
+		if(weight <= 0):
+			continue
+		for shard in feature_store.iter_shards(src_path):
+			for start in range(0, len(shard[0]), RESERVOIR_CHUNK_ROWS):
+				cycles, features, labels = (np.asarray(column[start : start + RESERVOIR_CHUNK_ROWS]) for column in shard)
+				keys = np.log(1.0 - np.random.random(len(labels))) / weight	# 1 - random is in (0, 1]
+				for label in np.unique(labels).tolist():
+					mask = labels == label
+					candidates = (keys[mask], np.full(np.count_nonzero(mask), src_idx), cycles[mask], features[mask], labels[mask])
+					if(label in reservoirs):
+						candidates = tuple(np.concatenate(columns) for columns in zip(reservoirs[label], candidates))
+					if(len(candidates[0]) > class_size):	# Keep the largest keys
+						keep = np.argpartition(candidates[0], len(candidates[0]) - class_size)[-class_size:]
+						candidates = tuple(column[keep] for column in candidates)
+					reservoirs[label] = candidates
+
+	# Write the samples of every source as a shard in random order
+	feature_store.create(dst_path, feature_store.intersect_parsed_features([feature_store.read_logical_manifest(src_path) for src_path in src_paths]))
+	if(len(reservoirs) == 0):
+		return {}
+	sampled = tuple(np.concatenate(columns) for columns in zip(*reservoirs.values()))
+	permutation = np.random.permutation(len(sampled[0]))
+	sampled = tuple(column[permutation] for column in sampled)
+	for src_idx in np.unique(sampled[1]).tolist():
+		mask = sampled[1] == src_idx
+		feature_store.append(dst_path, sampled[2][mask], sampled[3][mask], sampled[4][mask], None if sources is None else sources[src_idx])
+	return {label : len(reservoir[0]) for label, reservoir in reservoirs.items()}
@@ -0,0 +1,733 @@
+"""
+This module implements a vectorized parser for the feature files generated by noxim via the -features option.
+Every line of a feature file has the following format (refer to FeatureCollector.h::struct Feature::print()):
+	router_id, cycle, <PORT_FEATURE_COUNT features of port 0>, ..., <PORT_FEATURE_COUNT features of port DIRECTIONS - 1>
+The file is read in large chunks and converted into a single integer array of shape
+	(cycles, routers, DIRECTIONS, PORT_FEATURE_COUNT)
+The Rx/Tx pairing of connected ports and the buffer waiting time are then calculated as array operations.
+parse_features() returns exactly the same values as the line by line parser used by the server scripts,
+which is kept as parse_features_text() for reference.
+The parser accepts a projection i.e. the parsed features which are needed. Only the routers on the path (and the routers
+connected to them) and only the columns needed by the projected features are converted. As noxim writes all the cycles
+of a router together, the byte range of every required router is located by a binary search and other routers are
+never read. If the file is not sorted, lines of other routers are dropped after reading their router ID and are never tokenized.
+noxim can also write binary feature files (-features_format bin). These are fixed size little endian records after a header
+(refer to FeatureCollector.h) and are memory mapped instead of being parsed. open_binary_features() exposes such a file as
+a structured np.memmap.
+The module can be imported by tools in this directory via the following line
+	import feature_parser
+"""
+
+import os			# Used to get size of files
+import bisect		# Used to search for routers in binary feature files
+import numpy as np	# Used to parse and process features
+
+# Dimensions of grid. It's used to calculate index of router
+DIM_X = 8
+DIM_Y = 8
+
+# Definitions for directions
+DIRECTIONS 		= 6
+DIRECTION_NORTH = 0
+DIRECTION_EAST  = 1
+DIRECTION_SOUTH = 2
+DIRECTION_WEST  = 3
+DIRECTION_LOCAL = 4
+DIRECTION_PE	= 5
+
+# No. of features per port in feature file
+PORT_FEATURE_COUNT = 6
+PORT_FEATURE_OFFSET = 2 # The index (0 based) of first port feature
+
+# Definitions for indexes of various parameters
+ROUTER_ID		= 0
+CYCLE			= 1
+
+# Definitions for index of features of a port in feature file
+BUFFER_CAPACITY			= 0
+BUFFER_STATUS			= 1
+CYCLES_SINCE_LAST_FLIT	= 2
+STALLED_FLITS			= 3
+TRANSMITTED_FLITS		= 4
+CUMULATIVE_LATENCY		= 5
+
+# Index of parsed features (excluding cycle) as generated by parse_features()
+PARSED_FEATURE_COUNT			= 5
+PARSED_BUFFER_STATUS			= 0
+PARSED_CYCLES_SINCE_LAST_FLIT	= 1
+PARSED_STALLED_FLITS			= 2
+PARSED_TRANSMITTED_FLITS		= 3
+PARSED_BUFFER_WAITING_TIME		= 4
+
+# Port features needed to calculate every parsed feature. The format is
+# 	{parsed_feature : ([features of Rx port], [features of connected Tx port]), ...}
+PARSED_FEATURE_SOURCES = {
+	PARSED_BUFFER_STATUS			: ([BUFFER_STATUS], []),
+	PARSED_CYCLES_SINCE_LAST_FLIT	: ([CYCLES_SINCE_LAST_FLIT], []),
+	PARSED_STALLED_FLITS			: ([], [STALLED_FLITS]),
+	PARSED_TRANSMITTED_FLITS		: ([], [TRANSMITTED_FLITS]),
+	PARSED_BUFFER_WAITING_TIME		: ([], [TRANSMITTED_FLITS, CUMULATIVE_LATENCY])
+}
+
+# noxim writes the features sorted by router ID (FeatureCollector iterates an ordered map)
+# If True, only the byte ranges of required routers are read from feature files
+SORTED_FEATURE_FILES = True
+
+# Size of blocks read while searching for a router in a feature file
+SEARCH_BLOCK_SIZE = 1 << 12
+
+# Columns are converted by scanning their digits only if at most these many columns are required.
+# Otherwise np.fromstring tokenizes the whole line and the required columns are picked, as it's faster for many columns
+MAX_SCANNED_COLUMNS = 8
+
+# Maximum number of digits in a router ID
+ROUTER_ID_DIGITS = 6
+
+# ASCII codes used while scanning lines
+ASCII_NEWLINE	= ord("\n")
+ASCII_COMMA		= ord(",")
+ASCII_ZERO		= ord("0")
+ASCII_MINUS		= ord("-")
+
+# Formats of feature files i.e. values of -features_format option of noxim
+FEATURES_FORMAT_TEXT	= "text"
+FEATURES_FORMAT_BIN		= "bin"
+
+# Header of binary feature files. Refer to FeatureCollector.h
+BINARY_MAGIC		= b"NXFB"
+BINARY_VERSION		= 1
+BINARY_HEADER_DTYPE	= np.dtype([("magic", "S4"), ("version", "<i4"), ("dim_x", "<i4"), ("dim_y", "<i4"), ("virtual_channels", "<i4"), ("directions", "<i4"), ("port_feature_count", "<i4"), ("field_count", "<i4")])
+BINARY_FIELD_DTYPE	= np.dtype("<i4")
+
+# Size of chunks (in bytes) in which the feature file is read
+READ_CHUNK_SIZE = 1 << 26
+
+# Data type of the parsed features
+FEATURE_DTYPE = np.int32
+
+
+
+"""
+Generates the connected router and port pair. Refer to the server scripts for the definition of connected ports.
+Args: router_port	: The router and port for which the corresponding connected port has to calculated
+Rets: connected_router_port	: The router and port connected to router_port
+
+The format for both input and output is:
+((router_x, router_y), port)
+"""
+def get_connected_router_and_port(router_port):
+	other_router = list(router_port[0]) # Initialize other router
+	other_port = -1
+
+	# Handle case of local PE and local port
+	if(router_port[1] == DIRECTION_LOCAL):
+		other_port = DIRECTION_LOCAL
+	elif(router_port[1] == DIRECTION_PE):
+		other_port = DIRECTION_PE
+
+	# Calculate the connected router
+	elif(router_port[1] == DIRECTION_NORTH):
+		other_router[1] -= 1
+		other_port = DIRECTION_SOUTH
+	elif(router_port[1] == DIRECTION_SOUTH):
+		other_router[1] += 1
+		other_port = DIRECTION_NORTH
+	elif(router_port[1] == DIRECTION_EAST):
+		other_router[0] += 1
+		other_port = DIRECTION_WEST
+	elif(router_port[1] == DIRECTION_WEST):
+		other_router[0] -= 1
+		other_port = DIRECTION_EAST
+
+	return (tuple(other_router), other_port)
+
+
+
+"""
+Generates the router ID of every line in a block. Only the digits before the first comma of a line are scanned.
+Args:
+	buffer	: uint8 array of a block of complete lines
+	starts	: Index of the first byte of every line
+Rets:
+	Array of router IDs
+"""
+def scan_router_ids(buffer, starts):
+	router_ids = np.zeros(len(starts), dtype = FEATURE_DTYPE)
+	active = np.ones(len(starts), dtype = bool)	# Becomes False once a non digit character is seen
+	for offset in range(ROUTER_ID_DIGITS):
+		digits = buffer[np.minimum(starts + offset, len(buffer) - 1)] - ASCII_ZERO	# Characters below '0' wrap around to large values
+		active &= (digits <= 9)
+		router_ids = np.where(active, router_ids * 10 + digits, router_ids)
+	return router_ids
+
+
+
+"""
+Drops the lines of routers which are not required from a block. The dropped lines are not tokenized.
+Args:
+	block		: Bytes of complete lines
+	router_ids	: Array of required router IDs
+Rets:
+	Bytes of the required lines
+"""
+def select_lines(block, router_ids):
+	buffer = np.frombuffer(block, dtype = np.uint8)
+	ends = np.flatnonzero(buffer == ASCII_NEWLINE) + 1	# Index after the end of every line
+	starts = np.concatenate(([0], ends[:-1]))
+	keep = np.isin(scan_router_ids(buffer, starts), router_ids)
+
+	# noxim writes all the cycles of a router together, hence the required lines form a few contiguous runs
+	changes = np.flatnonzero(keep[1:] != keep[:-1]) + 1
+	run_starts = np.concatenate(([0], changes)).tolist()
+	run_ends = np.concatenate((changes, [len(keep)])).tolist()
+	return b"".join(block[starts[first] : ends[last - 1]] for first, last in zip(run_starts, run_ends) if keep[first])
+
+
+
+"""
+Converts the required columns of a block of lines to integers. Other columns are not converted.
+Args:
+	block	: Bytes of complete lines
+	columns	: List of index of required columns
+Rets:
+	data	: Array of shape (lines, len(columns))
+"""
+def convert_columns(block, columns):
+	buffer = np.frombuffer(block, dtype = np.uint8)
+	lines = np.count_nonzero(buffer == ASCII_NEWLINE)
+	separators = np.flatnonzero((buffer == ASCII_COMMA) | (buffer == ASCII_NEWLINE))	# Every field ends at a separator
+	assert(len(separators) % lines == 0)	# Every line must have same number of fields
+	separators = separators.reshape(lines, -1)
+	line_starts = np.concatenate(([0], separators[:-1, -1] + 1))
+
+	data = np.empty((lines, len(columns)), dtype = FEATURE_DTYPE)
+	for idx, column in enumerate(columns):
+		starts = line_starts if column == 0 else separators[:, column - 1] + 1
+		ends = separators[:, column]
+		values = np.zeros(lines, dtype = np.int64)
+		negative = np.zeros(lines, dtype = bool)	# Unset features are written as -1 by noxim
+		for offset in range(int((ends - starts).max())):	# Spaces are skipped while scanning the digits
+			positions = starts + offset
+			characters = buffer[np.minimum(positions, ends)]	# buffer[ends] is a separator i.e. not a digit
+			digits = characters - ASCII_ZERO
+			values = np.where((positions < ends) & (digits <= 9), values * 10 + digits, values)
+			negative |= (characters == ASCII_MINUS)
+		data[:, idx] = np.where(negative, -values, values)
+	return data
+
+
+
+"""
+Converts a block of complete lines into a 2D integer array
+Args:
+	block		: Bytes of complete lines
+	router_ids	: Array of required router IDs. None if all routers are required
+	columns		: List of index of required columns. None if all columns are required
+Rets:
+	data	: Array of shape (lines, columns). None if no line is required
+"""
+def convert_block(block, router_ids, columns):
+	if(router_ids is not None and block):
+		block = select_lines(block, router_ids)
+	if(not block):
+		return None
+	if(columns is not None and len(columns) <= MAX_SCANNED_COLUMNS):
+		return convert_columns(block, columns)
+	column_count = block[:block.find(b"\n")].count(b",") + 1	# Count the columns from the first line
+	data = np.fromstring(block.replace(b"\n", b","), dtype = FEATURE_DTYPE, sep = ",").reshape(-1, column_count)
+	return data if columns is None else data[:, columns]
+
+
+
+"""
+Generates the offset and router ID of the first line which starts at or after an offset in a feature file
+Args:
+	csv_in	: Feature file opened in binary mode
+	offset	: Offset to search from
+	size	: Size of the feature file
+Rets:
+	line_offset	: Offset of the line. size if there are no more lines
+	router_id	: Router ID of the line. -1 if there are no more lines
+"""
+def get_line_at(csv_in, offset, size):
+	line_offset = offset
+	if(offset > 0):	# Skip to the start of next line
+		csv_in.seek(offset - 1)
+		while True:
+			block = csv_in.read(SEARCH_BLOCK_SIZE)
+			if(not block):
+				return size, -1
+			newline = block.find(b"\n")
+			if(newline != -1):
+				line_offset += newline
+				break
+			line_offset += len(block)
+	if(line_offset >= size):
+		return size, -1
+	csv_in.seek(line_offset)
+	return line_offset, int(csv_in.read(SEARCH_BLOCK_SIZE).split(b",", 1)[0])
+
+
+
+"""
+Finds the byte ranges of the lines of required routers in a feature file sorted by router ID
+Args:
+	feature_file	: Name of file having feature data
+	router_ids		: List of required router IDs
+Rets:
+	ranges	: List of [start, end) byte ranges. Adjacent ranges are merged
+"""
+def find_router_ranges(feature_file, router_ids):
+	size = os.path.getsize(feature_file)
+	ranges = []
+	with open(feature_file, "rb") as csv_in:
+		# Binary search for the first line with router ID >= router_id
+		def lower_bound(router_id):
+			low, high = 0, size
+			while low < high:
+				middle = (low + high) // 2
+				line_offset, line_router_id = get_line_at(csv_in, middle, size)
+				if(line_router_id == -1 or line_router_id >= router_id):
+					high = middle
+				else:
+					low = middle + 1
+			return get_line_at(csv_in, low, size)[0]
+
+		for router_id in sorted(router_ids):
+			start, end = lower_bound(router_id), lower_bound(router_id + 1)
+			if(start == end):
+				continue
+			if(len(ranges) > 0 and ranges[-1][1] == start):
+				ranges[-1][1] = end
+			else:
+				ranges.append([start, end])
+	return ranges
+
+
+
+"""
+Reads a feature file in chunks and converts it into a 2D integer array
+Args:
+	feature_file	: Name of file having feature data
+	router_ids		: List of required router IDs. Lines of other routers are skipped. None if all routers are required
+	columns			: List of index of required columns. None if all columns are required
+Rets:
+	data	: Array of shape (lines, columns)
+"""
+def read_lines(feature_file, router_ids = None, columns = None):
+	ranges = [[0, None]]	# Byte ranges to read. None reads till the end of file
+	if(router_ids is not None):
+		if(SORTED_FEATURE_FILES and os.path.isfile(feature_file)):
+			ranges = find_router_ranges(feature_file, router_ids)
+			router_ids = None	# The ranges have lines of required routers only
+		else:
+			router_ids = np.asarray(router_ids, dtype = FEATURE_DTYPE)
+
+	chunks = []
+	with open(feature_file, "rb") as csv_in:
+		for start, end in ranges:
+			csv_in.seek(start)
+			left = end - start if end is not None else -1	# Bytes left to read in range
+			remainder = b""
+			while left != 0:
+				block = csv_in.read(READ_CHUNK_SIZE if left < 0 else min(READ_CHUNK_SIZE, left))
+				if(not block):
+					break
+				if(left > 0):
+					left -= len(block)
+				block = remainder + block
+				block_end = block.rfind(b"\n") + 1	# Only complete lines are parsed
+				remainder = block[block_end:]
+				chunk = convert_block(block[:block_end], router_ids, columns)
+				if(chunk is not None):
+					chunks.append(chunk)
+			if(remainder.strip()):	# Last line without a newline
+				chunk = convert_block(remainder + b"\n", router_ids, columns)
+				if(chunk is not None):
+					chunks.append(chunk)
+
+	if(len(chunks) == 0):
+		column_count = PORT_FEATURE_OFFSET + DIRECTIONS * PORT_FEATURE_COUNT if columns is None else len(columns)
+		return np.empty((0, column_count), dtype = FEATURE_DTYPE)
+	return np.concatenate(chunks)
+
+
+
+"""
+Parses the header of a binary feature file
+Args:
+	buffer	: First BINARY_HEADER_DTYPE.itemsize bytes of the file
+Rets:
+	header	: Dictionary with the fields of BINARY_HEADER_DTYPE
+"""
+def parse_binary_header(buffer):
+	header = np.frombuffer(buffer, dtype = BINARY_HEADER_DTYPE, count = 1)
+	assert(header["magic"][0] == BINARY_MAGIC)	# Not a binary feature file
+	header = {field : header[field][0].item() for field in BINARY_HEADER_DTYPE.names}
+	assert(header["version"] == BINARY_VERSION)
+	assert(header["directions"] == DIRECTIONS and header["port_feature_count"] == PORT_FEATURE_COUNT)
+	assert(header["field_count"] == PORT_FEATURE_OFFSET + DIRECTIONS * header["virtual_channels"] * PORT_FEATURE_COUNT)
+	return header
+
+
+
+"""
+Reads the header of a binary feature file
+Args:
+	feature_file	: Name of binary feature file
+Rets:
+	header	: Dictionary with the fields of BINARY_HEADER_DTYPE
+"""
+def read_binary_header(feature_file):
+	with open(feature_file, "rb") as bin_in:
+		buffer = bin_in.read(BINARY_HEADER_DTYPE.itemsize)
+	assert(len(buffer) == BINARY_HEADER_DTYPE.itemsize)	# Not a binary feature file
+	return parse_binary_header(buffer)
+
+
+
+"""
+Maps the columns of text format to the fields of the first virtual channel in a binary record
+Args:
+	columns				: List of index of columns (as in text format). None if all columns are required
+	virtual_channels	: No. of virtual channels in the binary file
+Rets:
+	fields_idx	: List of index of fields in a record
+"""
+def get_binary_fields(columns, virtual_channels):
+	if(columns is None):
+		columns = range(PORT_FEATURE_OFFSET + DIRECTIONS * PORT_FEATURE_COUNT)
+	fields_idx = []
+	for column in columns:
+		if(column < PORT_FEATURE_OFFSET):
+			fields_idx.append(column)
+		else:
+			port, feature = divmod(column - PORT_FEATURE_OFFSET, PORT_FEATURE_COUNT)
+			fields_idx.append(PORT_FEATURE_OFFSET + port * virtual_channels * PORT_FEATURE_COUNT + feature)
+	return fields_idx
+
+
+
+"""
+Opens a binary feature file as a structured array. Nothing is read till the records are accessed.
+Args:
+	feature_file	: Name of binary feature file
+Rets:
+	header	: Dictionary with the fields of BINARY_HEADER_DTYPE
+	records	: Structured np.memmap of shape (records,) with the following fields
+		router_id	: ID of router
+		cycle		: Cycle at which the features were collected
+		ports		: Array of shape (DIRECTIONS, virtual_channels, PORT_FEATURE_COUNT)
+"""
+def open_binary_features(feature_file):
+	header = read_binary_header(feature_file)
+	record_dtype = np.dtype([("router_id", BINARY_FIELD_DTYPE), ("cycle", BINARY_FIELD_DTYPE), ("ports", BINARY_FIELD_DTYPE, (DIRECTIONS, header["virtual_channels"], PORT_FEATURE_COUNT))])
+	size = os.path.getsize(feature_file) - BINARY_HEADER_DTYPE.itemsize
+	assert(size % record_dtype.itemsize == 0)	# The file must have complete records only
+	if(size == 0):	# Empty files can't be memory mapped
+		return header, np.empty(0, dtype = record_dtype)
+	return header, np.memmap(feature_file, dtype = record_dtype, mode = "r", offset = BINARY_HEADER_DTYPE.itemsize)
+
+
+
+"""
+Reads a binary feature file into a 2D integer array with the same columns as read_lines()
+Only the features of the first virtual channel are read.
+Args:
+	feature_file	: Name of binary feature file
+	router_ids		: List of required router IDs. Records of other routers are not read. None if all routers are required
+	columns			: List of index of required columns (as in text format). None if all columns are required
+Rets:
+	data	: Array of shape (records, columns)
+"""
+def read_binary_lines(feature_file, router_ids = None, columns = None):
+	header, records = open_binary_features(feature_file)
+	fields = records.view(BINARY_FIELD_DTYPE).reshape(len(records), header["field_count"])	# Every record as a row of integers
+
+	fields_idx = get_binary_fields(columns, header["virtual_channels"])
+
+	if(router_ids is None):
+		blocks = [fields]
+	elif(SORTED_FEATURE_FILES):	# Records of a router are contiguous, hence their range is found by a binary search
+		router_column = fields[:, ROUTER_ID]
+		blocks = []
+		for router_id in sorted(router_ids):
+			start = bisect.bisect_left(router_column, router_id)
+			end = bisect.bisect_left(router_column, router_id + 1, start)
+			blocks.append(fields[start : end])
+	else:
+		blocks = [fields[np.isin(fields[:, ROUTER_ID], router_ids)]]
+	return np.concatenate([block[:, fields_idx] for block in blocks]).astype(FEATURE_DTYPE)
+
+
+
+"""
+Loads a feature file
+Args:
+	feature_file	: Name of file having feature data
+	router_ids		: List of required router IDs. None if all routers are required
+	port_features	: List of required (port, feature) pairs. Other features are set to 0. None if all features are required
+	features_format	: Format of feature file i.e. FEATURES_FORMAT_TEXT or FEATURES_FORMAT_BIN
+Rets:
+	cycles		: Array of shape (cycles,) with the cycle of every sample (Sorted in ascending order)
+	router_ids	: Array of shape (routers,) with the ID of every router
+	features	: Array of shape (cycles, routers, DIRECTIONS, PORT_FEATURE_COUNT)
+"""
+def load_features(feature_file, router_ids = None, port_features = None, features_format = FEATURES_FORMAT_TEXT):
+	columns = get_columns(port_features)
+	if(features_format == FEATURES_FORMAT_BIN):
+		data = read_binary_lines(feature_file, router_ids, columns)
+	else:
+		data = read_lines(feature_file, router_ids, columns)
+
+	# noxim writes all the cycles of a router together, hence a stable sort on router ID keeps the cycles in order
+	if(np.any(data[1:, ROUTER_ID] < data[:-1, ROUTER_ID])):	# Sorting is skipped if routers are already in order
+		data = data[np.argsort(data[:, ROUTER_ID], kind = "stable")]
+	return arrange_features(data, port_features)
+
+
+
+"""
+Generates the columns of a feature file which have to be read for given port features
+Args:
+	port_features	: List of required (port, feature) pairs. None if all features are required
+Rets:
+	columns	: List of index of columns. ROUTER_ID and CYCLE are always the first two columns. None if all columns are required
+"""
+def get_columns(port_features):
+	if(port_features is None):
+		return None
+	return [ROUTER_ID, CYCLE] + [PORT_FEATURE_OFFSET + port * PORT_FEATURE_COUNT + feature for port, feature in port_features]
+
+
+
+"""
+Arranges the lines read from a feature file as an array of features
+Args:
+	data			: Array of shape (lines, columns) with the columns given by get_columns(port_features).
+					  The lines must be sorted by router ID and the lines of a router must be sorted by cycle
+	port_features	: List of required (port, feature) pairs. Other features are set to 0. None if all features are required
+Rets:
+	Same as load_features()
+"""
+def arrange_features(data, port_features = None):
+	router_ids, counts = np.unique(data[:, ROUTER_ID], return_counts = True)
+	if(len(router_ids) == 0):	# Empty feature file
+		return np.empty(0, dtype = FEATURE_DTYPE), router_ids, np.empty((0, 0, DIRECTIONS, PORT_FEATURE_COUNT), dtype = FEATURE_DTYPE)
+	assert(np.all(counts == counts[0]))	# Every router must have same number of samples
+
+	data = data.reshape(len(router_ids), counts[0], -1)
+	cycles = data[0, :, CYCLE]
+	assert(np.all(data[:, :, CYCLE] == cycles))	# Every router must have samples of same cycles
+
+	if(port_features is None):
+		features = data[:, :, PORT_FEATURE_OFFSET : PORT_FEATURE_OFFSET + DIRECTIONS * PORT_FEATURE_COUNT]
+		features = features.reshape(len(router_ids), len(cycles), DIRECTIONS, PORT_FEATURE_COUNT)
+	else:
+		features = np.zeros((len(router_ids), len(cycles), DIRECTIONS, PORT_FEATURE_COUNT), dtype = FEATURE_DTYPE)
+		for idx, (port, feature) in enumerate(port_features):
+			features[:, :, port, feature] = data[:, :, 2 + idx]
+	return cycles, router_ids, features.transpose(1, 0, 2, 3)
+
+
+
+"""
+Generates the projection of a feature file needed to calculate the parsed features of given ports
+Args:
+	router_and_ports	: List of router and required port
+	used_features		: List of required parsed features (PARSED_*). None if all parsed features are required
+	dim_x				: X dimension of grid
+Rets:
+	router_ids		: Sorted list of IDs of the routers on the path and the routers connected to them
+	port_features	: Sorted list of required (port, feature) pairs
+"""
+def get_projection(router_and_ports, used_features = None, dim_x = DIM_X):
+	if(used_features is None):
+		used_features = range(PARSED_FEATURE_COUNT)
+
+	router_ids = set()
+	port_features = set()
+	for router_port in router_and_ports:
+		other_router = get_connected_router_and_port(router_port)
+		router_ids.add(router_port[0][1] * dim_x + router_port[0][0])
+		router_ids.add(other_router[0][1] * dim_x + other_router[0][0])
+		for parsed_feature in used_features:
+			rx_features, tx_features = PARSED_FEATURE_SOURCES[parsed_feature]
+			port_features.update((router_port[1], feature) for feature in rx_features)
+			port_features.update((other_router[1], feature) for feature in tx_features)
+	return sorted(router_ids), sorted(port_features)
+
+
+
+"""
+Generates the Rx/Tx paired features of the required ports from loaded features
+Args:
+	cycles				: Cycles as returned by load_features()
+	router_ids			: Router IDs as returned by load_features()
+	features			: Features as returned by load_features()
+	router_and_ports	: List of router and required port
+	dim_x				: X dimension of grid
+Rets:
+	Dictionary with the following format
+	{((router_x, router_Y), port)	:	(cycles, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time), ...}
+	where every element of tuple is an array of shape (cycles,)
+"""
+def pair_ports(cycles, router_ids, features, router_and_ports, dim_x = DIM_X):
+	router_index = {router_id : idx for idx, router_id in enumerate(router_ids.tolist())}
+
+	# Generate indexes of Rx and connected Tx ports
+	rx_routers, rx_ports, tx_routers, tx_ports = [], [], [], []
+	for router_port in router_and_ports:
+		other_router = get_connected_router_and_port(router_port)
+		rx_routers.append(router_index[router_port[0][1] * dim_x + router_port[0][0]])
+		rx_ports.append(router_port[1])
+		tx_routers.append(router_index[other_router[0][1] * dim_x + other_router[0][0]])
+		tx_ports.append(other_router[1])
+
+	rx = features[:, rx_routers, rx_ports, :]	# Shape is (cycles, len(router_and_ports), PORT_FEATURE_COUNT)
+	tx = features[:, tx_routers, tx_ports, :]
+
+	# Buffer waiting time = total time the flits waited / No. of flits. It's 0 if no flits were transmitted
+	transmitted = tx[:, :, TRANSMITTED_FLITS]
+	waiting_time = np.zeros(transmitted.shape, dtype = np.float64)
+	np.divide(tx[:, :, CUMULATIVE_LATENCY], transmitted, out = waiting_time, where = (transmitted != 0))
+
+	paired = {}
+	for idx, router_port in enumerate(router_and_ports):
+		paired[router_port] = (cycles, rx[:, idx, BUFFER_STATUS], rx[:, idx, CYCLES_SINCE_LAST_FLIT], tx[:, idx, STALLED_FLITS], transmitted[:, idx], waiting_time[:, idx])
+	return paired
+
+
+
+"""
+Generates the noxim options which restrict the feature file to the data needed for given ports
+Args:
+	router_and_ports	: List of router and required port. None if all the routers are required
+	interval			: Features are exported every interval cycles
+	dim_x				: X dimension of grid
+	features_format		: Format of feature file i.e. FEATURES_FORMAT_TEXT or FEATURES_FORMAT_BIN
+	stream				: If True, features are written as soon as they are generated (Used with FIFOs)
+Rets:
+	List of command line options for noxim
+"""
+def get_noxim_options(router_and_ports = None, interval = 1, dim_x = DIM_X, features_format = FEATURES_FORMAT_TEXT, stream = False):
+	options = []
+	if(stream):
+		options += ["-features_stream"]
+	if(features_format != FEATURES_FORMAT_TEXT):
+		options += ["-features_format", features_format]
+	if(router_and_ports is not None):
+		router_ids = get_projection(router_and_ports, None, dim_x)[0]
+		options += ["-feature_routers", ",".join(str(router_id) for router_id in router_ids)]
+	if(interval != 1):
+		options += ["-feature_interval", str(interval)]
+	return options
+
+
+
+"""
+Parses the features from given file and generates data for given router and ports
+Only the routers and columns needed by the required ports and used_features are converted
+Args:
+	feature_file		: Name of file having feature data
+	router_and_ports	: List of router and required port
+	log					: File to print log to
+	ID					: ID of the caller process
+	dim_x				: X dimension of grid
+	used_features		: List of required parsed features (PARSED_*). Other features are set to 0. None if all are required
+	features_format		: Format of feature file i.e. FEATURES_FORMAT_TEXT or FEATURES_FORMAT_BIN
+Rets:
+	list of the following format called router_info
+	{((router_x, router_Y), port)	:	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time], ...], ...}
+"""
+def parse_features(feature_file, router_and_ports, log, ID, dim_x = DIM_X, used_features = None, features_format = FEATURES_FORMAT_TEXT):
+	# Read data from csv file
+	log.write("Process #" + str(ID) + "\tReading from file: " + feature_file + "\n")
+	print("Process #" + str(ID) + "\tReading from file: " + feature_file)
+	router_ids, port_features = get_projection(router_and_ports, used_features, dim_x)
+	if(used_features is None):
+		port_features = None	# All the columns are converted in a single pass
+	cycles, router_ids, features = load_features(feature_file, router_ids, port_features, features_format)
+
+	# Generate output dictionary
+	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
+	print("Process #" + str(ID) + "\tGenerating Router info")
+	paired = pair_ports(cycles, router_ids, features, router_and_ports, dim_x)
+
+	router_info = {}
+	for router_port in router_and_ports:
+		router_info[router_port] = columns_to_entries(paired[router_port], used_features)
+	return router_info
+
+
+
+"""
+Converts the columns of a port as returned by pair_ports() to the entries of router_info
+Args:
+	columns			: Tuple of (cycles, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time)
+	used_features	: List of required parsed features (PARSED_*). Other features are set to 0. None if all are required
+Rets:
+	entries	: [[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time], ...]
+"""
+def columns_to_entries(columns, used_features = None):
+	columns = [column.tolist() for column in columns]
+	if(used_features is not None):
+		zeros = [0] * len(columns[0])
+		for feature in range(PARSED_FEATURE_COUNT):
+			if(feature not in used_features):
+				columns[1 + feature] = zeros	# The first column is cycle
+	return [list(entry) for entry in zip(*columns)]
+
+
+
+"""
+Line by line parser which was used by server scripts. It's kept to verify and benchmark parse_features()
+Args and Rets are same as parse_features()
+"""
+def parse_features_text(feature_file, router_and_ports, log, ID, dim_x = DIM_X):
+	all_info = {}	# This dictionary stores the parsed data
+
+	# Read data from csv file
+	log.write("Process #" + str(ID) + "\tReading from file: " + feature_file + "\n")
+	print("Process #" + str(ID) + "\tReading from file: " + feature_file)
+	with open(feature_file, 'r') as csv_in:
+		current_info = csv_in.readline()
+		while current_info:
+			data = current_info.split(", ") # data temporarily stores the parsed features. It's of the type list
+			data = list(map(int, data))	# Map everything to integers
+			# Calculate the router index in the format (router_x, router_y)
+			router_id = data[ROUTER_ID]
+			router = (router_id % dim_x, router_id // dim_x)
+
+			cycle = data[CYCLE] # Extract out the cycle
+
+			# Iterate over all ports and add data to router_info if needed
+			for port in range(DIRECTIONS):
+				start_index = PORT_FEATURE_OFFSET + (port * PORT_FEATURE_COUNT) # This is the index of first feature for port (inclusive)
+				end_index = start_index + PORT_FEATURE_COUNT  # This is the last index for features of port (exclusive)
+				router_port = (router, port) # This is used as the key in all_info
+				if(router_port not in all_info):
+					all_info[router_port] = [] # Create a list if one doesn't exist yet
+				all_info[router_port].append([cycle] + data[start_index : end_index]) # Insert the value i.e features
+
+			current_info = csv_in.readline()	# Read next line
+
+	# Generate output dictionary
+	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
+	print("Process #" + str(ID) + "\tGenerating Router info")
+	router_info = {}	 # Initialize output dictionary
+	for router_port in router_and_ports:
+		router_info[router_port] = [] # Initialize entry in all info
+
+		other_router = get_connected_router_and_port(router_port) # Get connected router
+
+		assert(len(all_info[other_router]) == len(all_info[router_port]))
+		for rx, tx in zip(all_info[router_port], all_info[other_router]):
+			assert(rx[0] == tx[0])
+			current_cycle_entry = [rx[0], rx[1 + BUFFER_STATUS], rx[1 + CYCLES_SINCE_LAST_FLIT], tx[1 + STALLED_FLITS], tx[1 + TRANSMITTED_FLITS]]
+			if(tx[1 + TRANSMITTED_FLITS] == 0):	# Check if no flits were transmitted
+				current_cycle_entry.append(0)	# No flits transmitteed i.e 0 wating time
+			else:
+				current_cycle_entry.append(tx[1 + CUMULATIVE_LATENCY] / tx[1 + TRANSMITTED_FLITS])	# Buffer waiting time = total time the flits waited / No. of flits
+			router_info[router_port].append(current_cycle_entry) # Insert in router info
+	return router_info
@@ -0,0 +1,235 @@
+"""
+This module computes the normalization statistics of features and normalizes them.
+The statistics of every feature (column) are
+	count, min, max, mean and m2 (sum of squared deviations from mean, variance = m2 / count)
+They are computed in a single pass over blocks of samples. Every block is reduced with NumPy and merged into the running statistics
+with the parallel form of Welford's algorithm (Chan et al.), hence the data never has to be in memory at once and the result
+doesn't depend on how it's split into blocks (up to rounding).
+The statistics are stored as a small JSON file next to the weights, so that the same normalization is applied while testing.
+Weights which are exported to noxim are folded back to raw features by denormalize_weights().
+The module can be imported by tools in this directory via the following line
+	import feature_stats
+"""
+
+import os				# Used to check files
+import json				# Used to read and write statistics
+import numpy as np		# Used to compute statistics
+import feature_store	# Used to read stores
+
+# Normalization modes
+NORMALIZATION_MIN_MAX	= "min_max"	# Features are mapped between 0 and normalization value
+NORMALIZATION_Z_SCORE	= "z_score"	# Features are mapped to zero mean and unit variance
+
+# Samples are reduced in blocks of these many rows
+STATS_BLOCK_SIZE = 1 << 20
+
+
+
+"""
+Creates empty statistics
+Args:
+	feature_count	: Number of features
+Rets:
+	stats	: Dictionary with the following format
+		{"count" : No. of samples, "min" : array, "max" : array, "mean" : array, "m2" : array}
+"""
+def create_stats(feature_count):
+	return {
+		"count"	: 0,
+		"min"	: np.full(feature_count, np.inf),
+		"max"	: np.full(feature_count, -np.inf),
+		"mean"	: np.zeros(feature_count),
+		"m2"	: np.zeros(feature_count)
+	}
+
+
+
+"""
+Merges the statistics of two disjoint sets of samples
+Args:
+	stats	: Statistics to update (Not preserved)
+	other	: Statistics to merge into stats
+Rets:
+	stats	: Statistics of both the sets
+"""
+def merge_stats(stats, other):
+	if(other["count"] == 0):
+		return stats
+	count = stats["count"] + other["count"]
+	delta = other["mean"] - stats["mean"]
+	stats["mean"] = stats["mean"] + delta * (other["count"] / count)
+	stats["m2"] = stats["m2"] + other["m2"] + delta ** 2 * (stats["count"] * other["count"] / count)
+	stats["min"] = np.minimum(stats["min"], other["min"])
+	stats["max"] = np.maximum(stats["max"], other["max"])
+	stats["count"] = count
+	return stats
+
+
+
+"""
+Updates the statistics with the next samples
+Args:
+	stats		: Statistics to update (Not preserved)
+	features	: Array of shape (samples, feature_count). It can be memory mapped as it's read in blocks of STATS_BLOCK_SIZE
+Rets:
+	stats	: Updated statistics
+"""
+def update_stats(stats, features):
+	for start in range(0, len(features), STATS_BLOCK_SIZE):
+		block = np.asarray(features[start : start + STATS_BLOCK_SIZE], dtype = np.float64)
+		mean = block.mean(axis = 0)
+		merge_stats(stats, {
+			"count"	: len(block),
+			"min"	: block.min(axis = 0),
+			"max"	: block.max(axis = 0),
+			"mean"	: mean,
+			"m2"	: ((block - mean) ** 2).sum(axis = 0)
+		})
+	return stats
+
+
+
+"""
+Computes the statistics of features of stores in a single pass. The shards are memory mapped and read block by block.
+Args:
+	store_paths	: List of paths of stores. Missing stores are ignored
+Rets:
+	stats	: Statistics of all the samples
+"""
+def get_store_stats(store_paths):
+	stats = None
+	for store_path in store_paths:
+		if(not feature_store.exists(store_path)):
+			continue
+		for cycles, features, labels in feature_store.iter_shards(store_path):
+			if(stats is None):
+				stats = create_stats(features.shape[1])
+			update_stats(stats, features)
+	return stats if stats is not None else create_stats(feature_store.FEATURE_COUNT)
+
+
+
+"""
+Generates the variance of every feature
+Args:
+	stats	: Statistics
+Rets:
+	Array of variances (0 if there are no samples)
+"""
+def get_variance(stats):
+	return stats["m2"] / max(stats["count"], 1)
+
+
+
+"""
+Generates the scale and offset of every feature i.e. a normalized feature is (value - offset) * scale
+	NORMALIZATION_MIN_MAX	: offset is min and scale is normalization_value / (max - min)
+	NORMALIZATION_Z_SCORE	: offset is mean and scale is 1 / standard deviation
+Features which never change have scale 0 as they have no effect on perceptron.
+Args:
+	stats				: Statistics
+	mode				: NORMALIZATION_MIN_MAX or NORMALIZATION_Z_SCORE
+	normalization_value	: Maximum value of normalized features in NORMALIZATION_MIN_MAX mode
+Rets:
+	scale, offset	: Arrays of shape (feature_count,)
+"""
+def get_scale_and_offset(stats, mode = NORMALIZATION_MIN_MAX, normalization_value = 10):
+	if(mode == NORMALIZATION_MIN_MAX):
+		offset = stats["min"]
+		spread = stats["max"] - stats["min"]
+		scale = np.divide(normalization_value, spread, out = np.zeros(len(spread)), where = spread > 0)
+	else:
+		assert(mode == NORMALIZATION_Z_SCORE)
+		offset = stats["mean"]
+		deviation = np.sqrt(get_variance(stats))
+		scale = np.divide(1.0, deviation, out = np.zeros(len(deviation)), where = deviation > 0)
+	return scale, offset
+
+
+
+"""
+Normalizes the features (refer to get_scale_and_offset())
+Args:
+	features			: Array of shape (samples, feature_count)
+	stats				: Statistics
+	mode				: NORMALIZATION_MIN_MAX or NORMALIZATION_Z_SCORE
+	normalization_value	: Maximum value of normalized features in NORMALIZATION_MIN_MAX mode
+Rets:
+	Array of shape (samples, feature_count) with normalized features
+"""
+def normalize(features, stats, mode = NORMALIZATION_MIN_MAX, normalization_value = 10):
+	scale, offset = get_scale_and_offset(stats, mode, normalization_value)
+	return (np.asarray(features, dtype = np.float64) - offset) * scale
+
+
+
+"""
+Folds the normalization into the bias and weights of a perceptron learnt on normalized features, so that they can be applied to raw features
+	bias + sum(weights * (value - offset) * scale) = (bias - sum(weights * scale * offset)) + sum(weights * scale * value)
+This is needed by noxim (refer to Perceptron::get_prediction()) as it has no normalization.
+Args:
+	bias			: Bias learnt on normalized features
+	weights			: List of weights learnt on normalized features
+	scale, offset	: Arrays as returned by get_scale_and_offset() for the same features as weights
+	used_idx		: List of index of features used by perceptron. None if all the features are used
+Rets:
+	bias	: Bias for raw features
+	weights	: List of weights for raw features
+"""
+def denormalize_weights(bias, weights, scale, offset, used_idx = None):
+	if(used_idx is None):
+		used_idx = range(len(weights))
+	raw_weights = np.asarray(weights, dtype = np.float64) * scale
+	raw_bias = bias - sum(float(raw_weights[idx] * offset[idx]) for idx in used_idx)
+	return raw_bias, raw_weights.tolist()
+
+
+
+"""
+Writes the statistics to a JSON file
+Args:
+	stats_file			: Path of file
+	stats				: Statistics
+	mode				: Normalization mode used with the statistics
+	normalization_value	: Maximum value of normalized features in NORMALIZATION_MIN_MAX mode
+Rets:
+	None
+"""
+def write_stats(stats_file, stats, mode = NORMALIZATION_MIN_MAX, normalization_value = 10):
+	data = {key : (value.tolist() if isinstance(value, np.ndarray) else value) for key, value in stats.items()}
+	data["variance"] = get_variance(stats).tolist()	# Only for reference
+	data["mode"] = mode
+	data["normalization_value"] = normalization_value
+	with open(stats_file, "w") as out:
+		json.dump(data, out)
+
+
+
+"""
+Reads the statistics from a JSON file
+Args:
+	stats_file	: Path of file
+Rets:
+	stats				: Statistics
+	mode				: Normalization mode used with the statistics
+	normalization_value	: Maximum value of normalized features in NORMALIZATION_MIN_MAX mode
+"""
+def read_stats(stats_file):
+	with open(stats_file, "r") as stats_in:
+		data = json.load(stats_in)
+	stats = {"count" : data["count"]}
+	for key in ["min", "max", "mean", "m2"]:
+		stats[key] = np.asarray(data[key], dtype = np.float64)
+	return stats, data["mode"], data["normalization_value"]
+
+
+
+"""
+Checks if statistics have been written
+Args:
+	stats_file	: Path of file
+Rets:
+	True if file exists
+"""
+def exists(stats_file):
+	return os.path.isfile(stats_file)
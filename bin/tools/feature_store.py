@@ -0,0 +1,793 @@
+"""
+This module implements a typed, fixed width on-disk format for the per_port_features and per_router_features datasets.
+Every dataset is a directory (called store) with the following structure:
+	manifest.json				: A small JSON file describing the store. The format is
+		{"version": 1, "feature_count": 5, "shards": [{"id": "00000", "rows": 1234}, ...]}
+	<shard_id>.cycles.npy		: int32 array of shape (rows,) with the cycle of every sample
+	<shard_id>.features.npy		: float32 array of shape (rows, feature_count) with the parsed features
+	<shard_id>.labels.npy		: uint8 array of shape (rows,) with the annotation (SATURATED or UNSATURATED)
+The feature_count of a store is set by its first shard. It is FEATURE_COUNT unless the features are averaged over multiple windows
+(refer to feature_window.py), in which case the features of every window are placed one after the other.
+The features are in the same order as the text files used earlier i.e.
+	buffer_status, cycles_since_last_flit, stalled_flits, transmitted_flits, buffer_waiting_time
+If the feature files were parsed with a projection (refer to feature_parser.parse_features()), the features which weren't parsed are 0.
+The manifest then records the parsed features (0 based index of the features of a window) as
+	"parsed_features": [0, 1, 4]
+A store without this field has all the features. Merged stores (extend(), link(), shuffle()) have the features parsed in all their sources.
+All the .npy files can be opened via np.load(..., mmap_mode = "r") without any conversion.
+Shards can also be written without any lock by several processes at once (refer to write_shard()). Every writer then keeps its own manifest
+	writer.<writer>.json		: Same format as manifest.json, with the shards written by <writer>. Their IDs are "<writer>-<number>"
+The readers treat the shards of manifest.json and of all the writer manifests as a single logical store. compact() folds the writer
+manifests into manifest.json once the writers are done.
+A store can also be virtual i.e. its shards are references to row ranges of shards of other stores (refer to link()). Such a shard is
+	{"id": <shard_id in the other store>, "rows": stop - start, "store": <path of the other store relative to this store>, "start": ..., "stop": ...}
+The referenced rows are read in place, hence merging stores by reference doesn't copy any sample.
+Samples can also be read block by block in any order (refer to iter_minibatches()), hence a (virtual) store can be trained on without
+reading all of it into memory.
+Shards appended by extend() or link() can be tagged with their source (e.g. the benchmark) via a "source" field. As the columns have
+a fixed width, get_sources() gives the row ranges (and hence the byte offsets) of every source without reading any sample.
+The module can be imported by tools in this directory via the following line
+	import feature_store
+"""
+
+import os									# Used to access files
+import math									# Used to calculate number of buckets
+import json									# Used to read and write manifest
+import shutil								# Used to copy shards
+from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock manifest
+import numpy as np							# Used to store data
+
+# Version of the format
+STORE_VERSION = 1
+
+# Data types of columns
+CYCLE_DTYPE		= np.int32
+FEATURE_DTYPE	= np.float32
+LABEL_DTYPE		= np.uint8
+
+# Number of parsed features in every sample (of every window)
+FEATURE_COUNT = 5
+
+# Names of files in a store
+MANIFEST		= "manifest.json"
+MANIFEST_LOCK	= ".lock"
+WRITER_MANIFEST	= "writer."
+COLUMNS			= ["cycles", "features", "labels"]
+
+# Maximum size (in bytes) of samples held in memory by shuffle()
+SHUFFLE_MEMORY_BUDGET = 64 * (1 << 20)
+
+# Maximum number of shards which are memory mapped at once by iter_minibatches(). Every mapped column holds a file descriptor
+MAX_MAPPED_SHARDS = 256
+
+
+
+"""
+Generates the path of a column of a shard
+Args:
+	store_path	: Path of store
+	shard_id	: ID of the shard
+	column		: One of COLUMNS
+Rets:
+	Path of the .npy file
+"""
+def get_shard_path(store_path, shard_id, column):
+	return store_path + "/" + shard_id + "." + column + ".npy"
+
+
+
+"""
+Reads the manifest of a store
+Args:
+	store_path	: Path of store
+Rets:
+	manifest	: Dictionary as described above
+"""
+def read_manifest(store_path):
+	return read_manifest_file(store_path + "/" + MANIFEST)
+
+
+
+"""
+Reads a manifest file
+Args:
+	manifest_path	: Path of manifest.json or of the manifest of a writer
+Rets:
+	manifest	: Dictionary as described above
+"""
+def read_manifest_file(manifest_path):
+	with open(manifest_path, "r") as manifest_file:
+		return json.load(manifest_file)
+
+
+
+"""
+Generates the path of the manifest of a writer
+Args:
+	store_path	: Path of store
+	writer		: Name of writer
+Rets:
+	Path of the manifest
+"""
+def get_writer_manifest_path(store_path, writer):
+	return store_path + "/" + WRITER_MANIFEST + writer + ".json"
+
+
+
+"""
+Reads the manifest of a store along with the manifests of all the writers, which are combined into a single logical manifest
+Args:
+	store_path	: Path of store
+Rets:
+	manifest	: Dictionary as described above with the shards of all the writers after the shards of manifest.json
+"""
+def read_logical_manifest(store_path):
+	manifest = read_manifest(store_path)
+	shard_ids = set(shard["id"] for shard in manifest["shards"] if "store" not in shard)	# Shards which were already compacted are skipped
+	for file_name in sorted(os.listdir(store_path)):
+		if(not file_name.startswith(WRITER_MANIFEST) or not file_name.endswith(".json")):
+			continue
+		writer_manifest = read_manifest_file(store_path + "/" + file_name)
+		for shard in writer_manifest["shards"]:
+			if(shard["id"] in shard_ids):
+				continue
+			if(shard["rows"] > 0):
+				set_feature_count(manifest, writer_manifest["feature_count"])
+			manifest["shards"].append(shard)
+	return manifest
+
+
+
+"""
+Writes the manifest of a store atomically
+Args:
+	store_path	: Path of store
+	manifest	: Dictionary as described above
+Rets:
+	None
+"""
+def write_manifest(store_path, manifest):
+	write_manifest_file(store_path + "/" + MANIFEST, manifest)
+
+
+
+"""
+Writes a manifest file atomically i.e. readers see either the old or the new manifest
+Args:
+	manifest_path	: Path of manifest.json or of the manifest of a writer
+	manifest		: Dictionary as described above
+Rets:
+	None
+"""
+def write_manifest_file(manifest_path, manifest):
+	temp_path = manifest_path + ".tmp." + str(os.getpid())
+	with open(temp_path, "w") as manifest_file:
+		json.dump(manifest, manifest_file)
+	os.replace(temp_path, manifest_path)
+
+
+
+"""
+Generates the manifest of an empty store
+Args:
+	parsed_features	: List of index of parsed features (refer to set_parsed_features()). None if all the features are parsed
+Rets:
+	manifest	: Dictionary as described above
+"""
+def new_manifest(parsed_features = None):
+	return set_parsed_features({"version" : STORE_VERSION, "feature_count" : FEATURE_COUNT, "shards" : []}, parsed_features)
+
+
+
+"""
+Sets the parsed features of a store i.e. the features which aren't 0 because of a projection
+Args:
+	manifest		: Manifest of store (Not preserved)
+	parsed_features	: List of index of parsed features (0 based index of the features of a window). None if all the features are parsed
+Rets:
+	manifest	: Updated manifest
+"""
+def set_parsed_features(manifest, parsed_features):
+	manifest.pop("parsed_features", None)
+	if(parsed_features is not None):
+		manifest["parsed_features"] = sorted(set(parsed_features))
+	return manifest
+
+
+
+"""
+Generates the features which are parsed in all the given manifests
+Args:
+	manifests	: List of manifests
+Rets:
+	List of index of parsed features. None if all the features are parsed in all the manifests
+"""
+def intersect_parsed_features(manifests):
+	common = None
+	for manifest in manifests:
+		if(manifest.get("parsed_features") is not None):
+			common = set(manifest["parsed_features"]) if common is None else common & set(manifest["parsed_features"])
+	return None if common is None else sorted(common)
+
+
+
+"""
+Generates the parsed features of a store
+Args:
+	store_path	: Path of store
+Rets:
+	List of index of parsed features (0 based index of the features of a window). All the features if the store wasn't projected
+"""
+def get_parsed_features(store_path):
+	parsed_features = read_manifest(store_path).get("parsed_features")
+	return list(range(FEATURE_COUNT)) if parsed_features is None else parsed_features
+
+
+
+"""
+Checks that features used by a perceptron were parsed in a store i.e. that they aren't 0 because of a projection
+Args:
+	store_path	: Path of store
+	used_idx	: List of index of used features
+Rets:
+	None
+"""
+def check_parsed_features(store_path, used_idx):
+	missing = sorted(set(used_idx) - set(get_parsed_features(store_path)))
+	assert(len(missing) == 0), store_path + " doesn't have features " + str(missing) + " as they weren't parsed (refer to USED_FEATURES)"
+
+
+
+"""
+Creates an empty store. An existing store at the same path is overwritten.
+Args:
+	store_path		: Path of store
+	parsed_features	: List of index of parsed features (refer to set_parsed_features()). None if all the features are parsed
+Rets:
+	None
+"""
+def create(store_path, parsed_features = None):
+	if(os.path.isdir(store_path)):
+		shutil.rmtree(store_path)
+	os.makedirs(store_path)
+	write_manifest(store_path, new_manifest(parsed_features))
+	open(store_path + "/" + MANIFEST_LOCK, "w").close()
+
+
+
+"""
+Creates an empty store if it doesn't exist. Unlike create(), an existing store is never overwritten.
+Multiple processes can call it at once as the manifest is written to a temporary file and linked to manifest.json,
+which fails if some other process has already created it. Hence exactly one manifest is created and no shard is lost.
+Args:
+	store_path	: Path of store
+Rets:
+	None
+"""
+def ensure(store_path):
+	if(exists(store_path)):
+		return
+	os.makedirs(store_path, exist_ok = True)
+	temp_path = store_path + "/" + MANIFEST + ".new." + str(os.getpid())
+	with open(temp_path, "w") as manifest_file:
+		json.dump(new_manifest(), manifest_file)
+	try:
+		os.link(temp_path, store_path + "/" + MANIFEST)
+	except FileExistsError:	# Some other process created the store
+		pass
+	finally:
+		os.remove(temp_path)
+
+
+
+"""
+Checks if a store exists
+Args:
+	store_path	: Path of store
+Rets:
+	True if store exists
+"""
+def exists(store_path):
+	return os.path.isfile(store_path + "/" + MANIFEST)
+
+
+
+"""
+Converts the rows used by tools into columns of a store
+Args:
+	entries	: List of samples. The format is
+	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time, ANNOTATION], ...]
+	Samples with features of multiple windows have all the features between cycle and ANNOTATION
+Rets:
+	cycles, features, labels	: Columns with the data types of store
+"""
+def rows_to_columns(entries):
+	if(len(entries) == 0):
+		return np.empty(0, dtype = CYCLE_DTYPE), np.empty((0, FEATURE_COUNT), dtype = FEATURE_DTYPE), np.empty(0, dtype = LABEL_DTYPE)
+	data = np.asarray(entries, dtype = np.float64)
+	cycles = data[:, 0].astype(CYCLE_DTYPE)
+	features = data[:, 1 : -1].astype(FEATURE_DTYPE)
+	labels = data[:, -1].astype(LABEL_DTYPE)
+	return cycles, features, labels
+
+
+
+"""
+Converts the columns of a store into rows used by tools
+Args:
+	cycles, features, labels	: Columns of store
+Rets:
+	entries	: List of samples. The format is
+	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time, ANNOTATION], ...]
+"""
+def columns_to_rows(cycles, features, labels):
+	data = np.empty((len(cycles), features.shape[1] + 2), dtype = np.float64)
+	data[:, 0] = cycles
+	data[:, 1 : -1] = features
+	data[:, -1] = labels
+	return data.tolist()
+
+
+
+"""
+Sets the feature_count of a store with no samples or checks that it matches the feature_count of a store with samples
+Args:
+	manifest		: Manifest of store (Not preserved)
+	feature_count	: Number of features in the new shard
+Rets:
+	None
+"""
+def set_feature_count(manifest, feature_count):
+	if(all(shard["rows"] == 0 for shard in manifest["shards"])):
+		manifest["feature_count"] = feature_count
+	assert(manifest["feature_count"] == feature_count)
+
+
+
+"""
+Appends a new shard to a store. The store is created if it doesn't exist.
+Multiple processes can append to the same store as the manifest is updated under a lock.
+The features must have the same feature_count as the earlier shards.
+Args:
+	store_path					: Path of store
+	cycles, features, labels	: Columns to append
+	source						: Source of the shard (refer to get_sources()). None if not required
+Rets:
+	None
+"""
+def append(store_path, cycles, features, labels, source = None):
+	assert(len(cycles) == len(features) == len(labels))
+	ensure(store_path)
+
+	with open(store_path + "/" + MANIFEST_LOCK, "a") as lock_file:
+		lockf(lock_file, LOCK_EX)	# Acquire a lock
+		manifest = read_manifest(store_path)
+		set_feature_count(manifest, features.shape[1])
+		shard_id = "%05d" % len(manifest["shards"])
+		save_shard(store_path, shard_id, cycles, features, labels)
+		manifest["shards"].append(tag_source({"id" : shard_id, "rows" : len(cycles)}, source))
+		write_manifest(store_path, manifest)
+		lockf(lock_file, LOCK_UN)	# Release the lock
+
+
+
+"""
+Appends a new shard to a store without any lock. The store is created if it doesn't exist.
+Every writer has its own manifest and its own shard IDs, hence any number of writers can append to the same store at once
+as long as no two concurrent processes use the same writer name. The shards are visible to all the readers once this returns.
+Args:
+	store_path					: Path of store
+	writer						: Name of writer e.g. "worker_<ID>". Must not contain "/"
+	cycles, features, labels	: Columns to append
+Rets:
+	None
+"""
+def write_shard(store_path, writer, cycles, features, labels):
+	assert(len(cycles) == len(features) == len(labels))
+	ensure(store_path)
+
+	manifest_path = get_writer_manifest_path(store_path, writer)
+	if(os.path.isfile(manifest_path)):
+		manifest = read_manifest_file(manifest_path)
+	else:
+		manifest = new_manifest()
+	set_feature_count(manifest, features.shape[1])
+	shard_id = writer + "-" + "%05d" % len(manifest["shards"])
+	save_shard(store_path, shard_id, cycles, features, labels)
+	manifest["shards"].append({"id" : shard_id, "rows" : len(cycles)})
+	write_manifest_file(manifest_path, manifest)	# The shard is published only after its columns are complete
+
+
+
+"""
+Folds the manifests of all the writers into manifest.json. It must be called only after all the writers are done.
+The shards aren't moved or converted, hence it only rewrites a few small JSON files.
+Args:
+	store_path	: Path of store
+Rets:
+	None
+"""
+def compact(store_path):
+	with open(store_path + "/" + MANIFEST_LOCK, "a") as lock_file:
+		lockf(lock_file, LOCK_EX)	# Acquire a lock
+		write_manifest(store_path, read_logical_manifest(store_path))
+		for file_name in os.listdir(store_path):	# The shards of writer manifests are skipped by readers if they are already in manifest.json
+			if(file_name.startswith(WRITER_MANIFEST) and file_name.endswith(".json")):
+				os.remove(store_path + "/" + file_name)
+		lockf(lock_file, LOCK_UN)	# Release the lock
+
+
+
+"""
+Saves the columns of a shard
+Args:
+	store_path					: Path of store
+	shard_id					: ID of the shard
+	cycles, features, labels	: Columns to save
+Rets:
+	None
+"""
+def save_shard(store_path, shard_id, cycles, features, labels):
+	np.save(get_shard_path(store_path, shard_id, "cycles"), np.ascontiguousarray(cycles, dtype = CYCLE_DTYPE))
+	np.save(get_shard_path(store_path, shard_id, "features"), np.ascontiguousarray(features, dtype = FEATURE_DTYPE))
+	np.save(get_shard_path(store_path, shard_id, "labels"), np.ascontiguousarray(labels, dtype = LABEL_DTYPE))
+
+
+
+"""
+Writes a store with a single shard. An existing store at the same path is overwritten.
+Args:
+	store_path					: Path of store
+	cycles, features, labels	: Columns to write
+Rets:
+	None
+"""
+def write(store_path, cycles, features, labels):
+	create(store_path)
+	append(store_path, cycles, features, labels)
+
+
+
+"""
+Generates the number of samples in a store
+Args:
+	store_path	: Path of store
+Rets:
+	Number of rows
+"""
+def get_rows(store_path):
+	return sum(shard["rows"] for shard in read_logical_manifest(store_path)["shards"])
+
+
+
+"""
+Iterates over the shards of a store. The columns are memory mapped.
+Args:
+	store_path	: Path of store
+Rets:
+	Generator of (cycles, features, labels) for every non empty shard
+"""
+def iter_shards(store_path):
+	for shard in read_logical_manifest(store_path)["shards"]:
+		if(shard["rows"] == 0):
+			continue
+		yield get_shard_columns(store_path, shard)
+
+
+
+"""
+Memory maps the columns of a shard. The rows of a referenced shard are read from the referenced store.
+Args:
+	store_path	: Path of store
+	shard		: Entry of the shard in manifest
+Rets:
+	cycles, features, labels	: Columns of shard
+"""
+def get_shard_columns(store_path, shard):
+	columns = tuple(np.load(get_shard_path(get_shard_store(store_path, shard), shard["id"], column), mmap_mode = "r") for column in COLUMNS)
+	if("start" in shard):
+		columns = tuple(column[shard["start"] : shard["stop"]] for column in columns)
+	return columns
+
+
+
+"""
+Generates the path of the store which has the data of a shard
+Args:
+	store_path	: Path of store
+	shard		: Entry of the shard in manifest
+Rets:
+	store_path if the shard isn't a reference, else the path of the referenced store
+"""
+def get_shard_store(store_path, shard):
+	if("store" not in shard):
+		return store_path
+	return os.path.normpath(os.path.join(store_path, shard["store"]))
+
+
+
+"""
+Reads all the samples in a store
+If the store has a single shard, the memory mapped columns are returned directly, else the shards are copied one by one into a single array.
+Only one shard is mapped at a time, hence stores with more shards than RLIMIT_NOFILE (e.g. written by shuffle()) can be read too.
+Args:
+	store_path	: Path of store
+Rets:
+	cycles, features, labels	: Columns of store
+"""
+def read(store_path):
+	shards = [shard for shard in read_logical_manifest(store_path)["shards"] if shard["rows"] > 0]
+	if(len(shards) == 0):
+		return rows_to_columns([])
+	if(len(shards) == 1):
+		return get_shard_columns(store_path, shards[0])
+
+	columns = None
+	start = 0
+	for shard in shards:
+		shard_columns = get_shard_columns(store_path, shard)
+		if(columns is None):
+			rows = sum(shard["rows"] for shard in shards)
+			columns = tuple(np.empty((rows, ) + values.shape[1:], dtype = values.dtype) for values in shard_columns)
+		for column, values in zip(columns, shard_columns):
+			column[start : start + len(values)] = values
+		start += len(shard_columns[0])
+	return columns
+
+
+
+"""
+Reads a single column of all the samples in a store. Only one shard is mapped at a time.
+Args:
+	store_path	: Path of store
+	column		: Name of column (refer to COLUMNS)
+Rets:
+	Array with the column of every sample in the order of read()
+"""
+def read_column(store_path, column):
+	column_idx = COLUMNS.index(column)
+	values = [np.array(get_shard_columns(store_path, shard)[column_idx]) for shard in read_logical_manifest(store_path)["shards"] if shard["rows"] > 0]
+	if(len(values) == 0):
+		return rows_to_columns([])[column_idx]
+	return np.concatenate(values)
+
+
+
+"""
+Reads the samples at given indices block by block i.e. a block is gathered from the shards only when it's needed.
+The referenced rows of a virtual store are read in place, hence a store can be trained on in a random order without reading all of it into memory.
+At most MAX_MAPPED_SHARDS shards are mapped at once. The least recently used shards are released first.
+Args:
+	store_path	: Path of store
+	indices		: Array of index of samples in the order of read() (e.g. a permutation)
+	block_size	: Number of samples in every block
+Rets:
+	Generator of (cycles, features, labels) of the samples of every block in the order of indices
+"""
+def iter_minibatches(store_path, indices, block_size):
+	shards = [shard for shard in read_logical_manifest(store_path)["shards"] if shard["rows"] > 0]
+	starts = np.cumsum([0] + [shard["rows"] for shard in shards])	# Index of first sample of every shard
+	mapped = {}	# {shard : columns} of mapped shards in the order of their use
+	for start in range(0, len(indices), block_size):
+		block_indices = np.asarray(indices[start : start + block_size])
+		block_shards = np.searchsorted(starts, block_indices, side = "right") - 1
+		order = np.argsort(block_shards, kind = "stable")	# Samples of a shard are gathered together
+		bounds = np.flatnonzero(np.diff(block_shards[order])) + 1
+		block = None
+		for positions in np.split(order, bounds):
+			shard = int(block_shards[positions[0]])
+			if(shard in mapped):
+				mapped[shard] = mapped.pop(shard)	# Mark the shard as recently used
+			else:
+				if(len(mapped) >= MAX_MAPPED_SHARDS):
+					mapped.pop(next(iter(mapped)))
+				mapped[shard] = get_shard_columns(store_path, shards[shard])
+			if(block is None):
+				block = tuple(np.empty((len(block_indices), ) + column.shape[1:], dtype = column.dtype) for column in mapped[shard])
+			rows = block_indices[positions] - starts[shard]
+			for values, column in zip(block, mapped[shard]):
+				values[positions] = column[rows]
+		yield block
+
+
+
+"""
+Copies a file in the kernel via copy_file_range() i.e. the data is never copied to user space and no process is spawned
+Falls back to shutil.copyfile() (which uses sendfile() on Linux) if copy_file_range() isn't supported
+Args:
+	src_path	: Path of source file
+	dst_path	: Path of destination file. It's overwritten if it exists
+Rets:
+	None
+"""
+def copy_file(src_path, dst_path):
+	try:
+		with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+			remaining = os.fstat(src.fileno()).st_size
+			while remaining > 0:
+				copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+				if(copied == 0):	# Source was truncated
+					break
+				remaining -= copied
+	except (AttributeError, OSError):	# Not supported by Python, kernel or file system
+		shutil.copyfile(src_path, dst_path)
+
+
+
+"""
+Adds the source to the entry of a shard
+Args:
+	shard	: Entry of the shard (Not preserved)
+	source	: Source of the shard. Nothing is added if it's None
+Rets:
+	shard	: Entry of the shard
+"""
+def tag_source(shard, source):
+	if(source is not None):
+		shard["source"] = source
+	return shard
+
+
+
+"""
+Generates the index of sources of a store i.e. the rows which came from every source. Consecutive shards of a source are combined.
+Rows are in the order of read() and iter_shards(). The byte offset of a row in a column is row * itemsize of the column (after the .npy header).
+Args:
+	store_path	: Path of store
+Rets:
+	sources	: List of [source, start_row, stop_row]. The source is None for shards without a source
+"""
+def get_sources(store_path):
+	sources = []
+	rows = 0
+	for shard in read_logical_manifest(store_path)["shards"]:
+		if(shard["rows"] == 0):
+			continue
+		if(len(sources) > 0 and sources[-1][0] == shard.get("source")):
+			sources[-1][2] += shard["rows"]
+		else:
+			sources.append([shard.get("source"), rows, rows + shard["rows"]])
+		rows += shard["rows"]
+	return sources
+
+
+
+"""
+Appends all the shards of source store to destination store without converting them
+The files are copied by the kernel (refer to copy_file()).
+Args:
+	src_path	: Path of source store
+	dst_path	: Path of destination store. It's created if it doesn't exist
+	source		: Source of the shards (e.g. name of benchmark) stored in their entries. None if not required
+Rets:
+	None
+"""
+def extend(src_path, dst_path, source = None):
+	ensure(dst_path)
+
+	with open(dst_path + "/" + MANIFEST_LOCK, "a") as lock_file:
+		lockf(lock_file, LOCK_EX)	# Acquire a lock
+		manifest = read_manifest(dst_path)
+		src_manifest = read_logical_manifest(src_path)
+		set_parsed_features(manifest, intersect_parsed_features([manifest, src_manifest]))
+		for shard in src_manifest["shards"]:
+			if(shard["rows"] == 0):
+				continue
+			set_feature_count(manifest, src_manifest["feature_count"])
+			shard_id = "%05d" % len(manifest["shards"])
+			if("store" in shard):	# Only the referenced rows are copied
+				save_shard(dst_path, shard_id, *get_shard_columns(src_path, shard))
+			else:
+				for column in COLUMNS:
+					copy_file(get_shard_path(src_path, shard["id"], column), get_shard_path(dst_path, shard_id, column))
+			manifest["shards"].append(tag_source({"id" : shard_id, "rows" : shard["rows"]}, source))
+		write_manifest(dst_path, manifest)
+		lockf(lock_file, LOCK_UN)	# Release the lock
+
+
+
+"""
+Adds references to all the samples of source stores to destination store. No sample is copied, hence the destination is a virtual store.
+References to referenced shards are resolved, hence the destination always refers to the stores which have the data.
+Args:
+	src_paths	: List of paths of source stores
+	dst_path	: Path of destination store. It's created if it doesn't exist
+	source		: Source of the shards (e.g. name of benchmark) stored in their entries. None if not required
+Rets:
+	None
+"""
+def link(src_paths, dst_path, source = None):
+	ensure(dst_path)
+
+	with open(dst_path + "/" + MANIFEST_LOCK, "a") as lock_file:
+		lockf(lock_file, LOCK_EX)	# Acquire a lock
+		manifest = read_manifest(dst_path)
+		for src_path in src_paths:
+			src_manifest = read_logical_manifest(src_path)
+			set_parsed_features(manifest, intersect_parsed_features([manifest, src_manifest]))
+			for shard in src_manifest["shards"]:
+				if(shard["rows"] == 0):
+					continue
+				set_feature_count(manifest, src_manifest["feature_count"])
+				manifest["shards"].append(tag_source({
+					"id"	: shard["id"],
+					"rows"	: shard["rows"],
+					"store"	: os.path.relpath(get_shard_store(src_path, shard), dst_path),
+					"start"	: shard.get("start", 0),
+					"stop"	: shard.get("stop", shard["rows"])
+				}, source))
+		write_manifest(dst_path, manifest)
+		lockf(lock_file, LOCK_UN)	# Release the lock
+
+
+"""
+Generates a structured data type which holds all the columns of a sample. It's used for the temporary files of shuffle().
+Args:
+	feature_count	: Number of features in every sample
+Rets:
+	numpy dtype with the fields in COLUMNS
+"""
+def get_row_dtype(feature_count):
+	return np.dtype([("cycles", CYCLE_DTYPE), ("features", FEATURE_DTYPE, (feature_count,)), ("labels", LABEL_DTYPE)])
+
+
+
+"""
+Writes all the samples of source stores to destination store in a uniformly random order. Only SHUFFLE_MEMORY_BUDGET bytes are held in memory.
+If the samples don't fit in the budget, they are shuffled out of core in two passes
+	1.) The source shards are read in chunks and every sample is scattered to a random temporary bucket on disk.
+		A bucket file is opened only while a chunk is appended to it, hence the number of buckets isn't limited by RLIMIT_NOFILE
+	2.) Every bucket is read, shuffled in memory and appended to the destination store as a shard
+As every sample goes to a uniformly random bucket and every bucket is uniformly shuffled, the order is a uniformly random permutation
+(same as a full in-memory shuffle).
+Args:
+	src_paths	: List of paths of source stores
+	dst_path	: Path of destination store. An existing store at the same path is overwritten
+Rets:
+	None
+"""
+def shuffle(src_paths, dst_path):
+	manifests = [read_logical_manifest(src_path) for src_path in src_paths]
+	create(dst_path, intersect_parsed_features(manifests))
+	rows = sum(shard["rows"] for manifest in manifests for shard in manifest["shards"])
+	if(rows == 0):
+		return
+	row_dtype = get_row_dtype(next(manifest["feature_count"] for manifest in manifests if any(shard["rows"] > 0 for shard in manifest["shards"])))
+
+	# Every bucket takes about half of the budget so that buckets larger than average fit too
+	bucket_count = math.ceil(2 * rows * row_dtype.itemsize / SHUFFLE_MEMORY_BUDGET)
+	if(bucket_count <= 1):	# Shuffle in memory
+		columns = tuple(np.concatenate(column) for column in zip(*[tuple(np.array(values) for values in shard) for src_path in src_paths for shard in iter_shards(src_path)]))	# Shards are copied so that their maps are released
+		permutation = np.random.permutation(rows)
+		append(dst_path, *(column[permutation] for column in columns))
+		return
+
+	# Pass 1: Scatter samples to buckets
+	temp_path = dst_path + ".shuffle." + str(os.getpid())
+	os.makedirs(temp_path, exist_ok = True)
+	bucket_paths = [temp_path + "/" + str(bucket) for bucket in range(bucket_count)]
+	chunk_rows = max(1, SHUFFLE_MEMORY_BUDGET // (2 * row_dtype.itemsize))
+	for src_path in src_paths:
+		for shard in iter_shards(src_path):
+			for start in range(0, len(shard[0]), chunk_rows):
+				chunk = np.empty(min(chunk_rows, len(shard[0]) - start), dtype = row_dtype)
+				for column, values in zip(COLUMNS, shard):
+					chunk[column] = values[start : start + len(chunk)]
+				buckets = np.random.randint(bucket_count, size = len(chunk))
+				order = np.argsort(buckets, kind = "stable")
+				counts = np.bincount(buckets, minlength = bucket_count)
+				ends = np.cumsum(counts)
+				chunk = chunk[order]	# Samples of every bucket are placed together
+				for bucket in np.flatnonzero(counts):
+					with open(bucket_paths[bucket], "ab") as bucket_file:
+						chunk[ends[bucket] - counts[bucket] : ends[bucket]].tofile(bucket_file)
+
+	# Pass 2: Shuffle every bucket in memory
+	for bucket_path in bucket_paths:
+		if(not os.path.isfile(bucket_path)):	# No sample was scattered to the bucket
+			continue
+		bucket = np.fromfile(bucket_path, dtype = row_dtype)
+		os.remove(bucket_path)
+		bucket = bucket[np.random.permutation(len(bucket))]
+		append(dst_path, *(bucket[column] for column in COLUMNS))
+	shutil.rmtree(temp_path, ignore_errors = True)
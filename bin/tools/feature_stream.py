@@ -0,0 +1,175 @@
+"""
+This module consumes the features of a noxim run while the simulation is still running.
+noxim is started with -features <fifo> -features_stream, so that every record is written to a FIFO as soon as it's generated
+(cycle by cycle, refer to FeatureCollector.h). The records are read as they arrive and for the given path they are
+	1.) Projected i.e. only the required routers and columns are converted (refer to feature_parser.py)
+	2.) Paired i.e. the Rx features of a port are combined with the Tx features of the connected port
+	3.) Averaged over a moving window or exponentially with exactly the same semantics as pre_process() of the server scripts (refer to feature_window.py)
+Only the final per port samples are kept, hence no feature file is ever written to disk.
+The module can be imported by tools in this directory via the following line
+	import feature_stream
+"""
+
+import os				# Used to create and read FIFOs
+import time				# Used to wait for noxim to open the FIFO
+import select			# Used to wait for new records
+import numpy as np		# Used to process features
+import feature_parser	# Used to project and pair features
+import feature_window	# Used to take moving average
+
+# Records are converted in blocks of at least these many bytes
+STREAM_BLOCK_SIZE = 1 << 22
+
+# Time (in seconds) to wait before polling the FIFO again
+STREAM_POLL_INTERVAL = 0.01
+
+
+
+"""
+Creates a FIFO. An existing file at the same path is removed.
+Args:
+	fifo_path	: Path of FIFO
+Rets:
+	None
+"""
+def create_fifo(fifo_path):
+	if(os.path.lexists(fifo_path)):
+		os.remove(fifo_path)
+	os.mkfifo(fifo_path)
+
+
+
+"""
+Converts the complete records received till now into a 2D integer array
+Args:
+	received		: bytearray of received data. The converted bytes are removed (Not preserved)
+	header			: Header of binary stream. None for text streams
+	router_ids		: Array of required router IDs
+	columns			: List of index of required columns (as in text format). None if all columns are required
+Rets:
+	data	: Array of shape (records, columns). None if no record is complete
+"""
+def convert_records(received, header, router_ids, columns):
+	if(header is None):	# Text stream i.e. complete lines
+		end = received.rfind(b"\n") + 1
+		block = bytes(received[:end])
+		del received[:end]
+		return feature_parser.convert_block(block, router_ids, columns)
+
+	record_size = header["field_count"] * feature_parser.BINARY_FIELD_DTYPE.itemsize
+	records = len(received) // record_size
+	if(records == 0):
+		return None
+	fields = np.frombuffer(bytes(received[:records * record_size]), dtype = feature_parser.BINARY_FIELD_DTYPE).reshape(records, header["field_count"])
+	del received[:records * record_size]
+	fields = fields[np.isin(fields[:, feature_parser.ROUTER_ID], router_ids)]
+	if(len(fields) == 0):
+		return None
+	return fields[:, feature_parser.get_binary_fields(columns, header["virtual_channels"])].astype(feature_parser.FEATURE_DTYPE)
+
+
+
+"""
+Reads the features of a path from a FIFO while noxim writes to it
+Args:
+	feature_fifo		: Path of FIFO passed to noxim via -features
+	process				: subprocess.Popen object of noxim
+	router_and_ports	: List of router and required port
+	log					: File to print log to
+	ID					: ID of the caller process
+	dim_x				: X dimension of grid
+	used_features		: List of required parsed features (PARSED_*). Other features are set to 0. None if all are required
+	features_format		: Format of stream i.e. feature_parser.FEATURES_FORMAT_TEXT or feature_parser.FEATURES_FORMAT_BIN
+	avg_windows			: List of lengths of moving average windows (refer to feature_window.py). None if no average is taken
+	ema_half_life		: Half life (in samples) of exponential moving average. It's taken instead of the windows if not None
+Rets:
+	router_info	: Same format as feature_parser.parse_features(). The features are replaced by their averages if avg_windows or ema_half_life is not None
+"""
+def stream_features(feature_fifo, process, router_and_ports, log, ID, dim_x = feature_parser.DIM_X, used_features = None, features_format = feature_parser.FEATURES_FORMAT_TEXT, avg_windows = None, ema_half_life = None):
+	log.write("Process #" + str(ID) + "\tStreaming from FIFO: " + feature_fifo + "\n")
+	print("Process #" + str(ID) + "\tStreaming from FIFO: " + feature_fifo)
+	router_ids, port_features = feature_parser.get_projection(router_and_ports, used_features, dim_x)
+	if(used_features is None):
+		port_features = None	# All the columns are converted in a single pass
+	columns = feature_parser.get_columns(port_features)
+	router_ids = np.asarray(router_ids, dtype = feature_parser.FEATURE_DTYPE)
+
+	samples = {router_port : [] for router_port in router_and_ports}	# List of blocks of columns of every port
+	windows = {}	# State of averages of every port
+	if(ema_half_life is not None):
+		windows = {router_port : feature_window.create_ema(ema_half_life) for router_port in router_and_ports}
+	elif(avg_windows is not None):
+		windows = {router_port : feature_window.create_window(avg_windows) for router_port in router_and_ports}
+
+	# Pairs and averages the records of complete cycles and appends them to samples
+	def add_records(data):
+		data = data[np.lexsort((data[:, feature_parser.CYCLE], data[:, feature_parser.ROUTER_ID]))]	# Records are written cycle by cycle
+		cycles, block_router_ids, features = feature_parser.arrange_features(data, port_features)
+		paired = feature_parser.pair_ports(cycles, block_router_ids, features, router_and_ports, dim_x)
+		for router_port in router_and_ports:
+			port_columns = list(paired[router_port])
+			if(used_features is not None):
+				for feature in range(feature_parser.PARSED_FEATURE_COUNT):
+					if(feature not in used_features):
+						port_columns[1 + feature] = np.zeros(len(cycles), dtype = feature_parser.FEATURE_DTYPE)	# The first column is cycle
+			if(len(windows) > 0):
+				average = feature_window.average_ema if ema_half_life is not None else feature_window.average_window
+				averages = average(windows[router_port], np.stack(port_columns[1:], axis = 1).astype(np.float64))
+				port_columns[1:] = list(averages.T)
+			samples[router_port].append(port_columns)
+
+	header = None
+	received = bytearray()
+	pending = np.empty((0, feature_parser.PORT_FEATURE_OFFSET + feature_parser.DIRECTIONS * feature_parser.PORT_FEATURE_COUNT if columns is None else len(columns)), dtype = feature_parser.FEATURE_DTYPE)
+	fifo = os.open(feature_fifo, os.O_RDONLY | os.O_NONBLOCK)	# Doesn't block even if noxim fails before opening the FIFO
+	finished = False
+	while not finished:
+		try:
+			block = os.read(fifo, STREAM_BLOCK_SIZE)
+		except BlockingIOError:	# noxim is running but nothing new has been written
+			select.select([fifo], [], [], STREAM_POLL_INTERVAL)
+			continue
+
+		if(block):
+			received += block
+			if(len(received) < STREAM_BLOCK_SIZE):	# Wait for more data before converting
+				continue
+		elif(process.poll() is None):	# noxim hasn't opened the FIFO yet or is finishing the simulation
+			time.sleep(STREAM_POLL_INTERVAL)
+			continue
+		else:	# noxim has finished and closed the FIFO. Read whatever is left
+			block = os.read(fifo, STREAM_BLOCK_SIZE)
+			while block:
+				received += block
+				block = os.read(fifo, STREAM_BLOCK_SIZE)
+			finished = True
+
+		if(features_format == feature_parser.FEATURES_FORMAT_BIN and header is None):
+			if(len(received) < feature_parser.BINARY_HEADER_DTYPE.itemsize):
+				continue
+			header = feature_parser.parse_binary_header(bytes(received[:feature_parser.BINARY_HEADER_DTYPE.itemsize]))
+			del received[:feature_parser.BINARY_HEADER_DTYPE.itemsize]
+
+		data = convert_records(received, header, router_ids, columns)
+		if(data is not None):
+			pending = np.concatenate((pending, data))
+		if(len(pending) == 0):
+			continue
+
+		# Records of the last cycle may be incomplete till the next cycle starts
+		ready = len(pending) if finished else np.argmax(pending[:, feature_parser.CYCLE] == pending[-1, feature_parser.CYCLE])
+		if(ready > 0):
+			add_records(pending[:ready])
+			pending = pending[ready:]
+	os.close(fifo)
+	process.wait()
+
+	# Generate output dictionary
+	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
+	print("Process #" + str(ID) + "\tGenerating Router info")
+	router_info = {}
+	for router_port in router_and_ports:
+		assert(len(samples[router_port]) > 0)	# noxim didn't generate any feature
+		port_columns = [np.concatenate([block[idx] for block in samples[router_port]]) for idx in range(len(samples[router_port][0]))]
+		router_info[router_port] = feature_parser.columns_to_entries(port_columns)
+	return router_info
@@ -0,0 +1,250 @@
+"""
+This tool is used to search for the subset of parsed features (used_idx) with which the perceptrons of routers are most accurate.
+It works on the per_router_features generated by perceptron_server_router_meta_merge.py, hence the features are never parsed again.
+The features of every router are read, normalized (if the pipeline normalized them), reduced to the window of AVG_CYCLES and
+split into testing and training once. Every candidate subset is then evaluated by a single training pass of all the routers together
+(refer to perceptron_trainer.train_many()) and by testing every router. All the candidates see the same splits and the same shuffles.
+The datasets are held in memory once by the main process. The helper processes are forked after that, hence they share the same copy.
+The training settings (EPOCHS, LEARNING_RATE, TRAINING_MODE, ...) are taken from perceptron_server_router_meta_merge.py.
+The candidates depend on the mode of search
+	1.) SEARCH_ALL		: All the non-empty subsets of features
+	2.) SEARCH_GREEDY	: Greedy forward selection i.e. the feature which improves the accuracy the most is added till the accuracy stops improving
+The candidates are ranked by their net accuracy (average over routers) and the table is written to FEATURE_SEARCH_REPORT in the data directory.
+NOTE: Features which aren't in USED_FEATURES of the pipeline are never parsed (they are 0). Hence all the features must have been parsed in
+	  all the stores (refer to feature_store.get_parsed_features()) i.e. the pipeline must be run with ENABLE_FEATURE_SEARCH set to True.
+	  The search fails otherwise instead of searching over a part of the subsets.
+The tool can be used via the following command
+	python3 path/to/this/file path/to/data/directory number_of_helper_processes_to_use [all/greedy]
+"""
+
+import os									# Used to iterate over directories
+import sys									# Used to get command line arguments
+import itertools							# Used to generate subsets of features
+import multiprocessing as mp				# Used to parallelize workload
+from queue import Empty						# Used for Empty exception
+import numpy as np							# Used to seed shuffles
+import feature_store						# Used to read per router features
+import feature_window						# Used to select the features of a moving average window
+import feature_stats						# Used to normalize features
+import feature_parser						# Used for number of parsed features
+import perceptron_trainer					# Used to train and test perceptrons
+import perceptron_server_router_meta_merge as pipeline	# Used for training settings
+
+# Modes of search
+SEARCH_ALL		= "all"		# All the non-empty subsets of features
+SEARCH_GREEDY	= "greedy"	# Greedy forward selection
+
+# Default mode of search. It's overridden by the third argument
+FEATURE_SEARCH_MODE = SEARCH_ALL
+
+# Names of parsed features (0 based index excluding cycle)
+FEATURE_NAMES = ["buffer_status", "cycles_since_last_flit", "stalled_flits", "transmitted_flits", "buffer_waiting_time"]
+
+# Seed of the splits and of the shuffles of every candidate
+FEATURE_SEARCH_SEED = 0
+
+# File with the ranking of candidates inside the data directory
+FEATURE_SEARCH_REPORT = "feature_search_report"
+
+
+
+"""
+Reads the features of all the routers and splits them into testing and training
+Args:
+	working_directory	: Directory generated by perceptron_server_router_meta_merge.py
+Rets:
+	datasets	: Dictionary with the following format
+		{job : (cycles, features, labels, test_indices, train_indices, test_counts, train_counts)} as returned by pipeline.split_columns()
+"""
+def read_datasets(working_directory):
+	normalization = None	# (stats, mode, normalization_value) if features are normalized
+	normalization_file = working_directory + "/" + pipeline.NORMALIZATION_STATS
+	if(feature_stats.exists(normalization_file)):
+		print("Normalizing features with statistics from " + normalization_file)
+		normalization = feature_stats.read_stats(normalization_file)
+
+	np.random.seed(FEATURE_SEARCH_SEED)
+	datasets = {}
+	per_router_features_dir = working_directory + "/per_router_features"
+	with open(os.devnull, "w") as log:
+		for job in sorted(os.listdir(per_router_features_dir)):
+			cycles, features, labels = feature_store.read(per_router_features_dir + "/" + job)
+			if(len(cycles) == 0): # Skip if no features are available
+				continue
+			if(normalization is not None):	# The statistics are of all the stored windows, hence the features are normalized before selecting the window
+				features = feature_stats.normalize(features, *normalization)
+			features = feature_window.select_window(features, pipeline.get_avg_windows(), pipeline.AVG_CYCLES)
+			datasets[job] = pipeline.split_columns(cycles, np.asarray(features, dtype = np.float64), np.asarray(labels, dtype = np.float64), log, 0)
+	return datasets
+
+
+
+"""
+Generates the features which are searched over i.e. all the parsed features. Fails if a feature wasn't parsed in any of the stores,
+as the subsets with that feature can't be searched (refer to ENABLE_FEATURE_SEARCH of perceptron_server_router_meta_merge.py)
+Args:
+	working_directory	: Directory generated by perceptron_server_router_meta_merge.py
+	datasets			: Datasets as returned by read_datasets()
+Rets:
+	List of index of features
+"""
+def get_search_features(working_directory, datasets):
+	search_features = list(range(feature_parser.PARSED_FEATURE_COUNT))
+	for job in datasets:
+		missing = sorted(set(search_features) - set(feature_store.get_parsed_features(working_directory + "/per_router_features/" + job)))
+		assert(len(missing) == 0), job + " doesn't have features " + str([FEATURE_NAMES[idx] for idx in missing]) + " as they weren't parsed. Run the pipeline with ENABLE_FEATURE_SEARCH set to True"
+	return search_features
+
+
+
+"""
+Trains the perceptrons of all the datasets together with a subset of features and tests them
+Args:
+	datasets	: Datasets as returned by read_datasets()
+	used_idx	: List of index of features used by the perceptrons
+	log			: File to print log to
+Rets:
+	accuracy, false_positives, false_negatives	: Average over the datasets as returned by perceptron_trainer.test()
+"""
+def evaluate_subset(datasets, used_idx, log):
+	jobs = sorted(datasets)
+	np.random.seed(FEATURE_SEARCH_SEED)	# Every candidate sees the same shuffles
+	train_datasets = [(datasets[job][1][datasets[job][4]], datasets[job][2][datasets[job][4]]) for job in jobs]
+	train_counts = None if not pipeline.ENABLE_DEDUPLICATION else [datasets[job][6] for job in jobs]
+	learnt = perceptron_trainer.train_many(train_datasets, used_idx, pipeline.EPOCHS, pipeline.LEARNING_RATE, pipeline.JOINT_TRAINING_BLOCK_SIZE, train_counts, log, pipeline.get_early_stopping_patience(), pipeline.EARLY_STOPPING_DELTA, pipeline.VALIDATION_RATIO, pipeline.TRAINING_MODE)
+
+	results = []
+	for job, (bias, weights, epochs) in zip(jobs, learnt):
+		cycles, features, labels, test_indices, train_indices, test_counts, train_counts = datasets[job]
+		results.append(perceptron_trainer.test(features[test_indices], labels[test_indices], bias, weights, used_idx, test_counts))
+	return tuple(float(value) for value in np.mean(results, axis = 0))
+
+
+
+"""
+Method called by processes to evaluate candidate subsets of features.
+Args:
+	ID					: Process ID
+	jobs				: Queue of candidates (tuples of index of features) to be evaluated
+	datasets			: Datasets as returned by read_datasets(). They are shared with the main process as the process is forked
+	working_directory	: Directory to store generated files
+	results				: Dictionary to store the result of every candidate
+	results_lock		: Lock to synchronize access to results
+Rets:
+	None
+"""
+def worker_search(ID, jobs, datasets, working_directory, results, results_lock):
+	with open(working_directory + "/worker_logs_search/worker_" + str(ID), "a", buffering = 1) as log:	# Open file for log
+		log.write("Process #" + str(ID) + "\tStarting...\n")
+
+		# Compute till all jobs are done
+		while True:
+			try:
+				used_idx = jobs.get(timeout = 0.1) # Fetch next job
+			except Empty:
+				log.write("Process #" + str(ID) + "\tExiting...\n")
+				return
+
+			log.write("Process #" + str(ID) + "\tEvaluating " + str(list(used_idx)) + "\n")
+			result = evaluate_subset(datasets, list(used_idx), log)
+			log.write("Process #" + str(ID) + "\tAccuracy for " + str(list(used_idx)) + " is " + str(result[0]) + "\n")
+			print("Process #" + str(ID) + "\tAccuracy for " + str(list(used_idx)) + " is " + str(result[0]))
+			with results_lock:
+				results[used_idx] = result
+
+
+
+"""
+Evaluates candidates with helper processes
+Args:
+	candidates			: List of candidates (tuples of index of features)
+	datasets			: Datasets as returned by read_datasets()
+	working_directory	: Directory to store generated files
+	num_processes		: Number of helper processes
+	results				: Dictionary to store the result of every candidate
+	results_lock		: Lock to synchronize access to results
+Rets:
+	None
+"""
+def evaluate_candidates(candidates, datasets, working_directory, num_processes, results, results_lock):
+	jobs = mp.Queue()
+	for candidate in candidates:
+		jobs.put(candidate)
+
+	processes = []
+	for ID in range(min(num_processes, len(candidates))):
+		process = mp.Process(target = worker_search, args = (ID, jobs, datasets, working_directory, results, results_lock, ))
+		process.start()
+		processes.append(process)
+
+	# Cleanup processes
+	for process in processes:
+		process.join()
+
+
+
+"""
+Generates the name of a subset of features
+Args:
+	used_idx	: Tuple of index of features
+Rets:
+	Names of features separated by "+"
+"""
+def get_subset_name(used_idx):
+	return "+".join(FEATURE_NAMES[idx] for idx in used_idx)
+
+
+
+def main():
+	working_directory = sys.argv[1] # Directory generated by perceptron_server_router_meta_merge.py
+	num_processes = int(sys.argv[2])
+	mode = sys.argv[3] if len(sys.argv) > 3 else FEATURE_SEARCH_MODE
+	assert(mode in [SEARCH_ALL, SEARCH_GREEDY])
+
+	os.system("rm -rf " + working_directory + "/worker_logs_search")
+	os.system("mkdir " + working_directory + "/worker_logs_search")	# Logs generated by workers who evaluate candidates are stored here. The format is worker_<ID>
+
+	# Step 1: Read the features once
+	print("Reading features")
+	datasets = read_datasets(working_directory)
+	search_features = get_search_features(working_directory, datasets)
+	print("Read " + str(len(datasets)) + " jobs. Searching over " + get_subset_name(search_features))
+	print("Done!")
+
+	# Step 2: Evaluate candidates
+	manager = mp.Manager()
+	results = manager.dict()	# {used_idx : (accuracy, false_positives, false_negatives)}
+	results_lock = mp.Lock()
+	if(mode == SEARCH_ALL):
+		print("Evaluating all the subsets")
+		candidates = [subset for size in range(1, len(search_features) + 1) for subset in itertools.combinations(search_features, size)]
+		evaluate_candidates(candidates, datasets, working_directory, num_processes, results, results_lock)
+	else:
+		print("Evaluating subsets by greedy forward selection")
+		selected = ()
+		best_accuracy = -1.0
+		while len(selected) < len(search_features):
+			candidates = [tuple(sorted(selected + (idx, ))) for idx in search_features if idx not in selected]
+			evaluate_candidates(candidates, datasets, working_directory, num_processes, results, results_lock)
+			best_candidate = max(candidates, key = lambda candidate : results[candidate][0])
+			if(results[best_candidate][0] <= best_accuracy):	# Stop once adding a feature doesn't help
+				break
+			selected, best_accuracy = best_candidate, results[best_candidate][0]
+			print("Selected " + get_subset_name(selected) + " with accuracy " + str(best_accuracy) + "%")
+	print("Done!")
+
+	# Step 3: Rank the candidates
+	print("Ranking subsets")
+	ranking = sorted(results.items(), key = lambda item : (-item[1][0], len(item[0])))	# Smaller subsets first if accuracy is same
+	with open(working_directory + "/" + FEATURE_SEARCH_REPORT, "w") as report:
+		report.write("Rank\tused_idx\t: Accuracy, False positives, False negatives\tFeatures\n")
+		for rank, (used_idx, (accuracy, false_positives, false_negatives)) in enumerate(ranking):
+			line = str(rank + 1) + "\t" + str(list(used_idx)) + "\t: " + "%.4f" % accuracy + ", " + "%.4f" % false_positives + ", " + "%.4f" % false_negatives + "\t" + get_subset_name(used_idx)
+			report.write(line + "\n")
+			print(line)
+	print("Ranking written to " + working_directory + "/" + FEATURE_SEARCH_REPORT)
+	print("Done!")
+
+
+if __name__ == '__main__':
+	main()
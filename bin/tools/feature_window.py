@@ -0,0 +1,232 @@
+"""
+This module implements the moving window averages used by pre_process() of the server scripts and perceptron.py.
+The windows store prefix sums, hence the average of a sample is computed as
+	(prefix[e] - prefix[e - avg_cycles + 1]) / min(PARSED_FEATURE_COUNT * e + f + 1, avg_cycles)
+where e is the index of sample and f is the index of feature. This reproduces the original implementation exactly i.e.
+	1.) The sum of a window has the last avg_cycles - 1 samples
+	2.) The divisor is incremented once for every feature of a sample (warm-up) and is capped at avg_cycles
+The prefix sums are computed in the same order of additions as the original implementation, hence the results are bit exact.
+A window of a single cycle gives the samples as is (the original implementation fails for it).
+Several windows can be computed together from the same prefix sums (multi-scale windows). Their features are placed one after the other.
+Both a batch version (all ports in one pass) and an incremental version (O(max window) state per port) are provided.
+An exponential moving average with O(1) state per feature is provided as an alternative to the windows (refer to create_ema()).
+The module can be imported by tools in this directory via the following line
+	import feature_window
+"""
+
+import numpy as np		# Used to take averages
+import feature_parser	# Used for number of parsed features
+
+
+
+"""
+Generates the divisors of samples of a window
+Args:
+	entries		: Array of index of samples since the start of the window
+	avg_cycles	: Length of moving average window
+Rets:
+	Array of shape (samples, PARSED_FEATURE_COUNT) with the divisors
+"""
+def get_counts(entries, avg_cycles):
+	return np.minimum(feature_parser.PARSED_FEATURE_COUNT * entries[:, None] + np.arange(feature_parser.PARSED_FEATURE_COUNT) + 1, avg_cycles)
+
+
+
+"""
+Takes the moving averages of a block of samples for every window from a single array of prefix sums
+Args:
+	prefix	: Array of shape (..., max(windows) + samples, PARSED_FEATURE_COUNT). The first max(windows) prefix sums are of earlier samples (0 if none)
+	values	: Array of shape (..., samples, PARSED_FEATURE_COUNT) with the samples
+	entries	: Array of index of samples since the start of the window
+	windows	: List of lengths of moving average windows
+Rets:
+	Array of shape (..., samples, PARSED_FEATURE_COUNT * len(windows)). The features of every window are placed together in the order of windows
+"""
+def get_window_averages(prefix, values, entries, windows):
+	history = max(windows)
+	samples = values.shape[-2]
+	averages = []
+	for avg_cycles in windows:
+		if(avg_cycles == 1):	# Window of a single cycle is the sample itself
+			averages.append(values)
+			continue
+		start = history - avg_cycles + 1
+		sums = prefix[..., history:, :] - prefix[..., start : start + samples, :]
+		averages.append(sums / get_counts(entries, avg_cycles))
+	return np.concatenate(averages, axis = -1)
+
+
+
+"""
+Takes the moving averages of features of all the ports in a single pass. All the windows share the same prefix sums.
+Args:
+	values	: Array of shape (ports, cycles, PARSED_FEATURE_COUNT)
+	windows	: List of lengths of moving average windows
+Rets:
+	Array of shape (ports, cycles, PARSED_FEATURE_COUNT * len(windows)) as returned by get_window_averages()
+"""
+def moving_average(values, windows):
+	ports, cycles, features = values.shape
+	history = max(windows)
+	prefix = np.zeros((ports, history + cycles, features))
+	np.cumsum(values, axis = 1, out = prefix[:, history:])
+	return get_window_averages(prefix, values, np.arange(cycles), windows)
+
+
+
+"""
+Replaces the features in router_info by the output of an averaging function. Ports with the same number of samples are averaged together.
+Args:
+	router_info	: Input data (Not preserved). The format is
+		{((router_x, router_Y), port)	:	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time, ...], ...], ...}
+	average		: Function which takes an array of shape (ports, cycles, PARSED_FEATURE_COUNT) and returns an array of shape (ports, cycles, any)
+Rets:
+	router_info	: The features of every sample are replaced by the output of average
+"""
+def apply_router_info(router_info, average):
+	groups = {}	# {samples : [router_port, ...]}
+	for router_port in router_info:
+		if(len(router_info[router_port]) > 0):
+			groups.setdefault(len(router_info[router_port]), []).append(router_port)
+
+	features = feature_parser.PARSED_FEATURE_COUNT
+	for router_ports in groups.values():
+		values = np.stack([np.array(router_info[router_port], dtype = np.float64)[:, 1 : 1 + features] for router_port in router_ports])
+		averages = average(values)
+		averaged_features = averages.shape[-1]
+		for router_port, port_averages in zip(router_ports, averages):
+			flat_averages = port_averages.ravel().tolist()	# A single list of floats is much cheaper to create than a list per sample
+			for entry_idx, entry in enumerate(router_info[router_port]):
+				entry[1 : 1 + features] = flat_averages[averaged_features * entry_idx : averaged_features * (entry_idx + 1)]
+
+	return router_info
+
+
+
+"""
+Takes the moving averages of the features in router_info
+Args:
+	router_info	: Input data (Not preserved). Format is same as apply_router_info()
+	windows		: List of lengths of moving average windows
+Rets:
+	router_info	: The features of every sample are replaced by their averages over every window i.e.
+		{((router_x, router_Y), port)	:	[[cycle, features averaged over windows[0], features averaged over windows[1], ..., ...], ...], ...}
+"""
+def average_router_info(router_info, windows):
+	return apply_router_info(router_info, lambda values : moving_average(values, windows))
+
+
+
+"""
+Takes the exponential moving averages of the features in router_info
+Args:
+	router_info	: Input data (Not preserved). Format is same as apply_router_info()
+	half_life	: Number of samples after which the weight of a sample is halved
+Rets:
+	router_info	: The features of every sample are replaced by their exponential moving averages
+"""
+def ema_router_info(router_info, half_life):
+	return apply_router_info(router_info, lambda values : average_ema(create_ema(half_life), values))
+
+
+
+"""
+Selects the features averaged over a window
+Args:
+	features	: Array of shape (samples, PARSED_FEATURE_COUNT * len(windows)) as stored by pre_process()
+				  Features which weren't averaged over multiple windows i.e. of shape (samples, PARSED_FEATURE_COUNT) are returned as is
+	windows		: List of lengths of moving average windows used by pre_process()
+	avg_cycles	: Length of the required window
+Rets:
+	Array of shape (samples, PARSED_FEATURE_COUNT)
+"""
+def select_window(features, windows, avg_cycles):
+	if(features.shape[1] == feature_parser.PARSED_FEATURE_COUNT):
+		return features
+	assert(features.shape[1] == feature_parser.PARSED_FEATURE_COUNT * len(windows))
+	start = windows.index(avg_cycles) * feature_parser.PARSED_FEATURE_COUNT
+	return features[:, start : start + feature_parser.PARSED_FEATURE_COUNT]
+
+
+
+"""
+Creates the state of an incremental moving average window
+Args:
+	windows	: List of lengths of moving average windows
+Rets:
+	window	: Dictionary with the following format
+		{"windows" : windows, "prefix" : Last max(windows) prefix sums of every feature, "entries" : No. of samples averaged till now}
+"""
+def create_window(windows):
+	return {"windows" : windows, "prefix" : np.zeros((max(windows), feature_parser.PARSED_FEATURE_COUNT)), "entries" : 0}
+
+
+
+"""
+Takes the moving averages of the next samples of a port. Only O(max(windows)) state is kept between calls.
+Calling it on consecutive blocks of samples gives the same result as moving_average() on all the samples.
+Args:
+	window	: State as returned by create_window() (Not preserved)
+	values	: Array of shape (samples, PARSED_FEATURE_COUNT)
+Rets:
+	Array of shape (samples, PARSED_FEATURE_COUNT * len(windows)) as returned by get_window_averages()
+"""
+def average_window(window, values):
+	history = len(window["prefix"])
+	samples = len(values)
+
+	# Prefix sums are continued from the last prefix sum in the same order of additions as moving_average()
+	prefix = np.cumsum(np.concatenate((window["prefix"][-1:], values)), axis = 0)[1:]
+	extended = np.concatenate((window["prefix"], prefix))
+	averages = get_window_averages(extended, values, window["entries"] + np.arange(samples), window["windows"])
+
+	window["prefix"] = extended[-history:]
+	window["entries"] += samples
+	return averages
+
+
+
+"""
+Creates the state of an exponential moving average (EMA). Only O(1) state is kept for every feature.
+The EMA of sample e is
+	ema[e] = decay * ema[e - 1] + (1 - decay) * value[e], where decay = 0.5 ^ (1 / half_life) and ema[-1] = 0
+The output is ema[e] / (1 - decay ^ (e + 1)) so that the initial samples aren't biased towards 0 i.e. the weights of samples always add up to 1.
+Args:
+	half_life	: Number of samples after which the weight of a sample is halved
+Rets:
+	ema	: Dictionary with the following format
+		{"decay" : decay, "value" : ema of the last sample of every feature, "entries" : No. of samples averaged till now}
+"""
+def create_ema(half_life):
+	assert(half_life > 0)
+	return {"decay" : 0.5 ** (1.0 / half_life), "value" : np.zeros(feature_parser.PARSED_FEATURE_COUNT), "entries" : 0}
+
+
+
+# The samples of an EMA are processed in blocks within which the weights decay by at most 2 ^ EMA_BLOCK_HALF_LIVES
+# This keeps the rounding error of the closed form below 2 ^ (EMA_BLOCK_HALF_LIVES - 52)
+EMA_BLOCK_HALF_LIVES = 16
+"""
+Takes the exponential moving averages of the next samples. Calling it on consecutive blocks of samples gives the same result as a single call (up to rounding).
+Within a block of length L, the recurrence is evaluated in closed form as
+	ema[t] = decay ^ (t + 1) * (ema[-1] + (1 - decay) * sum(value[k] / decay ^ (k + 1) for k in 0..t))
+Args:
+	ema		: State as returned by create_ema() (Not preserved). It's broadcasted to the leading dimensions of values on the first call
+	values	: Array of shape (..., samples, PARSED_FEATURE_COUNT)
+Rets:
+	Array of same shape as values with the averages
+"""
+def average_ema(ema, values):
+	decay = ema["decay"]
+	samples = values.shape[-2]
+	block = max(1, int(EMA_BLOCK_HALF_LIVES * np.log(0.5) / np.log(decay)))	# Length of block in which weights decay by 2 ^ EMA_BLOCK_HALF_LIVES
+
+	averages = np.empty(np.broadcast_shapes(values.shape, ema["value"].shape))
+	for start in range(0, samples, block):
+		end = min(start + block, samples)
+		powers = (decay ** np.arange(1, end - start + 1))[:, None]
+		emas = powers * (ema["value"][..., None, :] + (1 - decay) * np.cumsum(values[..., start : end, :] / powers, axis = -2))
+		ema["value"] = emas[..., -1, :]
+		averages[..., start : end, :] = emas / (1 - decay ** (ema["entries"] + np.arange(1, end - start + 1)))[:, None]
+		ema["entries"] += end - start
+	return averages
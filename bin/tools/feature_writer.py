@@ -0,0 +1,133 @@
+"""
+This module implements a dedicated writer process for the per_port_features generated by worker_gen.
+Instead of every worker writing a shard of every port on every job, the workers push blocks of columns onto a queue and return immediately.
+A single writer process
+	1.) Coalesces the blocks of every port in memory
+	2.) Writes a port as a single large shard once it has WRITER_FLUSH_SIZE bytes (and everything that's left at the end)
+	3.) Logs the number of bytes written and the output bandwidth
+The workers are blocked (backpressure) while the blocks in the queue take more than WRITER_MEMORY_BUDGET bytes.
+The writer flushes all the ports once its own buffers take more than WRITER_MEMORY_BUDGET bytes, hence at most twice the budget is held in memory.
+The module can be imported by tools in this directory via the following line
+	import feature_writer
+"""
+
+import time						# Used to measure bandwidth
+import multiprocessing as mp	# Used to run writer in a separate process
+import numpy as np				# Used to coalesce blocks
+import feature_store			# Used to write shards
+
+# Limits on buffered data (in bytes)
+WRITER_MEMORY_BUDGET	= 256 * (1 << 20)	# Maximum size of blocks in queue and of blocks buffered by the writer
+WRITER_FLUSH_SIZE		= 16 * (1 << 20)	# A port is written once it has these many bytes
+
+# Name of the writer used for the shards (refer to feature_store.write_shard())
+WRITER_NAME = "writer"
+
+
+
+"""
+Starts the writer process
+Args:
+	log_path	: Path of the log file of the writer
+Rets:
+	writer	: Dictionary which is passed to the workers. The format is
+		{"queue" : Queue of blocks, "pending" : Bytes in queue, "condition" : Condition to wait for space in queue}
+	process	: Writer process
+"""
+def start_writer(log_path):
+	writer = {"queue" : mp.Queue(), "pending" : mp.Value("q", 0, lock = False), "condition" : mp.Condition()}
+	process = mp.Process(target = run_writer, args = (writer, log_path, ))
+	process.start()
+	return writer, process
+
+
+
+"""
+Pushes a block of samples of a port to the writer. Blocks till there is space in the queue.
+Args:
+	writer						: Writer as returned by start_writer()
+	store_path					: Path of store of the port
+	cycles, features, labels	: Columns of the samples
+Rets:
+	None
+"""
+def put(writer, store_path, cycles, features, labels):
+	size = cycles.nbytes + features.nbytes + labels.nbytes
+	with writer["condition"]:
+		while writer["pending"].value > 0 and writer["pending"].value + size > WRITER_MEMORY_BUDGET:	# A single large block is always accepted
+			writer["condition"].wait()
+		writer["pending"].value += size
+	writer["queue"].put((store_path, cycles, features, labels))
+
+
+
+"""
+Stops the writer process after all the queued blocks are written
+Args:
+	writer	: Writer as returned by start_writer()
+	process	: Writer process
+Rets:
+	None
+"""
+def stop_writer(writer, process):
+	writer["queue"].put(None)
+	process.join()
+
+
+
+"""
+Loop of the writer process. Runs till stop_writer() is called.
+Args:
+	writer		: Writer as returned by start_writer()
+	log_path	: Path of the log file
+Rets:
+	None
+"""
+def run_writer(writer, log_path):
+	with open(log_path, "w", buffering = 1) as log:
+		log.write("Writer\tStarting...\n")
+		buffers = {}	# {store_path : [(cycles, features, labels), ...]}
+		buffered_sizes = {}	# {store_path : bytes}
+		stats = {"blocks" : 0, "shards" : 0, "bytes" : 0, "write_time" : 0.0}
+		start_time = time.perf_counter()
+
+		# Writes the buffered blocks of a port as a single shard
+		def flush(store_path):
+			blocks = buffers.pop(store_path)
+			size = buffered_sizes.pop(store_path)
+			columns = [np.concatenate([block[idx] for block in blocks]) for idx in range(len(feature_store.COLUMNS))]
+			write_start = time.perf_counter()
+			feature_store.write_shard(store_path, WRITER_NAME, *columns)
+			stats["write_time"] += time.perf_counter() - write_start
+			stats["shards"] += 1
+			stats["bytes"] += size
+
+		while True:
+			block = writer["queue"].get()
+			if(block is None):
+				break
+			store_path = block[0]
+			size = sum(column.nbytes for column in block[1:])
+			with writer["condition"]:	# The block has left the queue
+				writer["pending"].value -= size
+				writer["condition"].notify_all()
+
+			stats["blocks"] += 1
+			buffers.setdefault(store_path, []).append(block[1:])
+			buffered_sizes[store_path] = buffered_sizes.get(store_path, 0) + size
+			if(buffered_sizes[store_path] >= WRITER_FLUSH_SIZE):
+				flush(store_path)
+			elif(sum(buffered_sizes.values()) >= WRITER_MEMORY_BUDGET):
+				for buffered_store_path in list(buffers):
+					flush(buffered_store_path)
+
+		for store_path in list(buffers):	# Write whatever is left
+			flush(store_path)
+
+		# Log bandwidth
+		total_time = time.perf_counter() - start_time
+		megabytes = stats["bytes"] / (1 << 20)
+		log.write("Writer\tReceived " + str(stats["blocks"]) + " blocks and wrote " + str(stats["shards"]) + " shards\n")
+		log.write("Writer\tWrote " + "%.2f" % megabytes + " MiB in " + "%.2f" % stats["write_time"] + " s of writing (" + "%.2f" % (megabytes / max(stats["write_time"], 1e-9)) + " MiB/s)\n")
+		log.write("Writer\tOutput bandwidth over the lifetime of writer is " + "%.2f" % (megabytes / max(total_time, 1e-9)) + " MiB/s\n")
+		log.write("Writer\tExiting...\n")
@@ -0,0 +1,357 @@
+"""
+This module is used to run noxim through a content addressed cache of simulation results.
+The features and log generated by noxim depend only on:
+	1.) The bytes of traffic table
+	2.) The bytes of my_config.yaml and power.yaml
+	3.) The dimensions of grid and other command line options
+	4.) The noxim executable
+A sha256 hash of all of these is used as the key of a cache entry. Every entry stores the finished feature file and the log.
+The cache is stored in NOXIM_CACHE_DIRECTORY and is not removed when the server scripts overwrite their working directory.
+Once the cache grows beyond NOXIM_CACHE_SIZE, the least recently used entries are evicted. The total size of entries is kept in
+CACHE_SIZE_FILE and is updated incrementally, hence the cache is walked only when it has to be evicted (or when the file is missing).
+Cached files are hard linked into the working directories, hence the outputs of noxim are always unlinked before it runs
+so that it never writes through a link into the cache.
+The module can be imported by tools in this directory via the following line
+	from noxim_cache import run_noxim, start_noxim
+NOTE: The cache can be cleared by simply removing NOXIM_CACHE_DIRECTORY
+"""
+
+import os									# Used to access files
+import shutil								# Used to copy and remove files
+import hashlib								# Used to hash the inputs of noxim
+import subprocess							# Used to run noxim in background
+from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock the cache during eviction
+
+# Paths of noxim and its configuration files w.r.t. the tools directory
+NOXIM_PATH			= "./../noxim"
+CONFIG_PATH			= "./../../personal_configs/my_config.yaml"
+POWER_CONFIG_PATH	= "./../power.yaml"
+
+# Cache configuration
+NOXIM_CACHE_DIRECTORY	= "noxim_cache"
+NOXIM_CACHE_SIZE		= 200 * (1 << 30)	# Maximum size of cache in bytes
+ENABLE_NOXIM_CACHE		= True
+
+# Names of files inside a cache entry
+CACHED_FEATURES	= "features"
+CACHED_LOG		= "log"
+CACHE_LOCK		= ".lock"
+CACHE_SIZE_FILE	= ".size"
+
+# Size of blocks used while hashing files
+HASH_BLOCK_SIZE = 1 << 20
+
+# Hash of files which don't change during a run i.e. noxim and configuration files
+static_hashes = {}
+
+
+
+"""
+Updates the hash with the contents of a file
+Args:
+	hasher		: hashlib object to update (Not preserved)
+	file_path	: Path of file to hash
+Rets:
+	None
+"""
+def hash_file(hasher, file_path):
+	with open(file_path, "rb") as f:
+		block = f.read(HASH_BLOCK_SIZE)
+		while block:
+			hasher.update(block)
+			block = f.read(HASH_BLOCK_SIZE)
+
+
+
+"""
+Generates the hash of a file which stays constant throughout a run. The hash is computed only once per process.
+Args:
+	file_path	: Path of file to hash
+Rets:
+	Hex digest of the file
+"""
+def get_static_hash(file_path):
+	if(file_path not in static_hashes):
+		hasher = hashlib.sha256()
+		hash_file(hasher, file_path)
+		static_hashes[file_path] = hasher.hexdigest()
+	return static_hashes[file_path]
+
+
+
+"""
+Generates the key of a cache entry
+Args:
+	traffic_table	: Path of traffic table
+	dim_x, dim_y	: Dimensions of grid
+	options			: List of additional command line options passed to noxim
+	features		: True if the feature file is generated
+Rets:
+	key	: A hex string which uniquely identifies the simulation
+"""
+def get_key(traffic_table, dim_x, dim_y, options, features):
+	hasher = hashlib.sha256()
+	hasher.update(get_static_hash(NOXIM_PATH).encode())
+	hasher.update(get_static_hash(CONFIG_PATH).encode())
+	hasher.update(get_static_hash(POWER_CONFIG_PATH).encode())
+	hasher.update(("dimx " + str(dim_x) + " dimy " + str(dim_y) + " features " + str(features) + " " + " ".join(options)).encode())
+	hash_file(hasher, traffic_table)
+	return hasher.hexdigest()
+
+
+
+"""
+Generates the path of the cache entry for a key
+Args:
+	key	: Key of the entry
+Rets:
+	Path of the directory of entry
+"""
+def get_entry_path(key):
+	return NOXIM_CACHE_DIRECTORY + "/" + key[:2] + "/" + key
+
+
+
+"""
+Places a file from cache at the destination. A hard link is used if possible, else the file is copied.
+Args:
+	src	: Path of file in cache
+	dst	: Destination path
+Rets:
+	None
+"""
+def place_file(src, dst):
+	if(os.path.exists(dst)):
+		os.remove(dst)
+	try:
+		os.link(src, dst)
+	except OSError:
+		shutil.copyfile(src, dst)
+
+
+
+"""
+Fetches the simulation results from cache
+Args:
+	key				: Key of the entry
+	feature_file	: Destination of the feature file. None if not required
+	log_file		: Destination of the log file
+Rets:
+	True if the entry was found, False otherwise
+"""
+def fetch(key, feature_file, log_file):
+	entry_path = get_entry_path(key)
+	if(not os.path.isfile(entry_path + "/" + CACHED_LOG)):	# The log is stored last, hence it marks a complete entry
+		return False
+	if(feature_file is not None and not os.path.isfile(entry_path + "/" + CACHED_FEATURES)):
+		return False
+
+	try:
+		if(feature_file is not None):
+			place_file(entry_path + "/" + CACHED_FEATURES, feature_file)
+		place_file(entry_path + "/" + CACHED_LOG, log_file)
+		os.utime(entry_path)	# Mark the entry as recently used
+	except FileNotFoundError:	# The entry was evicted by some other process
+		return False
+
+	return True
+
+
+
+"""
+Calculates the size of a cache entry
+Args:
+	entry_path	: Path of the directory of entry
+Rets:
+	Size of entry in bytes
+"""
+def get_entry_size(entry_path):
+	size = 0
+	for file_name in os.listdir(entry_path):
+		size += os.path.getsize(entry_path + "/" + file_name)
+	return size
+
+
+
+"""
+Walks the cache and lists its entries
+Args:
+	None
+Rets:
+	entries		: List of [last_used, size, path] of every entry
+	total_size	: Size of all the entries in bytes
+"""
+def get_entries():
+	entries = []
+	total_size = 0
+	for prefix in os.listdir(NOXIM_CACHE_DIRECTORY):
+		prefix_path = NOXIM_CACHE_DIRECTORY + "/" + prefix
+		if(not os.path.isdir(prefix_path)):
+			continue
+		for key in os.listdir(prefix_path):
+			entry_path = prefix_path + "/" + key
+			try:
+				size = get_entry_size(entry_path)
+				entries.append([os.path.getmtime(entry_path), size, entry_path])
+				total_size += size
+			except FileNotFoundError:	# Entry is being written or removed
+				continue
+	return entries, total_size
+
+
+
+"""
+Removes least recently used entries till the size of cache is within NOXIM_CACHE_SIZE. It must be called with the lock of cache held.
+Args:
+	None
+Rets:
+	total_size	: Size of the entries which are left in bytes
+"""
+def evict():
+	entries, total_size = get_entries()
+	entries.sort()	# Oldest entries come first
+	for last_used, size, entry_path in entries:
+		if(total_size <= NOXIM_CACHE_SIZE):
+			break
+		shutil.rmtree(entry_path, ignore_errors = True)
+		total_size -= size
+	return total_size
+
+
+
+"""
+Adds the size of a new entry to the size of cache and evicts entries if the cache has grown beyond NOXIM_CACHE_SIZE.
+The size is kept in CACHE_SIZE_FILE, hence the cache is walked only if it has to be evicted or if the file is missing.
+Args:
+	entry_size	: Size of the new entry in bytes
+Rets:
+	None
+"""
+def add_entry_size(entry_size):
+	size_path = NOXIM_CACHE_DIRECTORY + "/" + CACHE_SIZE_FILE
+	with open(NOXIM_CACHE_DIRECTORY + "/" + CACHE_LOCK, "w") as lock_file:
+		lockf(lock_file, LOCK_EX)	# Acquire a lock so that only one process updates the size at a time
+
+		try:
+			with open(size_path, "r") as size_file:
+				total_size = int(size_file.read()) + entry_size
+		except (FileNotFoundError, ValueError):	# The size isn't known, hence the cache (including the new entry) is walked
+			total_size = get_entries()[1]
+		if(total_size > NOXIM_CACHE_SIZE):
+			total_size = evict()
+		with open(size_path, "w") as size_file:
+			size_file.write(str(total_size))
+
+		lockf(lock_file, LOCK_UN)	# Release the lock
+
+
+
+"""
+Stores the simulation results in cache
+Args:
+	key				: Key of the entry
+	feature_file	: Path of the generated feature file. None if not generated
+	log_file		: Path of the generated log file
+Rets:
+	None
+"""
+def store(key, feature_file, log_file):
+	entry_path = get_entry_path(key)
+	temp_path = entry_path + ".tmp." + str(os.getpid())	# Write to a temporary directory first so that readers never see partial entries
+	os.makedirs(temp_path, exist_ok = True)
+
+	if(feature_file is not None):
+		shutil.copyfile(feature_file, temp_path + "/" + CACHED_FEATURES)
+	shutil.copyfile(log_file, temp_path + "/" + CACHED_LOG)
+
+	try:
+		os.rename(temp_path, entry_path)
+	except OSError:	# Some other process already stored the same entry
+		shutil.rmtree(temp_path, ignore_errors = True)
+		return
+
+	add_entry_size(get_entry_size(entry_path))
+
+
+
+"""
+Removes the outputs of noxim if they exist. Cached files are hard linked into the working directories (refer to place_file()),
+hence noxim would otherwise truncate and overwrite the cache entry through the link.
+Args:
+	output_files	: List of paths of files which noxim writes. None is ignored
+Rets:
+	None
+"""
+def remove_outputs(output_files):
+	for output_file in output_files:
+		if(output_file is not None and os.path.lexists(output_file)):
+			os.unlink(output_file)
+
+
+
+"""
+Generates the shell command which runs noxim
+Args:
+	traffic_table	: Path of traffic table
+	feature_file	: Path of the feature file to generate. None if features are not required
+	log_file		: Path of the log file to generate
+	dim_x, dim_y	: Dimensions of grid
+	options			: List of additional command line options passed to noxim. None if there are no options
+Rets:
+	cmd	: Command as a string
+"""
+def get_command(traffic_table, feature_file, log_file, dim_x, dim_y, options = None):
+	if(options is None):
+		options = []
+	cmd = NOXIM_PATH + " -topology MESH -dimx " + str(dim_x) + " -dimy " + str(dim_y) + " -traffic table " + traffic_table + "  -config " + CONFIG_PATH + " -power " + POWER_CONFIG_PATH
+	if(len(options) > 0):
+		cmd += " " + " ".join(options)
+	if(feature_file is not None):
+		cmd += " -features " + feature_file
+	cmd += " > " + log_file
+	return cmd
+
+
+
+"""
+Runs noxim on a traffic table. The cache is consulted before launching noxim and is updated after it finishes.
+Args:
+	traffic_table	: Path of traffic table
+	feature_file	: Path of the feature file to generate. None if features are not required
+	log_file		: Path of the log file to generate
+	dim_x, dim_y	: Dimensions of grid
+	options			: List of additional command line options passed to noxim. None if there are no options
+Rets:
+	True if the results were fetched from cache, False if noxim was run
+"""
+def run_noxim(traffic_table, feature_file, log_file, dim_x, dim_y, options = None):
+	if(options is None):
+		options = []
+	key = None
+	if(ENABLE_NOXIM_CACHE):
+		key = get_key(traffic_table, dim_x, dim_y, options, feature_file is not None)
+		if(fetch(key, feature_file, log_file)):
+			return True
+
+	remove_outputs([feature_file, log_file])	# The outputs may be hard linked to a cache entry by an earlier fetch
+	status = os.system(get_command(traffic_table, feature_file, log_file, dim_x, dim_y, options))
+
+	if(ENABLE_NOXIM_CACHE and status == 0):	# Only successful simulations are cached
+		store(key, feature_file, log_file)
+
+	return False
+
+
+
+"""
+Starts noxim on a traffic table without waiting for it to finish. The cache is not used.
+This is used when the features are streamed through a FIFO (-features_stream) and are consumed while noxim runs.
+Only the log is removed before starting noxim as the feature file is the FIFO created by the caller.
+Args:
+	Same as run_noxim()
+Rets:
+	process	: subprocess.Popen object of noxim
+"""
+def start_noxim(traffic_table, feature_file, log_file, dim_x, dim_y, options = None):
+	remove_outputs([log_file])	# The log may be hard linked to a cache entry by an earlier fetch
+	return subprocess.Popen(get_command(traffic_table, feature_file, log_file, dim_x, dim_y, options), shell = True)
@@ -0,0 +1,149 @@
+"""
+This tool is used to benchmark the vectorized feature parser (feature_parser.parse_features) against the line by line parser.
+A synthetic feature file of an 8x8 mesh is generated, both the parsers are run on the ports of a path and the outputs are compared.
+The vectorized parser is also run with the projection of USED_FEATURES and on the same features in binary format.
+The tool can be used via the following command
+	python3 path/to/this/file [number_of_cycles] [path/to/feature/file]
+Default number of cycles is 100000. If the path of a feature file is given, the file is generated only if it doesn't exist.
+NOTE: The line by line parser needs several GBs of memory for 100000 cycles.
+"""
+
+import sys				# Used to read arguments
+import os				# Used to remove generated file
+import time				# Used to measure time
+import tempfile			# Used to generate a temporary feature file
+import numpy as np		# Used to generate synthetic features
+import feature_parser	# Parsers to benchmark
+
+# Parsed features used by the projected run
+USED_FEATURES = [0,1,4]
+
+# Rows of the synthetic feature file are generated in blocks of this many cycles
+GENERATION_BLOCK = 10000
+
+
+
+"""
+Generates a synthetic feature file in the format written by noxim
+Args:
+	feature_file	: Name of file to write
+	cycles			: Number of cycles to simulate
+Rets:
+	None
+"""
+def generate_feature_file(feature_file, cycles):
+	routers = feature_parser.DIM_X * feature_parser.DIM_Y
+	rng = np.random.default_rng(0)
+	with open(feature_file, "w") as out:
+		for router_id in range(routers):	# noxim writes all the cycles of a router together
+			for start in range(0, cycles, GENERATION_BLOCK):
+				block = min(GENERATION_BLOCK, cycles - start)
+				data = np.empty((block, feature_parser.PORT_FEATURE_OFFSET + feature_parser.DIRECTIONS * feature_parser.PORT_FEATURE_COUNT), dtype = np.int64)
+				data[:, feature_parser.ROUTER_ID] = router_id
+				data[:, feature_parser.CYCLE] = np.arange(start, start + block) + 1000
+				ports = data[:, feature_parser.PORT_FEATURE_OFFSET:].reshape(block, feature_parser.DIRECTIONS, feature_parser.PORT_FEATURE_COUNT)
+				ports[:, :, feature_parser.BUFFER_CAPACITY] = 4
+				ports[:, :, feature_parser.BUFFER_STATUS] = rng.integers(0, 5, (block, feature_parser.DIRECTIONS))
+				ports[:, :, feature_parser.CYCLES_SINCE_LAST_FLIT] = rng.integers(0, 1000, (block, feature_parser.DIRECTIONS))
+				ports[:, :, feature_parser.STALLED_FLITS] = rng.integers(0, 3, (block, feature_parser.DIRECTIONS))
+				ports[:, :, feature_parser.TRANSMITTED_FLITS] = rng.integers(0, 3, (block, feature_parser.DIRECTIONS))
+				ports[:, :, feature_parser.CUMULATIVE_LATENCY] = ports[:, :, feature_parser.TRANSMITTED_FLITS] * rng.integers(1, 20, (block, feature_parser.DIRECTIONS))
+				np.savetxt(out, data, fmt = "%d", delimiter = ", ")
+
+
+
+"""
+Converts a text feature file to the binary format written by noxim with -features_format bin
+Args:
+	feature_file		: Name of text feature file
+	binary_feature_file	: Name of binary file to write
+Rets:
+	None
+"""
+def write_binary_feature_file(feature_file, binary_feature_file):
+	data = feature_parser.read_lines(feature_file)
+	header = np.zeros(1, dtype = feature_parser.BINARY_HEADER_DTYPE)
+	header["magic"] = feature_parser.BINARY_MAGIC
+	header["version"] = feature_parser.BINARY_VERSION
+	header["dim_x"] = feature_parser.DIM_X
+	header["dim_y"] = feature_parser.DIM_Y
+	header["virtual_channels"] = 1
+	header["directions"] = feature_parser.DIRECTIONS
+	header["port_feature_count"] = feature_parser.PORT_FEATURE_COUNT
+	header["field_count"] = data.shape[1]
+	with open(binary_feature_file, "wb") as bin_out:
+		header.tofile(bin_out)
+		data.astype(feature_parser.BINARY_FIELD_DTYPE).tofile(bin_out)
+
+
+
+"""
+Runs a parser and measures the time taken
+Args:
+	parser				: Parser to run
+	feature_file		: Name of feature file
+	router_and_ports	: Ports to parse
+	kwargs				: Additional arguments of parser
+Rets:
+	router_info	: Output of parser
+	Time taken in seconds
+"""
+def time_parser(parser, feature_file, router_and_ports, **kwargs):
+	with open(os.devnull, "w") as log:
+		start = time.perf_counter()
+		router_info = parser(feature_file, router_and_ports, log, 0, **kwargs)
+		return router_info, time.perf_counter() - start
+
+
+
+def main():
+	cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	feature_file = sys.argv[2] if len(sys.argv) > 2 else None
+	remove_file = feature_file is None
+	if(feature_file is None):
+		feature_file = tempfile.mkstemp(prefix = "features_")[1]
+
+	if(remove_file or not os.path.isfile(feature_file)):
+		print("Generating " + str(cycles) + " cycles of features for 8x8 mesh in " + feature_file)
+		generate_feature_file(feature_file, cycles)
+
+	# Ports on the XY path from (0, 3) to (7, 5)
+	router_and_ports = [((0, 3), feature_parser.DIRECTION_LOCAL)]
+	router_and_ports += [((x, 3), feature_parser.DIRECTION_WEST) for x in range(1, feature_parser.DIM_X)]
+	router_and_ports += [((feature_parser.DIM_X - 1, y), feature_parser.DIRECTION_NORTH) for y in range(4, 6)]
+	router_and_ports += [((feature_parser.DIM_X - 1, 5), feature_parser.DIRECTION_PE)]
+
+	vectorized_info, vectorized_time = time_parser(feature_parser.parse_features, feature_file, router_and_ports)
+	print("Vectorized parser:\t" + str(vectorized_time) + " s")
+	projected_info, projected_time = time_parser(feature_parser.parse_features, feature_file, router_and_ports, used_features = USED_FEATURES)
+	print("Projected parser:\t" + str(projected_time) + " s")
+	binary_feature_file = feature_file + ".bin"
+	write_binary_feature_file(feature_file, binary_feature_file)
+	binary_info, binary_time = time_parser(feature_parser.parse_features, binary_feature_file, router_and_ports, features_format = feature_parser.FEATURES_FORMAT_BIN)
+	print("Binary reader:\t\t" + str(binary_time) + " s")
+	os.remove(binary_feature_file)
+	text_info, text_time = time_parser(feature_parser.parse_features_text, feature_file, router_and_ports)
+	print("Line by line parser:\t" + str(text_time) + " s")
+
+	print("Outputs match: " + str(vectorized_info == text_info))
+	print("Binary outputs match: " + str(binary_info == text_info))
+
+	# Unused features are 0 in the output of projected parser
+	for entries in text_info.values():
+		for entry in entries:
+			for feature in range(feature_parser.PARSED_FEATURE_COUNT):
+				if(feature not in USED_FEATURES):
+					entry[1 + feature] = 0
+
+	print("Projected outputs match: " + str(projected_info == text_info))
+	print("Speedup: " + str(text_time / vectorized_time) + "x")
+	print("Speedup with projection: " + str(text_time / projected_time) + "x")
+	print("Speedup with binary reader: " + str(text_time / binary_time) + "x")
+
+	if(remove_file):
+		os.remove(feature_file)
+
+
+
+if __name__ == '__main__':
+	main()
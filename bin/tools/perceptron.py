@@ -12,6 +12,12 @@ import sys						# Used to read sys args
 from copy import deepcopy as cp	# Used to copy arrays
 from random import shuffle 		# Used to mix data around
 import os						# Used to remove training_report file
+import feature_parser			# Used to read binary feature files
+import feature_window			# Used to take moving average of features
+import feature_dataset			# Used to merge and split datasets without copying
+import perceptron_trainer		# Used for early stopping and modes of training
+import feature_stats			# Used to normalize features
+import numpy as np				# Used to handle features
 
 # Definitions for directions
 DIRECTIONS 		= 5
@@ -109,6 +115,9 @@ PARSED_STALLED_FLITS			= 3
 PARSED_TRANSMITTED_FLITS		= 4
 PARSED_BUFFER_WAITING_TIME		= 5
 PARSED_ANNOTATION				= 6
+# Format of feature file. Binary files (FEATURES_FORMAT_BIN) are written by the current noxim, hence they are memory mapped by feature_parser.py
+# Text files are parsed below as they have the older layout (ROUTER_FLITS and DIRECTIONS ports)
+FEATURES_FORMAT = feature_parser.FEATURES_FORMAT_TEXT
 """
 Parses the features from given file and generates data for given router and ports
 Args:
@@ -129,6 +138,14 @@ Rets:
 		buffer_waiting_time		: Average waiting time for all transmitted flits at current cycle
 """
 def parse_features(feature_file, router_and_ports):
+	if(FEATURES_FORMAT == feature_parser.FEATURES_FORMAT_BIN):
+		print("Reading from file :", feature_file)
+		router_ids = feature_parser.get_projection(router_and_ports, None, DIM_X)[0]	# Only the routers on the path and the routers connected to them are read
+		cycles, router_ids, features = feature_parser.load_features(feature_file, router_ids, None, FEATURES_FORMAT)
+		paired = feature_parser.pair_ports(cycles, router_ids, features, router_and_ports, DIM_X)
+		print("Done!")
+		return {router_port : feature_parser.columns_to_entries(paired[router_port]) for router_port in router_and_ports}
+
 	# # Initialise router_info. This is done so that later this can be used as hash set to query whether a router and port pair is required
 	# router_info = {}
 	# for router_port in router_and_ports:
@@ -228,31 +245,11 @@ def pre_process(router_info):
 	# 	[0, 0, 1] : avg is 1-0/1 = 1
 	# 	[0, 1, 3] : avg is 3-0/2 =  3/2 (Notice instread of 2, we inserted 2 + window[-1])
 	# 	[1, 3, 5] : avg is 5-1/3 = 4/3 (Notice instread of 3, we inserted 3 + window[-1])
-	# This makes the time complexity independent of AVG_CYCLES
+	# This makes the time complexity independent of AVG_CYCLES. The cumulative sums of all the ports are computed together (refer to feature_window.py)
 
 	# Start moving average process
 	print("Taking moving average of size", AVG_CYCLES)
-	for router_port in router_info:
-		windows = {	# initialize windows
-			PARSED_BUFFER_STATUS 			: [0] * AVG_CYCLES,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: [0] * AVG_CYCLES,
-			PARSED_STALLED_FLITS			: [0] * AVG_CYCLES,
-			PARSED_TRANSMITTED_FLITS		: [0] * AVG_CYCLES,
-			PARSED_BUFFER_WAITING_TIME		: [0] * AVG_CYCLES
-		}
-
-		current_number_of_elements_in_window = 0
-		for entry_idx in range(len(router_info[router_port])): # Iterate over sample points
-			for feature in windows: # Iterate over every feature
-				windows[feature].pop(0)	# remoove the first element 
-				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature] # Calculate the value to be added
-				windows[feature].append(value_to_insert)	# Insert the value
-				current_number_of_elements_in_window += 1
-				current_number_of_elements_in_window = min(current_number_of_elements_in_window, AVG_CYCLES) # This ensures that when taling average, we divide by the correct no. of elements
-				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window	# Calculate average
-
-				router_info[router_port][entry_idx][feature] = avg	# Update to average value
-	
+	router_info = feature_window.average_router_info(router_info, [AVG_CYCLES])	# All the ports are averaged in a single pass
 	print("Done!")
 	return router_info
 
@@ -260,8 +257,13 @@ def pre_process(router_info):
 
 # definition for nomalization value
 NORMALIZATION_VALUE = 10
+ENABLE_NORMALIZATION = False
+NORMALIZATION_MODE = feature_stats.NORMALIZATION_MIN_MAX	# Refer to feature_stats.py for other modes
+NORMALIZATION_STATS_SUFFIX = "_normalization"	# The statistics are stored in TRAINING_REPORT + NORMALIZATION_STATS_SUFFIX
 """
 Normalizes every feature between 0 and NORMALIZATION_VALUE
+The statistics (min, max, mean and variance) are computed in a single pass over all the ports together, hence every port is scaled
+the same way. They are written next to the training report so that the same normalization can be applied while testing.
 Args:
 	router_info	: Input data (Not preserved)
 Rets:
@@ -269,44 +271,19 @@ Rets:
 """
 def normalize_data(router_info):
 	print("Normalizing...")
+	stats = feature_stats.create_stats(PARSED_FEATURE_COUNT)
 	for router_port in router_info:
-		# Initialize values
-		max_vals = {	# Initialize max values
-			PARSED_BUFFER_STATUS 			: -1e5,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: -1e5,
-			PARSED_STALLED_FLITS			: -1e5,
-			PARSED_TRANSMITTED_FLITS		: -1e5,
-			PARSED_BUFFER_WAITING_TIME		: -1e5
-		}
-		min_vals = {	# Initialize min values
-			PARSED_BUFFER_STATUS 			: 1e5,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: 1e5,
-			PARSED_STALLED_FLITS			: 1e5,
-			PARSED_TRANSMITTED_FLITS		: 1e5,
-			PARSED_BUFFER_WAITING_TIME		: 1e5
-		}
-
-		# Calculate max and min value
-		for entry_idx in range(len(router_info[router_port])):
-			# Update min and max values
-			for feature in max_vals:
-				max_vals[feature] = max(router_info[router_port][entry_idx][feature], max_vals[feature])
-				min_vals[feature] = min(router_info[router_port][entry_idx][feature], min_vals[feature])
+		if(len(router_info[router_port]) > 0):
+			feature_stats.update_stats(stats, np.array(router_info[router_port], dtype = np.float64)[:, PARSED_BUFFER_STATUS : PARSED_BUFFER_STATUS + PARSED_FEATURE_COUNT])
+	feature_stats.write_stats(TRAINING_REPORT + NORMALIZATION_STATS_SUFFIX, stats, NORMALIZATION_MODE, NORMALIZATION_VALUE)
 
-		# Map value via following equation: new_val = (old_val - min_val) * NORMALIZATION_VALUE / (max_val - min_val)
-		for entry_idx in range(len(router_info[router_port])):
-			for feature in max_vals:
-				old_value = router_info[router_port][entry_idx][feature]	# Fetch old value
-				new_value = -1
-				if(max_vals[feature] == min_vals[feature]):	# Check if feature never changed
-					new_value = 0	# Set as zero as this has no effect on perceptron
-				else:
-					new_value = (old_value - min_vals[feature]) * (NORMALIZATION_VALUE / (max_vals[feature] - min_vals[feature]))	# Calculate scaled value
-				router_info[router_port][entry_idx][feature] = new_value # Update to new value
+	# Map value via following equation: new_val = (old_val - min_val) * NORMALIZATION_VALUE / (max_val - min_val)
+	router_info = feature_window.apply_router_info(router_info, lambda values : feature_stats.normalize(values, stats, NORMALIZATION_MODE, NORMALIZATION_VALUE))
 	print("Done!")
 	return router_info
 
 
+
 # Define saturation levels
 SATURATED = 1.0
 UNSATURATED = 0.0
@@ -345,38 +322,14 @@ Args:
 Rets:
 	test	: Testing part of data
 	train	: Training part of data
-	The format for both is same as input
+	The format for both is same as input. The rows aren't copied
 """
 def test_train_splitter(current_info):
-	# Split the data into satured and unsatured to ensure better mixing
-	# Initialize both sets	
-	saturated = [] 
-	unsaturated = []
-
-	# Add data to saturated and unsatured sets
-	for info in current_info:
-		if(info[PARSED_ANNOTATION] == SATURATED):
-			saturated.append(cp(info))
-		else:
-			unsaturated.append(cp(info))
-
-	# Make test and train sets
-	test = []
-	train = []
-
-	# Add saturated datapoints
-	split_index = int(TRAINING_RATIO * len(saturated))
-	train += saturated[:split_index]
-	test += saturated[split_index:]
-
-	# Add unsaturated datapoints
-	split_index = int(TRAINING_RATIO * len(unsaturated))
-	train += unsaturated[:split_index]
-	test += unsaturated[split_index:]	
-
-	# Shuffle the test and train sets
-	shuffle(test)
-	shuffle(train)
+	# Split the saturated and unsaturated datapoints separately to ensure better mixing
+	# Only the indices are shuffled. The rows of test and train sets are shared with current_info
+	test_indices, train_indices = feature_dataset.split_indices([info[PARSED_ANNOTATION] for info in current_info], TRAINING_RATIO)
+	test = feature_dataset.take_rows(current_info, test_indices)
+	train = feature_dataset.take_rows(current_info, train_indices)
 
 	return test, train
 
@@ -402,6 +355,18 @@ def predict(bias, weights, vector):
 # Learning parameters
 EPOCHS = 2500
 LEARNING_RATE = 0.0001
+# Early stopping (refer to perceptron_trainer.create_early_stopping()). Training stops before EPOCHS once the error hasn't improved by
+# a fraction EARLY_STOPPING_DELTA for EARLY_STOPPING_PATIENCE epochs. The error is the squared error of training, or the error on
+# VALIDATION_RATIO of the training samples if it isn't 0 (these samples are held out of training)
+ENABLE_EARLY_STOPPING = False
+EARLY_STOPPING_PATIENCE = 50
+EARLY_STOPPING_DELTA = 0.01
+VALIDATION_RATIO = 0.0
+# Mode of training i.e. the weights which are kept (refer to perceptron_trainer.py)
+#	PERCEPTRON_PLAIN	: Weights after the last update
+#	PERCEPTRON_POCKET	: Weights of the epoch with the lowest error on training (or validation) samples
+#	PERCEPTRON_AVERAGED	: Average of weights after every sample
+TRAINING_MODE = perceptron_trainer.PERCEPTRON_PLAIN
 """
 Learns the weights for percepton
 Args:
@@ -413,6 +378,15 @@ Rets:
 def train_weights(train):
 	bias = 0.0
 	weights = [0] * PARSED_FEATURE_COUNT
+	stopping = perceptron_trainer.create_early_stopping(EARLY_STOPPING_PATIENCE, EARLY_STOPPING_DELTA) if ENABLE_EARLY_STOPPING else None
+	validation = None
+	if(stopping is not None and VALIDATION_RATIO > 0):	# Hold out validation samples
+		validation_indices, train_indices = feature_dataset.split_indices([data_point[-1] for data_point in train], 1 - VALIDATION_RATIO)
+		validation = feature_dataset.take_rows(train, validation_indices)
+		train = feature_dataset.take_rows(train, train_indices)
+	sum_bias, sum_weights, occurrences = 0.0, [0] * PARSED_FEATURE_COUNT, 0	# Sums of weights after every sample for PERCEPTRON_AVERAGED
+	pocket = (float("inf"), bias, list(weights))	# (error, bias, weights) of the best epoch for PERCEPTRON_POCKET
+	model = (bias, weights)	# Initial weights if no epoch runs
 	for epoch in range(EPOCHS):	# Iterate over all epochs
 		print("Running epoch:", epoch + 1, "out of", EPOCHS, end = "")
 		shuffle(train)	# Shuffle dataset on each pass
@@ -425,9 +399,29 @@ def train_weights(train):
 			bias += LEARNING_RATE * error # Update bias
 			for w_idx in range(len(weights)):	# Update weights
 				weights[w_idx] += LEARNING_RATE * error * data_features[w_idx]
+			if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+				sum_bias += bias
+				for w_idx in range(len(weights)):
+					sum_weights[w_idx] += weights[w_idx]
+				occurrences += 1
 			# print(bias, weights)
 		print(" Error:", sq_error, '\t\t\t\t\t', end = "\r")
+
+		# Weights learnt till now
+		if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_POCKET):
+			error = 100 - test_weights(train if validation is None else validation, weights, bias)
+			if(error < pocket[0]):
+				pocket = (error, bias, list(weights))
+			model = pocket[1:]
+		elif(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+			model = (sum_bias / max(occurrences, 1), [weight / max(occurrences, 1) for weight in sum_weights])	# There are no occurrences if train is empty
+		else:
+			model = (bias, weights)
+		if(stopping is not None and perceptron_trainer.update_early_stopping(stopping, sq_error if validation is None else 100 - test_weights(validation, model[1], model[0]))):
+			break
 	print()
+	print("Trained for", epoch + 1, "out of", EPOCHS, "epochs")
+	bias, weights = model
 	return bias, weights
 
 
@@ -652,8 +646,7 @@ def merge_info(set_1, set_2):
 	print("Merging....")
 	merged = {}
 	for router_port in set_1:
-		merged[router_port] = cp(set_1[router_port])	# Add enteries from set 1
-		merged[router_port].extend(cp(set_2[router_port]))	# Add enteries from set 2
+		merged[router_port] = feature_dataset.concatenate([set_1[router_port], set_2[router_port]])	# Rows are shared with both the sets
 
 	print("Done!")
 	return merged
@@ -674,17 +667,17 @@ def main():
 		# Generate data for unsaturated case
 		router_info_unsaturated = parse_features(sys.argv[1], path)
 		router_info_unsaturated = pre_process(router_info_unsaturated)
-		# router_info_unsaturated = normalize_data(router_info_unsaturated)
 		router_info_unsaturated = annotate_data(router_info_unsaturated, 1e5)	# Since the start cycle is 1e5, all enteries are annotated as unsaturated
 
 		# Generate data for saturated case
 		router_info_saturated = parse_features(sys.argv[2], path)
 		router_info_saturated = pre_process(router_info_saturated)
-		# router_info_saturated = normalize_data(router_info_saturated)
 		router_info_saturated = annotate_data(router_info_saturated, -1)	# Since the start cycle is -1, all enteries are annotated as saturated
 
 		# Merge datasets and run experiment
 		router_info = merge_info(router_info_unsaturated, router_info_saturated)
+		if(ENABLE_NORMALIZATION):	# Both the datasets are normalized together
+			router_info = normalize_data(router_info)
 		accuracy = run_experiment(router_info)
 		print("total accuracy is:", str(accuracy) + "%")
 
@@ -693,7 +686,8 @@ def main():
 		path = generate_path(router_1, router_2)
 		router_info = parse_features(sys.argv[1], path)
 		router_info = pre_process(router_info)
-		# router_info = normalize_data(router_info)
+		if(ENABLE_NORMALIZATION):
+			router_info = normalize_data(router_info)
 		router_info = annotate_data(router_info, start_cycle)
 		accuracy = run_experiment(router_info)
 		print("total accuracy is:", str(accuracy) + "%")
@@ -15,6 +15,15 @@ from queue import Empty						# Used for Empty exception
 from copy import deepcopy as cp				# Used to copy arrays
 from random import shuffle 					# Used to mix data around
 from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock files
+from noxim_cache import run_noxim, start_noxim	# Used to run noxim via cache of simulation results or in background
+import numpy as np							# Used to handle columns of feature store
+import feature_store						# Used to read and write per port and per router features
+import feature_parser						# Used to parse feature files generated by noxim
+import feature_stream						# Used to consume features while noxim runs
+import feature_window						# Used to take moving average of features
+import feature_dataset						# Used to merge and split datasets without copying
+import perceptron_trainer					# Used for early stopping and modes of training
+import feature_writer						# Used to write per port features from a dedicated process
 
 # Dimensions of grid. It's used to calculate index of router
 DIM_X = 8
@@ -116,6 +125,17 @@ PARSED_STALLED_FLITS			= 3
 PARSED_TRANSMITTED_FLITS		= 4
 PARSED_BUFFER_WAITING_TIME		= 5
 PARSED_ANNOTATION				= 6
+
+# Parsed features (0 based index excluding cycle) which are read from feature files. Other features are set to 0
+# It must include the used_idx of perceptron. Set to None to read all the features
+USED_FEATURES = [0,1,4]
+
+# Options to reduce the size of feature files generated by noxim
+FEATURE_INTERVAL				= 1		# Features are generated every FEATURE_INTERVAL cycles
+ENABLE_FEATURE_ROUTER_FILTER	= True	# If True, attack features are generated only for the routers needed by the path
+FEATURES_FORMAT					= feature_parser.FEATURES_FORMAT_TEXT	# Format of feature files. Binary files (FEATURES_FORMAT_BIN) are memory mapped instead of being parsed
+ENABLE_FEATURE_STREAM			= False	# If True, attack features are streamed through a FIFO and processed while noxim runs
+ENABLE_FEATURE_WRITER			= True	# If True, per port features are coalesced and written by a dedicated writer process (refer to feature_writer.py)
 """
 Parses the features from given file and generates data for given router and ports
 Args:
@@ -138,80 +158,40 @@ Rets:
 		buffer_waiting_time		: Average waiting time for all transmitted flits at current cycle
 """
 def parse_features(feature_file, router_and_ports, log, ID):
-	all_info = {}	# This dictionary stores the parsed data
-
-	# Read data from csv file
-	log.write("Process #" + str(ID) + "\tReading from file: " + feature_file + "\n")
-	print("Process #" + str(ID) + "\tReading from file: " + feature_file)
-	with open(feature_file, 'r') as csv_in:
-		current_info = csv_in.readline()
-		while current_info:
-			data = current_info.split(", ") # data temporarily stores the parsed features. It's of the type list
-			data = list(map(int, data))	# Map everything to integers
-			# Calculate the router index in the format (router_x, router_y)
-			router_id = data[ROUTER_ID] 
-			router_x = router_id % DIM_X
-			router_y = router_id // DIM_X
-			router = (router_x, router_y)
-
-			cycle = data[CYCLE] # Extract out the cycle
-
-			# Iterate over all ports and add data to router_info if needed
-			for port in range(DIRECTIONS):
-				start_index = PORT_FEATURE_OFFSET + (port * PORT_FEATURE_COUNT) # This is the index of first feature for port (inclusive)
-				end_index = start_index + PORT_FEATURE_COUNT  # This is the last index for features of port (exclusive)
-				value = data[start_index : end_index] # Extract out features
-
-				# Insert data into to all_info
-				router_port = (router, port) # This is used as the key in all_info
-				if(router_port not in all_info):
-					all_info[router_port] = [] # Create a list if one doesn't exist yet
-				all_info[router_port].append([cycle] + value) # Insert the value i.e features
-
-			current_info = csv_in.readline()	# Read next line
-
-	# Generate output dictionary
-	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
-	print("Process #" + str(ID) + "\tGenerating Router info")
-	router_info = {}	 # Initialize output dictionary
-	for router_port in router_and_ports:
-		router_info[router_port] = [] # Initialize entry in all info
-
-		other_router = get_connected_router_and_port(router_port) # Get connected router
-
-		assert(len(all_info[other_router]) == len(all_info[router_port]))
-		enteries = len(all_info[router_port])	 # Get total number of enteries
-		for idx in range(enteries):
-			current_cycle_entry = []
-			assert(all_info[other_router][idx][CURRENT_CYCLE] == all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Start inserting parameters
-			# Cycle
-			current_cycle_entry.append(all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Rx features
-			current_cycle_entry.append(all_info[router_port][idx][BUFFER_STATUS])
-			current_cycle_entry.append(all_info[router_port][idx][CYCLES_SINCE_LAST_FLIT])
-			
-			# Tx features
-			current_cycle_entry.append(all_info[other_router][idx][STALLED_FLITS])
-			current_cycle_entry.append(all_info[other_router][idx][TRANSMITTED_FLITS])
-			if(all_info[other_router][idx][TRANSMITTED_FLITS] == 0):	# Check if no flits were transmitted
-				current_cycle_entry.append(0)	# No flits transmitteed i.e 0 wating time
-			else:
-				current_cycle_entry.append(all_info[other_router][idx][CUMULATIVE_LATENCY] / all_info[other_router][idx][TRANSMITTED_FLITS])	# Buffer waiting time = total time the flits waited / No. of flits
-
-			router_info[router_port].append(current_cycle_entry) # Insert in router info
-	return router_info
+	return feature_parser.parse_features(feature_file, router_and_ports, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT)	# Only routers on the path and columns of USED_FEATURES are converted
 
 
 
 # Length of moving average window
 AVG_CYCLES = 5
 ENABLE_AVG_WINDOW = False
+# Lengths of moving average windows which are taken together and stored as extra columns (refer to feature_window.py)
+# Used only if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW are True. Must contain AVG_CYCLES, whose features are used for training
+MULTI_SCALE_AVG_CYCLES = [1, 5, 25, 100]
+ENABLE_MULTI_SCALE_WINDOW = False
+# Half life (in samples) of exponential moving average. If ENABLE_EMA is True, it's taken instead of the moving window average
+# Only O(1) state is kept for every feature, hence streamed features (ENABLE_FEATURE_STREAM) are averaged in constant memory
+EMA_HALF_LIFE = 5
+ENABLE_EMA = False
+"""
+Generates the lengths of moving average windows taken by pre_process()
+Args:
+	None
+Rets:
+	List of lengths of windows
+"""
+def get_avg_windows():
+	avg_windows = MULTI_SCALE_AVG_CYCLES if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW and not ENABLE_EMA else [AVG_CYCLES]
+	assert(AVG_CYCLES in avg_windows)
+	return avg_windows
+
+
+
 """
 Modifies the data in router info.
 Currently configured to take a moving window average on various parameters. The size of window is AVG_CYCLES
+If ENABLE_MULTI_SCALE_WINDOW is True, the averages of every window in MULTI_SCALE_AVG_CYCLES are taken from the same cumulative sums
+If ENABLE_EMA is True, an exponential moving average with half life of EMA_HALF_LIFE samples is taken instead
 Args:
 	router_info	: Input data (Not preserved)
 	log			: File to print log to
@@ -220,10 +200,16 @@ Rets:
 	router_info	: Output data
 The input and output formats are
 	{((router_x, router_Y), port)	:	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time], ...], ...}
+	With multiple windows, the features of every window are placed one after the other in the order of MULTI_SCALE_AVG_CYCLES
 """
 def pre_process(router_info, log, ID):
 	log.write("Process #" + str(ID) + "\tPre-processing data\n")
 	print("Process #" + str(ID) + "\tPre-processing data")
+	if(ENABLE_EMA):
+		log.write("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE) + "\n")
+		print("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE))
+		return feature_window.ema_router_info(router_info, EMA_HALF_LIFE)
+
 	if(not ENABLE_AVG_WINDOW):	# Return without doing anything if not enabled
 		return router_info
 
@@ -234,32 +220,13 @@ def pre_process(router_info, log, ID):
 	# 	[0, 0, 1] : avg is 1-0/1 = 1
 	# 	[0, 1, 3] : avg is 3-0/2 =  3/2 (Notice instread of 2, we inserted 2 + window[-1])
 	# 	[1, 3, 5] : avg is 5-1/3 = 4/3 (Notice instread of 3, we inserted 3 + window[-1])
-	# This makes the time complexity independent of AVG_CYCLES
+	# This makes the time complexity independent of AVG_CYCLES. The cumulative sums of all the ports are computed together (refer to feature_window.py)
 
 	# Start moving average process
-	log.write("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES) + "\n")
-	print("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES))
-	for router_port in router_info:
-		windows = {	# initialize windows
-			PARSED_BUFFER_STATUS 			: [0] * AVG_CYCLES,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: [0] * AVG_CYCLES,
-			PARSED_STALLED_FLITS			: [0] * AVG_CYCLES,
-			PARSED_TRANSMITTED_FLITS		: [0] * AVG_CYCLES,
-			PARSED_BUFFER_WAITING_TIME		: [0] * AVG_CYCLES
-		}
-
-		current_number_of_elements_in_window = 0
-		for entry_idx in range(len(router_info[router_port])): # Iterate over sample points
-			for feature in windows: # Iterate over every feature
-				windows[feature].pop(0)	# remove the first element 
-				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature] # Calculate the value to be added
-				windows[feature].append(value_to_insert)	# Insert the value
-				current_number_of_elements_in_window += 1
-				current_number_of_elements_in_window = min(current_number_of_elements_in_window, AVG_CYCLES) # This ensures that when taling average, we divide by the correct no. of elements
-				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window	# Calculate average
-
-				router_info[router_port][entry_idx][feature] = avg	# Update to average value
-	
+	avg_windows = get_avg_windows()
+	log.write("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)) + "\n")
+	print("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)))
+	router_info = feature_window.average_router_info(router_info, avg_windows)	# All the ports are averaged in a single pass
 	return router_info
 
 
@@ -307,8 +274,7 @@ def merge_info(set_1, set_2, log, ID):
 	print("Process #" + str(ID) + "\tMerging")
 	merged = {}
 	for router_port in set_1:
-		merged[router_port] = cp(set_1[router_port])	# Add enteries from set 1
-		merged[router_port].extend(cp(set_2[router_port]))	# Add enteries from set 2
+		merged[router_port] = feature_dataset.concatenate([set_1[router_port], set_2[router_port]])	# Rows are shared with both the sets
 
 	return merged
 
@@ -405,11 +371,31 @@ def get_router_port_name(router_port):
 	return get_router_name(router_port[0]) + "." + str(router_port[1])
 
 
+"""
+Runs noxim once on the unmodified benchmark to generate the baseline features.
+The baseline traffic table is same for every attack pair, hence all the jobs share this feature file.
+Args:
+	benchmark_name		: Root name of the benchmark to use
+	working_directory	: Directory to store generated files
+Rets:
+	feature_file_path	: Path of the baseline feature file
+"""
+def generate_baseline(benchmark_name, working_directory):
+	source_file_path = working_directory + "/" + benchmark_name
+	feature_file_path = working_directory + "/unparsed_features/baseline"
+	log_file_path = working_directory + "/logs/baseline"
+
+	run_noxim(source_file_path, feature_file_path, log_file_path, DIM_X, DIM_Y, feature_parser.get_noxim_options(None, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))	# Baseline is shared by all the paths
+
+	return feature_file_path
+
+
+
 """
 Method called by processes to generate features.
 The method does the following:
-1.) Creates traffic tables for attack and baseline scenarios
-2.) Calls noxim to generate feature files
+1.) Creates traffic table for attack scenario
+2.) Calls noxim to generate attack feature file
 3.) Parses the feature files
 4.) Cleans and annotates feature files
 5.) Writes to per_port_features
@@ -418,10 +404,12 @@ Args:
 	jobs				: Queue of jobs to be completed
 	benchmark_name		: Root name of the benchmark to use
 	working_directory	: Directory to store generated files
+	feature_file_path_baseline	: Baseline feature file shared by all the jobs
+	writer				: Writer as returned by feature_writer.start_writer(). None if the workers write the shards themselves
 Rets:
 	None
 """
-def worker_gen(ID, jobs, benchmark_name, working_directory):
+def worker_gen(ID, jobs, benchmark_name, working_directory, feature_file_path_baseline, writer):
 	with open(working_directory + "/worker_logs_gen/worker_" + str(ID), "w", buffering = 1) as log:	# Open file for log
 		log.write("Process #" + str(ID) + "\tStarting...\n")
 		print("Process #" + str(ID) + "\tStarting...")
@@ -448,7 +436,6 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 				print("Process #" + str(ID) + "\tWriting traffic tables")
 				
 				source_file_path = working_directory + "/" + benchmark_name
-				baseline_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				attack_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
 				attack_string = str(src_idx) + "\t" + str(dst_idx) + "\t1\t1\t1\t1000000\n"
@@ -458,44 +445,47 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 					with open(attack_file_path, "w") as attack_file:
 						attack_file.write(attack_string)
 						attack_file.writelines(lines)
+				#--------------------------------------------------------------------------------------------------------------------------
 
-				os.system("cp " + source_file_path  + " " + baseline_file_path)
+				# Step 2.1: Generating path
+				log.write("Process #" + str(ID) + "\tGenerating path\n")
+				print("Process #" + str(ID) + "\tGenerating path")
+				path = generate_path(list(src), list(dst))
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 2: Call noxim to generate features
+				# Step 2.2: Call noxim to generate features
 				log.write("Process #" + str(ID) + "\tCalling noxim\n")
 				print("Process #" + str(ID) + "\tCalling noxim")
 
-				feature_file_path_baseline = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				feature_file_path_attack = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 
-				log_file_path_baseline = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				log_file_path_attack = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
-				cmd_baseline = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + baseline_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_baseline + " > " + log_file_path_baseline
-				cmd_attack = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + attack_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_attack + " > " + log_file_path_attack
-
-				os.system(cmd_baseline)
-				os.system(cmd_attack)
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 3.1: Generating path
-				log.write("Process #" + str(ID) + "\tGenerating path\n")
-				print("Process #" + str(ID) + "\tGenerating path")
-				path = generate_path(list(src), list(dst))
+				feature_routers = path if ENABLE_FEATURE_ROUTER_FILTER else None
+				if(ENABLE_FEATURE_STREAM):	# Features are parsed, projected and averaged while noxim runs, hence no feature file is written
+					feature_file_path_attack += ".fifo"
+					feature_stream.create_fifo(feature_file_path_attack)
+					process = start_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT, True))
+					router_info_attack = feature_stream.stream_features(feature_file_path_attack, process, path, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT, get_avg_windows() if ENABLE_AVG_WINDOW else None, EMA_HALF_LIFE if ENABLE_EMA else None)
+					os.remove(feature_file_path_attack)
+				elif(run_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))):
+					log.write("Process #" + str(ID) + "\tFetched attack features from cache\n")
+					print("Process #" + str(ID) + "\tFetched attack features from cache")
 				#--------------------------------------------------------------------------------------------------------------------------
 				
-				# Step 3.2: Parse features
+				# Step 3.1: Parse features
 				log.write("Process #" + str(ID) + "\tParsing features\n")
 				print("Process #" + str(ID) + "\tParsing features")
 				
 				router_info_baseline = parse_features(feature_file_path_baseline, path, log, ID)
-				router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
+				if(not ENABLE_FEATURE_STREAM):
+					router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 3.3: Pre process data
+				# Step 3.2: Pre process data
 				router_info_baseline = pre_process(router_info_baseline, log, ID)
-				router_info_attack = pre_process(router_info_attack, log, ID)			
+				if(not ENABLE_FEATURE_STREAM):	# Streamed features are already averaged
+					router_info_attack = pre_process(router_info_attack, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
 				# Step 4.1: Clean and annotate data
@@ -511,12 +501,12 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 				log.write("Process #" + str(ID) + "\tWriting per port feature\n")
 				print("Process #" + str(ID) + "\tWriting per port feature")
 				for router_port in router_info:
-					per_port_features_file_name = working_directory + "/per_port_features/" + get_router_port_name(router_port)
-					with open(per_port_features_file_name, "a") as per_port_file:
-						lockf(per_port_file, LOCK_EX)	# Acquire a lock
-						for entry in router_info[router_port]:
-							per_port_file.write(", ".join(map(str, entry)) + "\n")
-						lockf(per_port_file, LOCK_UN)	# Release the lock
+					per_port_features_store = working_directory + "/per_port_features/" + get_router_port_name(router_port)
+					cycles, features, labels = feature_store.rows_to_columns(router_info[router_port])
+					if(writer is not None):
+						feature_writer.put(writer, per_port_features_store, cycles, features, labels)	# Coalesced and written by the writer process
+					else:
+						feature_store.write_shard(per_port_features_store, "worker_" + str(ID), cycles, features, labels)	# Every worker writes its own shards, hence no lock is needed
 				#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
@@ -554,6 +544,18 @@ def predict(bias, weights, vector):
 # Learning parameters
 EPOCHS = 100
 LEARNING_RATE = 0.00001
+# Early stopping (refer to perceptron_trainer.create_early_stopping()). Training stops before EPOCHS once the error hasn't improved by
+# a fraction EARLY_STOPPING_DELTA for EARLY_STOPPING_PATIENCE epochs. The error is the squared error of training, or the error on
+# VALIDATION_RATIO of the training samples if it isn't 0 (these samples are held out of training)
+ENABLE_EARLY_STOPPING = False
+EARLY_STOPPING_PATIENCE = 3
+EARLY_STOPPING_DELTA = 0.01
+VALIDATION_RATIO = 0.0
+# Mode of training i.e. the weights which are kept (refer to perceptron_trainer.py)
+#	PERCEPTRON_PLAIN	: Weights after the last update
+#	PERCEPTRON_POCKET	: Weights of the epoch with the lowest error on training (or validation) samples
+#	PERCEPTRON_AVERAGED	: Average of weights after every sample
+TRAINING_MODE = perceptron_trainer.PERCEPTRON_PLAIN
 """
 Learns the weights for percepton
 Args:
@@ -568,6 +570,16 @@ def train_weights(train, log, ID):
 	used_idx = [0,1,4] # Use only buffer status, cycles since last flit and buffer waiting time
 	bias = 0.0
 	weights = [0] * PARSED_FEATURE_COUNT
+	stopping = perceptron_trainer.create_early_stopping(EARLY_STOPPING_PATIENCE, EARLY_STOPPING_DELTA) if ENABLE_EARLY_STOPPING else None
+	validation = None
+	if(stopping is not None and VALIDATION_RATIO > 0):	# Hold out validation samples
+		validation_indices, train_indices = feature_dataset.split_indices([data_point[-1] for data_point in train], 1 - VALIDATION_RATIO)
+		validation = feature_dataset.take_rows(train, validation_indices)
+		train = feature_dataset.take_rows(train, train_indices)
+	sum_bias, sum_weights, occurrences = 0.0, [0] * PARSED_FEATURE_COUNT, 0	# Sums of weights after every sample for PERCEPTRON_AVERAGED
+	pocket = (float("inf"), bias, list(weights))	# (error, bias, weights) of the best epoch for PERCEPTRON_POCKET
+	model = (bias, weights)	# Initial weights if no epoch runs
+	epoch = -1	# No epoch has run if EPOCHS is 0
 	for epoch in range(EPOCHS):	# Iterate over all epochs
 		log.write("Running epoch: " + str(epoch + 1) + " out of " + str(EPOCHS) + ":\t")
 		shuffle(train)	# Shuffle dataset on each pass
@@ -581,7 +593,27 @@ def train_weights(train, log, ID):
 			# for w_idx in range(len(weights)):	# Update weights
 			for w_idx in used_idx:	# Update weights
 				weights[w_idx] += LEARNING_RATE * error * data_features[w_idx]
+			if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+				sum_bias += bias
+				for w_idx in used_idx:
+					sum_weights[w_idx] += weights[w_idx]
+				occurrences += 1
 		log.write(str(sq_error) + "\n")
+
+		# Weights learnt till now
+		if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_POCKET):
+			error = 100 - test_weights(train if validation is None else validation, weights, bias)[0]
+			if(error < pocket[0]):
+				pocket = (error, bias, list(weights))
+			model = pocket[1:]
+		elif(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+			model = (sum_bias / max(occurrences, 1), [weight / max(occurrences, 1) for weight in sum_weights])	# There are no occurrences if train is empty
+		else:
+			model = (bias, weights)
+		if(stopping is not None and perceptron_trainer.update_early_stopping(stopping, sq_error if validation is None else 100 - test_weights(validation, model[1], model[0])[0])):
+			break
+	log.write("Process #" + str(ID) + "\tTrained for " + str(epoch + 1) + " out of " + str(EPOCHS) + " epochs\n")
+	bias, weights = model
 	return bias, weights
 
 
@@ -678,42 +710,14 @@ Args:
 Rets:
 	test	: Testing part of data
 	train	: Training part of data
-	The format for both is same as input
+	The format for both is same as input. The rows aren't copied
 """
 def test_train_splitter(current_info):
-	# Split the data into satured and unsatured to ensure better mixing
-	# Initialize both sets	
-	saturated = [] 
-	unsaturated = []
-
-	# Add data to saturated and unsatured sets
-	for info in current_info:
-		if(info[PARSED_ANNOTATION] == SATURATED):
-			saturated.append(cp(info))
-		else:
-			unsaturated.append(cp(info))
-
-	# Make test and train sets
-	test = []
-	train = []
-
-	# Shuffle data
-	shuffle(saturated)
-	shuffle(unsaturated)
-
-	# Add saturated datapoints
-	split_index = int(TRAINING_RATIO * len(saturated))
-	train += saturated[:split_index]
-	test += saturated[split_index:]
-
-	# Add unsaturated datapoints
-	split_index = int(TRAINING_RATIO * len(unsaturated))
-	train += unsaturated[:split_index]
-	test += unsaturated[split_index:]	
-
-	# Shuffle the test and train sets
-	shuffle(test)
-	shuffle(train)
+	# Split the saturated and unsaturated datapoints separately to ensure better mixing
+	# Only the indices are shuffled. The rows of test and train sets are shared with current_info
+	test_indices, train_indices = feature_dataset.split_indices([info[PARSED_ANNOTATION] for info in current_info], TRAINING_RATIO)
+	test = feature_dataset.take_rows(current_info, test_indices)
+	train = feature_dataset.take_rows(current_info, train_indices)
 
 	return test, train
 
@@ -740,7 +744,7 @@ def worker_train(ID, jobs, working_directory, accuracy_dict, accuracy_lock):
 		print("Process #" + str(ID) + "\tStarting...")
 		
 		# Compute till all jobs are done
-		while True:/home/iiitd/DoS_NoC/noxim/bin/tools/DoS_noxim_data_router
+		while True:
 
 			try:
 				job = jobs.get(timeout = 0.1) # Fetch next job
@@ -760,58 +764,58 @@ def worker_train(ID, jobs, working_directory, accuracy_dict, accuracy_lock):
 				print("Process #" + str(ID) +"\tParsing feature file")
 				
 				# Read the features
-				port_info = []
-				job_file_name = working_directory + "/per_port_features/" + job
-				with open(job_file_name, "r") as job_file:
-					lines = job_file.readlines()
-					for line in lines:
-						entry = list(map(float, line.split(",")))
-						port_info.append(entry)
-
-				if(len(port_info) == 0):
+				job_store_path = working_directory + "/per_port_features/" + job
+				cycles, features, labels = feature_store.read(job_store_path)
+
+				if(len(cycles) == 0):
 					log.write("Process #" + str(ID) +"\tNothing to do! Completed job. " + str(job) + "\n")
 					print("Process #" + str(ID) +"\tNothing to do! Completed job " + str(job))
 					continue
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 1.2: Train and test
-				log.write("Process #" + str(ID) +"\tTesting and training\n")
-				print("Process #" + str(ID) +"\tTesting and training")
-
-				accuracy = 0
-				test, train = test_train_splitter(port_info)
-				accuracy, false_positives, false_negatives, weights_and_biases = train_and_test(test, train, router_port, log, ID)
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 2.1: Write weights
-				log.write("Process #" + str(ID) +"\tWriting weights\n")
-				print("Process #" + str(ID) +"\tWriting weights")
-				weights_file_path = working_directory + "/weights"
-				with open(weights_file_path, "a") as weights_file:
-					lockf(weights_file, LOCK_EX)	# Acquire a lock
-					weights_file.write(", ".join(map(str, weights_and_biases)) + "\n")
-					lockf(weights_file, LOCK_UN)	# Release lock
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 2.2: Write accuracy
-				log.write("Process #" + str(ID) +"\tWriting accuracy\n")
-				print("Process #" + str(ID) +"\tWriting accuracy")
-				accuracy_file_path = working_directory + "/accuracy_report"
-				with open(accuracy_file_path, "a") as accuracy_file:
-					lockf(accuracy_file, LOCK_EX)	# Acquire lock
-					accuracy_file.write(str(job) + "\t: " + str(accuracy) + ", " + str(false_positives) + ", " + str(false_negatives) + "\n")
-					lockf(accuracy_file ,LOCK_UN)	# Release lock
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 3: Store accuracy
-				log.write("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy) + "\n")
-				print("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy))
-
-				log.write("Process #" + str(ID) +"\tStoring accuracy\n")
-				print("Process #" + str(ID) +"\tStoring accuracy")
-				with accuracy_lock:
-					accuracy_dict[job] = accuracy
-				#--------------------------------------------------------------------------------------------------------------------------
+				# Steps 1.2 to 3 are repeated for every moving average window. There is a single window unless ENABLE_MULTI_SCALE_WINDOW is True
+				for avg_cycles in get_avg_windows():
+					port_info = feature_store.columns_to_rows(cycles, feature_window.select_window(features, get_avg_windows(), avg_cycles), labels)
+					report_suffix = "" if avg_cycles == AVG_CYCLES else "_avg_" + str(avg_cycles)	# Weights and accuracy of other windows are written to separate files
+
+					# Step 1.2: Train and test
+					log.write("Process #" + str(ID) +"\tTesting and training\n")
+					print("Process #" + str(ID) +"\tTesting and training")
+
+					accuracy = 0
+					test, train = test_train_splitter(port_info)
+					accuracy, false_positives, false_negatives, weights_and_biases = train_and_test(test, train, router_port, log, ID)
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 2.1: Write weights
+					log.write("Process #" + str(ID) +"\tWriting weights\n")
+					print("Process #" + str(ID) +"\tWriting weights")
+					weights_file_path = working_directory + "/weights" + report_suffix
+					with open(weights_file_path, "a") as weights_file:
+						lockf(weights_file, LOCK_EX)	# Acquire a lock
+						weights_file.write(", ".join(map(str, weights_and_biases)) + "\n")
+						lockf(weights_file, LOCK_UN)	# Release lock
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 2.2: Write accuracy
+					log.write("Process #" + str(ID) +"\tWriting accuracy\n")
+					print("Process #" + str(ID) +"\tWriting accuracy")
+					accuracy_file_path = working_directory + "/accuracy_report" + report_suffix
+					with open(accuracy_file_path, "a") as accuracy_file:
+						lockf(accuracy_file, LOCK_EX)	# Acquire lock
+						accuracy_file.write(str(job) + "\t: " + str(accuracy) + ", " + str(false_positives) + ", " + str(false_negatives) + "\n")
+						lockf(accuracy_file ,LOCK_UN)	# Release lock
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 3: Store accuracy
+					log.write("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy) + "\n")
+					print("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy))
+
+					log.write("Process #" + str(ID) +"\tStoring accuracy\n")
+					print("Process #" + str(ID) +"\tStoring accuracy")
+					with accuracy_lock:
+						accuracy_dict[(job, avg_cycles)] = accuracy
+					#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
 				log.write("Process #" + str(ID) +"\tCompleted job " + str(job) + "\n")
@@ -856,8 +860,8 @@ def main():
 	# Start feature generation step
 	print("Starting feature generation")
 
-	# Create files to lock onto later
-	print("Creating per port feature files")
+	# Create stores to append onto later
+	print("Creating per port feature stores")
 
 	feature_file_names = set()
 	# Initially add all ports
@@ -885,8 +889,7 @@ def main():
 		feature_file_names.remove(feature_file_name_to_be_removed)
 
 	for feature_file_name in feature_file_names:
-		cmd = "touch " + dir_name + "/per_port_features/" + feature_file_name
-		os.system(cmd)
+		feature_store.create(dir_name + "/per_port_features/" + feature_file_name, USED_FEATURES)	# Features which aren't parsed are recorded in the manifest
 
 	print("Done!")
 
@@ -909,11 +912,19 @@ def main():
 					jobs.put((pair, router))
 	print("Done!")
 
+	# Generate baseline features once for all the jobs
+	print("Generating baseline features")
+	feature_file_path_baseline = generate_baseline(benchmark_name, dir_name)
+	print("Done!")
+
 	# Create processes and generate features
 	print("Starting processes")
 	num_processes = int(sys.argv[2])
+	writer, writer_process = None, None
+	if(ENABLE_FEATURE_WRITER):
+		writer, writer_process = feature_writer.start_writer(dir_name + "/worker_logs_gen/writer")
 	for ID in range(num_processes):
-		process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, ))
+		process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, feature_file_path_baseline, writer, ))
 		process.start()
 		processes.append(process)
 	
@@ -924,6 +935,18 @@ def main():
 	processes.clear()
 	print("Done!")
 
+	# Wait for the writer to write all the blocks
+	if(ENABLE_FEATURE_WRITER):
+		print("Waiting for writer")
+		feature_writer.stop_writer(writer, writer_process)
+		print("Done!")
+
+	# Fold the shards written by every worker into the manifest of every port
+	print("Compacting per port features")
+	for feature_file_name in os.listdir(dir_name + "/per_port_features"):
+		feature_store.compact(dir_name + "/per_port_features/" + feature_file_name)
+	print("Done!")
+
 	# Test and train features
 	print("Starting training")
 
@@ -958,15 +981,20 @@ def main():
 
 	# Find average accuracy
 	print("Calculating net accuracy")
-	total_jobs = 0
-	total_accuracy = 0
-	accuracy_net = 0
-	for job in accuracy:
-		total_jobs += 1
-		total_accuracy += accuracy[job]
-	if(total_jobs != 0):
-		accuracy_net = total_accuracy / total_jobs
-	print("Accuracy achieved is: " + str(accuracy_net) + "%")
+	for avg_cycles in get_avg_windows():
+		total_jobs = 0
+		total_accuracy = 0
+		accuracy_net = 0
+		for job, job_avg_cycles in accuracy.keys():
+			if(job_avg_cycles == avg_cycles):
+				total_jobs += 1
+				total_accuracy += accuracy[(job, job_avg_cycles)]
+		if(total_jobs != 0):
+			accuracy_net = total_accuracy / total_jobs
+		if(avg_cycles == AVG_CYCLES):
+			print("Accuracy achieved is: " + str(accuracy_net) + "%")
+		else:
+			print("Accuracy achieved with moving average of size " + str(avg_cycles) + " is: " + str(accuracy_net) + "%")
 
 	print("Done!")
 
@@ -10,12 +10,21 @@ The tool can be used via the following command
 NOTE: This tool searches for noxim executable via the following path: ./../noxim
 """
 import sys									# Used to read arguments
+import math									# Used to calculate updates of weighted samples
 import os									# Used to run external commands
 import multiprocessing as mp				# Used to parallelize workload
 from queue import Empty						# Used for Empty exception		
 from copy import deepcopy as cp				# Used to copy arrays
 from random import shuffle 					# Used to mix data around
 from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock files
+from noxim_cache import run_noxim, start_noxim	# Used to run noxim via cache of simulation results or in background
+import feature_store						# Used to read and write per port and per router features
+import feature_parser						# Used to parse feature files generated by noxim
+import feature_stream						# Used to consume features while noxim runs
+import feature_window						# Used to take moving average of features
+import feature_dataset						# Used to merge and split datasets without copying
+import perceptron_trainer					# Used to train perceptrons with NumPy
+import feature_writer						# Used to write per port features from a dedicated process
 
 # Dimensions of grid. It's used to calculate index of router
 DIM_X = 8
@@ -117,6 +126,21 @@ PARSED_STALLED_FLITS			= 3
 PARSED_TRANSMITTED_FLITS		= 4
 PARSED_BUFFER_WAITING_TIME		= 5
 PARSED_ANNOTATION				= 6
+
+# Parsed features (0 based index excluding cycle) which are read from feature files. Other features are set to 0
+# It must include the used_idx of perceptron. Set to None to read all the features
+USED_FEATURES = [0]
+
+# Options to reduce the size of feature files generated by noxim
+FEATURE_INTERVAL				= 1		# Features are generated every FEATURE_INTERVAL cycles
+ENABLE_FEATURE_ROUTER_FILTER	= True	# If True, attack features are generated only for the routers needed by the path
+FEATURES_FORMAT					= feature_parser.FEATURES_FORMAT_TEXT	# Format of feature files. Binary files (FEATURES_FORMAT_BIN) are memory mapped instead of being parsed
+ENABLE_FEATURE_STREAM			= False	# If True, attack features are streamed through a FIFO and processed while noxim runs
+ENABLE_FEATURE_WRITER			= True	# If True, per port features are coalesced and written by a dedicated writer process (refer to feature_writer.py)
+ENABLE_VIRTUAL_DATASETS		= True	# If True, merged features are references to the per port features instead of copies (refer to feature_store.link())
+# NOTE: With ENABLE_VECTORIZED_TRAINING (and without ENABLE_DEDUPLICATION), training draws shuffled minibatches from the references
+# (refer to store_train_and_test()) i.e. only the labels and a block of samples of a job are held in memory. The other modes of training
+# (train_weights(), deduplication and ENABLE_JOINT_TRAINING) still read all the samples of a job into memory (refer to feature_store.read())
 """
 Parses the features from given file and generates data for given router and ports
 Args:
@@ -139,80 +163,40 @@ Rets:
 		buffer_waiting_time		: Average waiting time for all transmitted flits at current cycle
 """
 def parse_features(feature_file, router_and_ports, log, ID):
-	all_info = {}	# This dictionary stores the parsed data
-
-	# Read data from csv file
-	log.write("Process #" + str(ID) + "\tReading from file: " + feature_file + "\n")
-	print("Process #" + str(ID) + "\tReading from file: " + feature_file)
-	with open(feature_file, 'r') as csv_in:
-		current_info = csv_in.readline()
-		while current_info:
-			data = current_info.split(", ") # data temporarily stores the parsed features. It's of the type list
-			data = list(map(int, data))	# Map everything to integers
-			# Calculate the router index in the format (router_x, router_y)
-			router_id = data[ROUTER_ID] 
-			router_x = router_id % DIM_X
-			router_y = router_id // DIM_X
-			router = (router_x, router_y)
-
-			cycle = data[CYCLE] # Extract out the cycle
-
-			# Iterate over all ports and add data to router_info if needed
-			for port in range(DIRECTIONS):
-				start_index = PORT_FEATURE_OFFSET + (port * PORT_FEATURE_COUNT) # This is the index of first feature for port (inclusive)
-				end_index = start_index + PORT_FEATURE_COUNT  # This is the last index for features of port (exclusive)
-				value = data[start_index : end_index] # Extract out features
-
-				# Insert data into to all_info
-				router_port = (router, port) # This is used as the key in all_info
-				if(router_port not in all_info):
-					all_info[router_port] = [] # Create a list if one doesn't exist yet
-				all_info[router_port].append([cycle] + value) # Insert the value i.e features
-
-			current_info = csv_in.readline()	# Read next line
-
-	# Generate output dictionary
-	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
-	print("Process #" + str(ID) + "\tGenerating Router info")
-	router_info = {}	 # Initialize output dictionary
-	for router_port in router_and_ports:
-		router_info[router_port] = [] # Initialize entry in all info
-
-		other_router = get_connected_router_and_port(router_port) # Get connected router
-
-		assert(len(all_info[other_router]) == len(all_info[router_port]))
-		enteries = len(all_info[router_port])	 # Get total number of enteries
-		for idx in range(enteries):
-			current_cycle_entry = []
-			assert(all_info[other_router][idx][CURRENT_CYCLE] == all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Start inserting parameters
-			# Cycle
-			current_cycle_entry.append(all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Rx features
-			current_cycle_entry.append(all_info[router_port][idx][BUFFER_STATUS])
-			current_cycle_entry.append(all_info[router_port][idx][CYCLES_SINCE_LAST_FLIT])
-			
-			# Tx features
-			current_cycle_entry.append(all_info[other_router][idx][STALLED_FLITS])
-			current_cycle_entry.append(all_info[other_router][idx][TRANSMITTED_FLITS])
-			if(all_info[other_router][idx][TRANSMITTED_FLITS] == 0):	# Check if no flits were transmitted
-				current_cycle_entry.append(0)	# No flits transmitteed i.e 0 wating time
-			else:
-				current_cycle_entry.append(all_info[other_router][idx][CUMULATIVE_LATENCY] / all_info[other_router][idx][TRANSMITTED_FLITS])	# Buffer waiting time = total time the flits waited / No. of flits
-
-			router_info[router_port].append(current_cycle_entry) # Insert in router info
-	return router_info
+	return feature_parser.parse_features(feature_file, router_and_ports, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT)	# Only routers on the path and columns of USED_FEATURES are converted
 
 
 
 # Length of moving average window
 AVG_CYCLES = 5
 ENABLE_AVG_WINDOW = False
+# Lengths of moving average windows which are taken together and stored as extra columns (refer to feature_window.py)
+# Used only if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW are True. Must contain AVG_CYCLES, whose features are used for training
+MULTI_SCALE_AVG_CYCLES = [1, 5, 25, 100]
+ENABLE_MULTI_SCALE_WINDOW = False
+# Half life (in samples) of exponential moving average. If ENABLE_EMA is True, it's taken instead of the moving window average
+# Only O(1) state is kept for every feature, hence streamed features (ENABLE_FEATURE_STREAM) are averaged in constant memory
+EMA_HALF_LIFE = 5
+ENABLE_EMA = False
+"""
+Generates the lengths of moving average windows taken by pre_process()
+Args:
+	None
+Rets:
+	List of lengths of windows
+"""
+def get_avg_windows():
+	avg_windows = MULTI_SCALE_AVG_CYCLES if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW and not ENABLE_EMA else [AVG_CYCLES]
+	assert(AVG_CYCLES in avg_windows)
+	return avg_windows
+
+
+
 """
 Modifies the data in router info.
 Currently configured to take a moving window average on various parameters. The size of window is AVG_CYCLES
+If ENABLE_MULTI_SCALE_WINDOW is True, the averages of every window in MULTI_SCALE_AVG_CYCLES are taken from the same cumulative sums
+If ENABLE_EMA is True, an exponential moving average with half life of EMA_HALF_LIFE samples is taken instead
 Args:
 	router_info	: Input data (Not preserved)
 	log			: File to print log to
@@ -221,10 +205,16 @@ Rets:
 	router_info	: Output data
 The input and output formats are
 	{((router_x, router_Y), port)	:	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time], ...], ...}
+	With multiple windows, the features of every window are placed one after the other in the order of MULTI_SCALE_AVG_CYCLES
 """
 def pre_process(router_info, log, ID):
 	log.write("Process #" + str(ID) + "\tPre-processing data\n")
 	print("Process #" + str(ID) + "\tPre-processing data")
+	if(ENABLE_EMA):
+		log.write("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE) + "\n")
+		print("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE))
+		return feature_window.ema_router_info(router_info, EMA_HALF_LIFE)
+
 	if(not ENABLE_AVG_WINDOW):	# Return without doing anything if not enabled
 		return router_info
 
@@ -235,32 +225,13 @@ def pre_process(router_info, log, ID):
 	# 	[0, 0, 1] : avg is 1-0/1 = 1
 	# 	[0, 1, 3] : avg is 3-0/2 =  3/2 (Notice instread of 2, we inserted 2 + window[-1])
 	# 	[1, 3, 5] : avg is 5-1/3 = 4/3 (Notice instread of 3, we inserted 3 + window[-1])
-	# This makes the time complexity independent of AVG_CYCLES
+	# This makes the time complexity independent of AVG_CYCLES. The cumulative sums of all the ports are computed together (refer to feature_window.py)
 
 	# Start moving average process
-	log.write("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES) + "\n")
-	print("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES))
-	for router_port in router_info:
-		windows = {	# initialize windows
-			PARSED_BUFFER_STATUS 			: [0] * AVG_CYCLES,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: [0] * AVG_CYCLES,
-			PARSED_STALLED_FLITS			: [0] * AVG_CYCLES,
-			PARSED_TRANSMITTED_FLITS		: [0] * AVG_CYCLES,
-			PARSED_BUFFER_WAITING_TIME		: [0] * AVG_CYCLES
-		}
-
-		current_number_of_elements_in_window = 0
-		for entry_idx in range(len(router_info[router_port])): # Iterate over sample points
-			for feature in windows: # Iterate over every feature
-				windows[feature].pop(0)	# remove the first element 
-				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature] # Calculate the value to be added
-				windows[feature].append(value_to_insert)	# Insert the value
-				current_number_of_elements_in_window += 1
-				current_number_of_elements_in_window = min(current_number_of_elements_in_window, AVG_CYCLES) # This ensures that when taling average, we divide by the correct no. of elements
-				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window	# Calculate average
-
-				router_info[router_port][entry_idx][feature] = avg	# Update to average value
-	
+	avg_windows = get_avg_windows()
+	log.write("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)) + "\n")
+	print("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)))
+	router_info = feature_window.average_router_info(router_info, avg_windows)	# All the ports are averaged in a single pass
 	return router_info
 
 
@@ -308,8 +279,7 @@ def merge_info(set_1, set_2, log, ID):
 	print("Process #" + str(ID) + "\tMerging")
 	merged = {}
 	for router_port in set_1:
-		merged[router_port] = cp(set_1[router_port])	# Add enteries from set 1
-		merged[router_port].extend(cp(set_2[router_port]))	# Add enteries from set 2
+		merged[router_port] = feature_dataset.concatenate([set_1[router_port], set_2[router_port]])	# Rows are shared with both the sets
 
 	return merged
 
@@ -406,11 +376,31 @@ def get_router_port_name(router_port):
 	return get_router_name(router_port[0]) + "." + str(router_port[1])
 
 
+"""
+Runs noxim once on the unmodified benchmark to generate the baseline features.
+The baseline traffic table is same for every attack pair, hence all the jobs share this feature file.
+Args:
+	benchmark_name		: Root name of the benchmark to use
+	working_directory	: Directory to store generated files
+Rets:
+	feature_file_path	: Path of the baseline feature file
+"""
+def generate_baseline(benchmark_name, working_directory):
+	source_file_path = working_directory + "/" + benchmark_name
+	feature_file_path = working_directory + "/unparsed_features/baseline"
+	log_file_path = working_directory + "/logs/baseline"
+
+	run_noxim(source_file_path, feature_file_path, log_file_path, DIM_X, DIM_Y, feature_parser.get_noxim_options(None, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))	# Baseline is shared by all the paths
+
+	return feature_file_path
+
+
+
 """
 Method called by processes to generate features.
 The method does the following:
-1.) Creates traffic tables for attack and baseline scenarios
-2.) Calls noxim to generate feature files
+1.) Creates traffic table for attack scenario
+2.) Calls noxim to generate attack feature file
 3.) Parses the feature files
 4.) Cleans and annotates feature files
 5.) Writes to per_port_features
@@ -419,10 +409,12 @@ Args:
 	jobs				: Queue of jobs to be completed
 	benchmark_name		: Root name of the benchmark to use
 	working_directory	: Directory to store generated files
+	feature_file_path_baseline	: Baseline feature file shared by all the jobs
+	writer				: Writer as returned by feature_writer.start_writer(). None if the workers write the shards themselves
 Rets:
 	None
 """
-def worker_gen(ID, jobs, benchmark_name, working_directory):
+def worker_gen(ID, jobs, benchmark_name, working_directory, feature_file_path_baseline, writer):
 	with open(working_directory + "/worker_logs_gen/worker_" + str(ID), "w", buffering = 1) as log:	# Open file for log
 		log.write("Process #" + str(ID) + "\tStarting...\n")
 		print("Process #" + str(ID) + "\tStarting...")
@@ -449,7 +441,6 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 				print("Process #" + str(ID) + "\tWriting traffic tables")
 				
 				source_file_path = working_directory + "/" + benchmark_name
-				baseline_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				attack_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
 				attack_string = str(src_idx) + "\t" + str(dst_idx) + "\t1\t1\t1\t1000000\n"
@@ -459,44 +450,47 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 					with open(attack_file_path, "w") as attack_file:
 						attack_file.write(attack_string)
 						attack_file.writelines(lines)
+				#--------------------------------------------------------------------------------------------------------------------------
 
-				os.system("cp " + source_file_path  + " " + baseline_file_path)
+				# Step 2.1: Generating path
+				log.write("Process #" + str(ID) + "\tGenerating path\n")
+				print("Process #" + str(ID) + "\tGenerating path")
+				path = generate_path(list(src), list(dst))
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 2: Call noxim to generate features
+				# Step 2.2: Call noxim to generate features
 				log.write("Process #" + str(ID) + "\tCalling noxim\n")
 				print("Process #" + str(ID) + "\tCalling noxim")
 
-				feature_file_path_baseline = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				feature_file_path_attack = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 
-				log_file_path_baseline = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				log_file_path_attack = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
-				cmd_baseline = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + baseline_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_baseline + " > " + log_file_path_baseline
-				cmd_attack = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + attack_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_attack + " > " + log_file_path_attack
-
-				os.system(cmd_baseline)
-				os.system(cmd_attack)
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 3.1: Generating path
-				log.write("Process #" + str(ID) + "\tGenerating path\n")
-				print("Process #" + str(ID) + "\tGenerating path")
-				path = generate_path(list(src), list(dst))
+				feature_routers = path if ENABLE_FEATURE_ROUTER_FILTER else None
+				if(ENABLE_FEATURE_STREAM):	# Features are parsed, projected and averaged while noxim runs, hence no feature file is written
+					feature_file_path_attack += ".fifo"
+					feature_stream.create_fifo(feature_file_path_attack)
+					process = start_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT, True))
+					router_info_attack = feature_stream.stream_features(feature_file_path_attack, process, path, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT, get_avg_windows() if ENABLE_AVG_WINDOW else None, EMA_HALF_LIFE if ENABLE_EMA else None)
+					os.remove(feature_file_path_attack)
+				elif(run_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))):
+					log.write("Process #" + str(ID) + "\tFetched attack features from cache\n")
+					print("Process #" + str(ID) + "\tFetched attack features from cache")
 				#--------------------------------------------------------------------------------------------------------------------------
 				
-				# Step 3.2: Parse features
+				# Step 3.1: Parse features
 				log.write("Process #" + str(ID) + "\tParsing features\n")
 				print("Process #" + str(ID) + "\tParsing features")
 				
 				router_info_baseline = parse_features(feature_file_path_baseline, path, log, ID)
-				router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
+				if(not ENABLE_FEATURE_STREAM):
+					router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 3.3: Pre process data
+				# Step 3.2: Pre process data
 				router_info_baseline = pre_process(router_info_baseline, log, ID)
-				router_info_attack = pre_process(router_info_attack, log, ID)			
+				if(not ENABLE_FEATURE_STREAM):	# Streamed features are already averaged
+					router_info_attack = pre_process(router_info_attack, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
 				# Step 4.1: Clean and annotate data
@@ -512,12 +506,12 @@ def worker_gen(ID, jobs, benchmark_name, working_directory):
 				log.write("Process #" + str(ID) + "\tWriting per port feature\n")
 				print("Process #" + str(ID) + "\tWriting per port feature")
 				for router_port in router_info:
-					per_port_features_file_name = working_directory + "/per_port_features/" + get_router_port_name(router_port)
-					with open(per_port_features_file_name, "a") as per_port_file:
-						lockf(per_port_file, LOCK_EX)	# Acquire a lock
-						for entry in router_info[router_port]:
-							per_port_file.write(", ".join(map(str, entry)) + "\n")
-						lockf(per_port_file, LOCK_UN)	# Release the lock
+					per_port_features_store = working_directory + "/per_port_features/" + get_router_port_name(router_port)
+					cycles, features, labels = feature_store.rows_to_columns(router_info[router_port])
+					if(writer is not None):
+						feature_writer.put(writer, per_port_features_store, cycles, features, labels)	# Coalesced and written by the writer process
+					else:
+						feature_store.write_shard(per_port_features_store, "worker_" + str(ID), cycles, features, labels)	# Every worker writes its own shards, hence no lock is needed
 				#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
@@ -578,43 +572,45 @@ def get_output_ports(router):
 Reads the features of provided ports
 Checks if these ports exist
 If they exist, their features are add to a common pool
-These features are then shuffled
+These features are then shuffled and written to the merged store
+The shuffle is out of core i.e. only a bounded number of samples is held in memory (refer to feature_store.shuffle())
+If ENABLE_VIRTUAL_DATASETS is True, the merged store only refers to the samples of ports instead
 Args:
 	ports	: The ports whose data is to be merged. The format is
 	[((router_x, router_y), port), ...]
 	working_directory	: The directory in which the code generated files
+	merged_store_path	: Path of store to write the merged features to
 Rets:
 	Used port	: A comma seperated string which is a list of ports used. An example is:
 	"1_1.2, 1_1.3"
-	All data	: This is accumaled data from all ports
 """
-def merge_ports(ports, working_directory):
+def merge_ports(ports, working_directory, merged_store_path):
 	directory_base_name = working_directory + "/per_port_features/" # This is the path to seach individual port files in
 
 	used_ports = "" # Initialize the list of used ports
 
-	all_data = [] # This is the list of 
+	port_store_paths = [] # This is the list of stores of all ports
 
 	# Accumalate data
 	for port in ports: # Iterate over ports
 		file_name = get_router_port_name(port)
-		file_path = directory_base_name + file_name	# Generate the full name to open the file
-		if(os.path.isfile(file_path)):
+		file_path = directory_base_name + file_name	# Generate the full name to open the store
+		if(feature_store.exists(file_path)):
 			used_ports += file_name + ", "
-			with open(file_path, 'r') as data_file:
-				lines = data_file.readlines()	# Read the data from file
-				for line in lines:
-					data = list(map(float, (line.split(","))))
-					all_data.append(data)	 # Add lines to all data
+			port_store_paths.append(file_path)	# Add store to all data
 
 	# Remove the last comma from used_port string
 	if(len(used_ports) > 2):	# Ensure that string isn't empty
 		used_ports = used_ports[:-2]
 
-	# Shuffle all the data
-	shuffle(all_data)
+	# Shuffle all the data and write it
+	if(ENABLE_VIRTUAL_DATASETS):	# Only references are written. The samples are shuffled by test_train_splitter() while training
+		feature_store.create(merged_store_path)
+		feature_store.link(port_store_paths, merged_store_path)
+	else:
+		feature_store.shuffle(port_store_paths, merged_store_path)
 
-	return used_ports, all_data
+	return used_ports
 
 
 
@@ -622,11 +618,9 @@ def merge_ports(ports, working_directory):
 Method called by processes to merge features.
 The method does the following:
 1.) Finds list of all ports which are input to current router
-2.) Merges the features of input ports and shuffles it
-3.) Writes to router input features
-4.) Finds list of all ports which are output to current router
-5.) Merges the features of output ports and shuffles it
-6.) Writes to router output features
+2.) Merges the features of input ports, shuffles it and writes to router input features
+3.) Finds list of all ports which are output to current router
+4.) Merges the features of output ports, shuffles it and writes to router output features
 Args:
 	ID					: Process ID
 	jobs				: Queue of jobs to be completed
@@ -654,46 +648,30 @@ def worker_merge(ID, jobs, working_directory):
 				input_ports = get_input_ports(job)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 2: Merge input port features
-				log.write("Process #" + str(ID) + "\tMerging input port features\n")
-				print("Process #" + str(ID) + "\tMerging input port features")
-				used_ports, merged_inputs = merge_ports(input_ports, working_directory)
+				# Step 2: Merge and store input port features
+				log.write("Process #" + str(ID) + "\tMerging and storing input port features\n")
+				print("Process #" + str(ID) + "\tMerging and storing input port features")
+				file_name = get_router_name(job) + "_in"
+				full_path_name = working_directory + "/per_router_features/" + file_name
+				used_ports = merge_ports(input_ports, working_directory, full_path_name)
 				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
 				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
-				# Step 3: Write input features
-				log.write("Process #" + str(ID) + "\tStoring input port features\n")
-				print("Process #" + str(ID) + "\tStoring input port features")
-				file_name = get_router_name(job) + "_in"
-				full_path_name = working_directory + "/per_router_features/" + file_name
-				with open(full_path_name, 'w') as input_features_file:
-					for entry in merged_inputs:
-						input_features_file.write(", ".join(map(str, entry)) + "\n")
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 4: Get list of output ports
+				# Step 3: Get list of output ports
 				log.write("Process #" + str(ID) + "\tGenerating list of output ports\n")
 				print("Process #" + str(ID) + "\tGenerating list of output ports")
 				output_ports = get_output_ports(job)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 5: Merge output port features
-				log.write("Process #" + str(ID) + "\tMerging output port features\n")
-				print("Process #" + str(ID) + "\tMerging output port features")
-				used_ports, merged_outputs = merge_ports(output_ports, working_directory)
-				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
-				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
-				#--------------------------------------------------------------------------------------------------------------------------
-				
-				# Step 6: Write output features
-				log.write("Process #" + str(ID) + "\tStoring output port features\n")
-				print("Process #" + str(ID) + "\tStoring output port features")
+				# Step 4: Merge and store output port features
+				log.write("Process #" + str(ID) + "\tMerging and storing output port features\n")
+				print("Process #" + str(ID) + "\tMerging and storing output port features")
 				file_name = get_router_name(job) + "_out"
 				full_path_name = working_directory + "/per_router_features/" + file_name
-				with open(full_path_name, 'w') as output_features_file:
-					for entry in merged_outputs:
-						output_features_file.write(", ".join(map(str, entry)) + "\n")
+				used_ports = merge_ports(output_ports, working_directory, full_path_name)
+				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
+				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
 				# Log completing the job
@@ -709,6 +687,9 @@ def worker_merge(ID, jobs, working_directory):
 
 
 
+# Index of parsed features used by the perceptron
+# USED_IDX = [0,1,4] # Use only buffer status, cycles since last flit and buffer waiting time
+USED_IDX = [0]	# Used only buffer status
 """
 Tells whether the perceptron was activated or not
 Args:
@@ -717,8 +698,7 @@ Args:
 	vector	: Input to percepton
 """
 def predict(bias, weights, vector):
-	# used_idx = [0,1,4] # Use only buffer status, cycles since last flit and buffer waiting time
-	used_idx = [0]	# Used only buffer status
+	used_idx = USED_IDX
 	activation = bias
 
 	assert(len(vector) == len(weights))
@@ -733,35 +713,96 @@ def predict(bias, weights, vector):
 # Learning parameters
 EPOCHS = 100
 LEARNING_RATE = 0.00001
+# Early stopping (refer to perceptron_trainer.create_early_stopping()). Training stops before EPOCHS once the error hasn't improved by
+# a fraction EARLY_STOPPING_DELTA for EARLY_STOPPING_PATIENCE epochs. The error is the squared error of training, or the error on
+# VALIDATION_RATIO of the training samples if it isn't 0 (these samples are held out of training)
+ENABLE_EARLY_STOPPING = False
+EARLY_STOPPING_PATIENCE = 3
+EARLY_STOPPING_DELTA = 0.01
+VALIDATION_RATIO = 0.0
+# Mode of training i.e. the weights which are kept (refer to perceptron_trainer.py)
+#	PERCEPTRON_PLAIN	: Weights after the last update
+#	PERCEPTRON_POCKET	: Weights of the epoch with the lowest error on training (or validation) samples
+#	PERCEPTRON_AVERAGED	: Average of weights after every sample
+TRAINING_MODE = perceptron_trainer.PERCEPTRON_PLAIN
 """
 Learns the weights for percepton
+A sample with weight n is trained as if its n copies were presented one after the other i.e. the copies update the weights
+till the prediction becomes correct. The number of such updates is calculated directly from the activation.
+This approximates training on the n copies, which would be spread over the shuffled epoch (refer to ENABLE_DEDUPLICATION).
 Args:
 	train	: Training dataset
 	log				: File to print log to
 	ID				: ID of the caller thread
+	sample_weights	: List of number of occurrences of every sample in train. None if every sample occurs once
 Rets:
 	bias	: Learnt bias
 	weights	: Learnt weights
 """
-def train_weights(train, log, ID):
-	# used_idx = [0,1,4] # Use only buffer status, cycles since last flit and buffer waiting time
-	used_idx = [0]	# Used only buffer status
+def train_weights(train, log, ID, sample_weights = None):
+	used_idx = USED_IDX
 	bias = 0.0
 	weights = [0] * PARSED_FEATURE_COUNT
+	stopping = perceptron_trainer.create_early_stopping(EARLY_STOPPING_PATIENCE, EARLY_STOPPING_DELTA) if ENABLE_EARLY_STOPPING else None
+	validation = None
+	if(stopping is not None and VALIDATION_RATIO > 0):	# Hold out validation samples
+		validation_indices, train_indices = feature_dataset.split_indices([data_point[-1] for data_point in train], 1 - VALIDATION_RATIO)
+		validation = feature_dataset.take_rows(train, validation_indices)
+		validation_weights = None if sample_weights is None else [sample_weights[idx] for idx in validation_indices.tolist()]
+		train = feature_dataset.take_rows(train, train_indices)
+		sample_weights = None if sample_weights is None else [sample_weights[idx] for idx in train_indices.tolist()]
+	if(sample_weights is not None):	# Shuffle the order of samples instead, so that samples stay with their weights
+		order = list(range(len(train)))
+	sum_bias, sum_weights, occurrences = 0.0, [0] * PARSED_FEATURE_COUNT, 0	# Sums of weights after every sample for PERCEPTRON_AVERAGED
+	pocket = (math.inf, bias, list(weights))	# (error, bias, weights) of the best epoch for PERCEPTRON_POCKET
+	model, epoch = (bias, weights), -1	# Initial weights if no epoch runs
 	for epoch in range(EPOCHS):	# Iterate over all epochs
 		log.write("Running epoch: " + str(epoch + 1) + " out of " + str(EPOCHS) + ":\t")
-		shuffle(train)	# Shuffle dataset on each pass
+		shuffle(train if sample_weights is None else order)	# Shuffle dataset on each pass
 		sq_error = 0.0
-		for data_point in train:
+		for data_idx in range(len(train)):
+			data_point = train[data_idx] if sample_weights is None else train[order[data_idx]]
 			data_features = data_point[1:-1]	# Ignore the annotation and cycle count
 			prediction = predict(bias, weights, data_features) # Predict based on current weights and bias
 			error = data_point[-1] - prediction	# Get error
-			sq_error += error ** 2	# Update squared error
-			bias += LEARNING_RATE * error # Update bias
+			updates = 1
+			if(sample_weights is not None and error != 0):	# Copies update till the prediction flips
+				activation = bias + sum(weights[w_idx] * data_features[w_idx] for w_idx in used_idx)
+				step = LEARNING_RATE * (1 + sum(data_features[w_idx] ** 2 for w_idx in used_idx))	# Change of activation per update
+				flip_updates = math.ceil(-activation / step) if error > 0 else math.floor(activation / step) + 1
+				updates = min(sample_weights[order[data_idx]], max(flip_updates, 1))
+			sq_error += updates * error ** 2	# Update squared error
+			bias += LEARNING_RATE * error * updates # Update bias
 			# for w_idx in range(len(weights)):	# Update weights
 			for w_idx in used_idx:	# Update weights
-				weights[w_idx] += LEARNING_RATE * error * data_features[w_idx]
+				weights[w_idx] += LEARNING_RATE * error * updates * data_features[w_idx]
+			if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):	# Every occurrence of a sample is counted
+				count = 1 if sample_weights is None else sample_weights[order[data_idx]]
+				sum_bias += count * bias
+				for w_idx in used_idx:
+					sum_weights[w_idx] += count * weights[w_idx]
+				occurrences += count
 		log.write(str(sq_error) + "\n")
+
+		# Weights learnt till now
+		if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_POCKET):
+			if(validation is None):
+				error = 100 - test_weights(train, weights, bias, sample_weights)[0]
+			else:
+				error = 100 - test_weights(validation, weights, bias, validation_weights)[0]
+			if(error < pocket[0]):
+				pocket = (error, bias, list(weights))
+			model = pocket[1:]
+		elif(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+			model = (sum_bias / max(occurrences, 1), list(weights))	# There are no occurrences if train is empty
+			for w_idx in used_idx:
+				model[1][w_idx] = sum_weights[w_idx] / max(occurrences, 1)
+		else:
+			model = (bias, weights)
+		if(stopping is not None and perceptron_trainer.update_early_stopping(stopping, sq_error if validation is None else 100 - test_weights(validation, model[1], model[0], validation_weights)[0])):
+			break
+	log.write("Process #" + str(ID) + "\tTrained for " + str(epoch + 1) + " out of " + str(EPOCHS) + " epochs\n")
+	bias, weights = model
 	return bias, weights
 
 
@@ -774,12 +815,13 @@ Args:
 	test	: The testing dataset
 	weights	: The learnt weights
 	bias 	: The learnt bias
+	sample_weights	: List of number of occurrences of every sample in test. None if every sample occurs once
 Rets:
 	Accuracy		: A value between 0 and 100 describing the accuracy of the model
 	False positives	: Percentage of predictions which were false positives
 	False negatives	: Percentage of predictions which were false negatives
 """
-def test_weights(test, weights, bias):
+def test_weights(test, weights, bias, sample_weights = None):
 	# Initialize variables to keep track of correct results
 	correct = 0
 	total = 0
@@ -789,17 +831,18 @@ def test_weights(test, weights, bias):
 	false_negatives = 0
 
 	# Start testing
-	for data_point in test:
-		total += 1
+	for data_idx, data_point in enumerate(test):
+		count = 1 if sample_weights is None else sample_weights[data_idx]	# Every occurrence of a sample is counted
+		total += count
 		data_features = data_point[1:-1] # Ignore the annotation and cycle count
 		prediction = predict(bias, weights, data_features) # Predict based on current weights and bias
 		if(abs(prediction - data_point[-1]) < FLOAT_COMPARE_ZERO):
-			correct += 1
+			correct += count
 		else:
 			if(prediction > data_point[-1]):
-				false_positives += 1
+				false_positives += count
 			else:
-				false_negatives += 1
+				false_negatives += count
 
 	# Calculate accuracy and false +ve, -ve and return it
 	accuracy = (correct * 100) / total
@@ -810,6 +853,34 @@ def test_weights(test, weights, bias):
 
 
 
+"""
+Generates the patience of early stopping as passed to perceptron_trainer.train()
+Args:
+	None
+Rets:
+	EARLY_STOPPING_PATIENCE if ENABLE_EARLY_STOPPING is True else None
+"""
+def get_early_stopping_patience():
+	return EARLY_STOPPING_PATIENCE if ENABLE_EARLY_STOPPING else None
+
+
+
+"""
+Generates the router ID and direction of a router and direction as written at the start of a row of the weights file
+Args:
+	router_dir	: Router  and direction (in/out). The format is "<router_x>_<router_y>_<in/out>"
+Rets:
+	A list with the following format: [router_id, port]
+"""
+def get_weights_header(router_dir):
+	router_x = int(router_dir.split("_")[0])
+	router_y = int(router_dir.split("_")[1])
+	direction = 1 if router_dir.split("_")[2] == "in" else 0
+	router_id = router_y * DIM_Y + router_x
+	return [router_id, direction]
+
+
+
 """
 Trains a perceptron according to data and spits out accuracy
 Args:
@@ -818,33 +889,27 @@ Args:
 	router_dir	: Router  and direction (in/out) for which the training and testing is to be done. The format is "<router_x>_<router_y>_<in/out>"
 	log			: File to print log to
 	ID			: ID of the caller process
+	test_counts		: List of number of occurrences of every sample in test. None if every sample occurs once
+	train_counts	: List of number of occurrences of every sample in train. None if every sample occurs once
 Rets:
 	accuracy			: A value between 0 and 100 indicating percentage accuracy
 	weights_and_biases	: A list with the following format: [router_id, port, bias, weights_1, weights_2, ...]
 	False positives	: Percentage of predictions which were false positives
 	False negatives	: Percentage of predictions which were false negatives
 """
-def train_and_test(test, train, router_dir, log, ID):
-	# Setup data structure to store learnt bias and weights
-	weights_and_biases = []
-
-	# Save router_id and port
-	router_x = int(router_dir.split("_")[0])
-	router_y = int(router_dir.split("_")[1])
-	direction = 1 if router_dir.split("_")[2] == "in" else 0
-	router_id = router_y * DIM_Y + router_x
-	weights_and_biases.append(router_id)
-	weights_and_biases.append(direction)
+def train_and_test(test, train, router_dir, log, ID, test_counts = None, train_counts = None):
+	# Setup data structure to store learnt bias and weights. It starts with router_id and port
+	weights_and_biases = get_weights_header(router_dir)
 
 	# Get learnt bias and weights
-	bias, weights = train_weights(train, log, ID)
+	bias, weights = train_weights(train, log, ID, train_counts)
 
 	# Store weight and biases
 	weights_and_biases.append(bias)
 	weights_and_biases.extend(weights)
 	
 	# Get the accuracy acheived
-	accuracy, false_positives, false_negatives = test_weights(test, weights, bias)
+	accuracy, false_positives, false_negatives = test_weights(test, weights, bias, test_counts)
 
 	return accuracy, false_positives, false_negatives, weights_and_biases
 
@@ -860,44 +925,121 @@ Args:
 Rets:
 	test	: Testing part of data
 	train	: Training part of data
-	The format for both is same as input
+	The format for both is same as input. The rows aren't copied
 """
 def test_train_splitter(current_info):
-	# Split the data into satured and unsatured to ensure better mixing
-	# Initialize both sets	
-	saturated = [] 
-	unsaturated = []
-
-	# Add data to saturated and unsatured sets
-	for info in current_info:
-		if(info[PARSED_ANNOTATION] == SATURATED):
-			saturated.append(cp(info))
-		else:
-			unsaturated.append(cp(info))
+	# Split the saturated and unsaturated datapoints separately to ensure better mixing
+	# Only the indices are shuffled. The rows of test and train sets are shared with current_info
+	test_indices, train_indices = feature_dataset.split_indices([info[PARSED_ANNOTATION] for info in current_info], TRAINING_RATIO)
+	test = feature_dataset.take_rows(current_info, test_indices)
+	train = feature_dataset.take_rows(current_info, train_indices)
 
-	# Make test and train sets
-	test = []
-	train = []
+	return test, train
 
-	# Shuffle data
-	shuffle(saturated)
-	shuffle(unsaturated)
 
-	# Add saturated datapoints
-	split_index = int(TRAINING_RATIO * len(saturated))
-	train += saturated[:split_index]
-	test += saturated[split_index:]
 
-	# Add unsaturated datapoints
-	split_index = int(TRAINING_RATIO * len(unsaturated))
-	train += unsaturated[:split_index]
-	test += unsaturated[split_index:]	
+# Replace identical samples by a single sample weighted by its number of occurrences before training
+# NOTE: Training is an approximation of training on all the samples. The copies of a sample are presented back to back and stop updating
+# once the prediction flips (refer to train_weights()), instead of being spread over the shuffled epoch, and PERCEPTRON_AVERAGED counts the
+# weights after the last copy once per copy. Hence the learnt weights differ from those learnt on all the samples. Testing counts every occurrence
+ENABLE_DEDUPLICATION = False
+"""
+Splits the columns of samples into testing and training. Identical samples are replaced by a single weighted sample if ENABLE_DEDUPLICATION is True.
+Args:
+	cycles, features, labels	: Columns of samples
+	log							: File to print log to
+	ID							: ID of the caller process
+Rets:
+	cycles, features, labels	: Columns of samples which are indexed by the indices (the unique samples if deduplicated)
+	test_indices, train_indices	: Arrays of indices of testing and training samples
+	test_counts, train_counts	: Arrays of number of occurrences of testing and training samples. None if not deduplicated
+"""
+def split_columns(cycles, features, labels, log, ID):
+	if(ENABLE_DEDUPLICATION):
+		samples = len(labels)
+		cycles, features, labels, counts = feature_dataset.deduplicate(cycles, features, labels)
+		test_indices, test_counts, train_indices, train_counts = feature_dataset.split_counts(labels, counts, TRAINING_RATIO)
+		log.write("Process #" + str(ID) +"\tDeduplicated " + str(samples) + " samples to " + str(len(counts)) + "\n")
+	else:
+		test_indices, train_indices = feature_dataset.split_indices(labels, TRAINING_RATIO)
+		test_counts, train_counts = None, None
+	return cycles, features, labels, test_indices, train_indices, test_counts, train_counts
+
+
+
+# Train with NumPy instead of train_weights() and test_weights() (refer to perceptron_trainer.py)
+# The samples of a block of TRAINING_BLOCK_SIZE samples are predicted together and their updates are added. A block of 1 sample is same as train_weights()
+# Larger blocks are much faster but the learnt weights vary more on small datasets
+ENABLE_VECTORIZED_TRAINING = False
+TRAINING_BLOCK_SIZE = 256
+"""
+Trains and tests a perceptron on the columns of samples without converting them to rows. Same as train_and_test() otherwise.
+Args:
+	cycles		: Array of cycle of every sample
+	features	: Array of shape (samples, PARSED_FEATURE_COUNT)
+	labels		: Array of annotation of every sample
+	router_dir	: Router  and direction (in/out) for which the training and testing is to be done. The format is "<router_x>_<router_y>_<in/out>"
+	log			: File to print log to
+	ID			: ID of the caller process
+Rets:
+	Same as train_and_test()
+"""
+def vectorized_train_and_test(cycles, features, labels, router_dir, log, ID):
+	# Setup data structure to store learnt bias and weights. It starts with router_id and port
+	weights_and_biases = get_weights_header(router_dir)
 
-	# Shuffle the test and train sets
-	shuffle(test)
-	shuffle(train)
+	# Split into testing and training
+	cycles, features, labels, test_indices, train_indices, test_counts, train_counts = split_columns(cycles, features, labels, log, ID)
 
-	return test, train
+	# Get learnt bias and weights
+	bias, weights, epochs = perceptron_trainer.train(features[train_indices], labels[train_indices], USED_IDX, EPOCHS, LEARNING_RATE, TRAINING_BLOCK_SIZE, train_counts, log, get_early_stopping_patience(), EARLY_STOPPING_DELTA, VALIDATION_RATIO, TRAINING_MODE)
+	log.write("Process #" + str(ID) + "\tTrained for " + str(epochs) + " out of " + str(EPOCHS) + " epochs\n")
+
+	# Store weight and biases
+	weights_and_biases.append(bias)
+	weights_and_biases.extend(weights)
+
+	# Get the accuracy acheived
+	accuracy, false_positives, false_negatives = perceptron_trainer.test(features[test_indices], labels[test_indices], bias, weights, USED_IDX, test_counts)
+
+	return accuracy, false_positives, false_negatives, weights_and_biases
+
+
+
+"""
+Trains and tests a perceptron on the samples of a store without reading them into memory. Same as vectorized_train_and_test() otherwise.
+The split is done on the indices of samples and every block is gathered from the shards while training (refer to perceptron_trainer.train_store()),
+hence the referenced rows of a virtual store are read in place.
+Args:
+	store_path	: Path of store of the job
+	labels		: Array of annotation of every sample of store (refer to feature_store.read_column())
+	avg_cycles	: Length of the moving average window which is trained on
+	router_dir	: Router  and direction (in/out) for which the training and testing is to be done. The format is "<router_x>_<router_y>_<in/out>"
+	log			: File to print log to
+	ID			: ID of the caller process
+Rets:
+	Same as train_and_test()
+"""
+def store_train_and_test(store_path, labels, avg_cycles, router_dir, log, ID):
+	# Setup data structure to store learnt bias and weights. It starts with router_id and port
+	weights_and_biases = get_weights_header(router_dir)
+	transform = lambda block : feature_window.select_window(block, get_avg_windows(), avg_cycles)
+
+	# Split into testing and training
+	test_indices, train_indices = feature_dataset.split_indices(labels, TRAINING_RATIO)
+
+	# Get learnt bias and weights
+	bias, weights, epochs = perceptron_trainer.train_store(store_path, train_indices, USED_IDX, EPOCHS, LEARNING_RATE, TRAINING_BLOCK_SIZE, log, get_early_stopping_patience(), EARLY_STOPPING_DELTA, VALIDATION_RATIO, TRAINING_MODE, transform)
+	log.write("Process #" + str(ID) + "\tTrained for " + str(epochs) + " out of " + str(EPOCHS) + " epochs\n")
+
+	# Store weight and biases
+	weights_and_biases.append(bias)
+	weights_and_biases.extend(weights)
+
+	# Get the accuracy acheived
+	accuracy, false_positives, false_negatives = perceptron_trainer.test_store(store_path, test_indices, bias, weights, USED_IDX, transform)
+
+	return accuracy, false_positives, false_negatives, weights_and_biases
 
 
 
@@ -940,58 +1082,74 @@ def worker_train(ID, jobs, working_directory, accuracy_dict, accuracy_lock):
 				print("Process #" + str(ID) +"\tParsing feature file")
 				
 				# Read the features
-				router_info = []
-				job_file_name = working_directory + "/per_router_features/" + job
-				with open(job_file_name, "r") as job_file:
-					lines = job_file.readlines()
-					for line in lines:
-						entry = list(map(float, line.split(",")))
-						router_info.append(entry)
+				job_store_path = working_directory + "/per_router_features/" + job
+				if(ENABLE_VECTORIZED_TRAINING and ENABLE_VIRTUAL_DATASETS and not ENABLE_DEDUPLICATION):	# Only the labels are read. The samples are gathered while training
+					cycles, features, labels = None, None, feature_store.read_column(job_store_path, "labels")
+				else:
+					cycles, features, labels = feature_store.read(job_store_path)
+				feature_store.check_parsed_features(job_store_path, USED_IDX)	# Features which weren't parsed are 0
 				
-				if(len(router_info) == 0): # Exit if no features are available
+				if(len(labels) == 0): # Exit if no features are available
 					log.write("Process #" + str(ID) +"\tNothing to do! Completed job " + str(job) + "\n")
 					print("Process #" + str(ID) +"\tNothing to do! Completed job " + str(job))
 					continue
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 1.2: Train and test
-				log.write("Process #" + str(ID) +"\tTesting and training\n")
-				print("Process #" + str(ID) +"\tTesting and training")
-
-				accuracy = 0
-				test, train = test_train_splitter(router_info)
-				accuracy, false_positives, false_negatives, weights_and_biases = train_and_test(test, train, job, log, ID)
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 2.1: Write weights
-				log.write("Process #" + str(ID) +"\tWriting weights\n")
-				print("Process #" + str(ID) +"\tWriting weights")
-				weights_file_path = working_directory + "/weights"
-				with open(weights_file_path, "a") as weights_file:
-					lockf(weights_file, LOCK_EX)	# Acquire a lock
-					weights_file.write(", ".join(map(str, weights_and_biases)) + "\n")
-					lockf(weights_file, LOCK_UN)	# Release lock
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 2.2: Write accuracy
-				log.write("Process #" + str(ID) +"\tWriting accuracy\n")
-				print("Process #" + str(ID) +"\tWriting accuracy")
-				accuracy_file_path = working_directory + "/accuracy_report"
-				with open(accuracy_file_path, "a") as accuracy_file:
-					lockf(accuracy_file, LOCK_EX)	# Acquire lock
-					accuracy_file.write(str(job) + "\t: " + str(accuracy) + ", " + str(false_positives) + ", " + str(false_negatives) + "\n")
-					lockf(accuracy_file, LOCK_UN)	# Release lock
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 3: Store accuracy
-				log.write("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy) + "\n")
-				print("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy))
-
-				log.write("Process #" + str(ID) +"\tStoring accuracy\n")
-				print("Process #" + str(ID) +"\tStoring accuracy")
-				with accuracy_lock:
-					accuracy_dict[job] = accuracy
-				#--------------------------------------------------------------------------------------------------------------------------
+				# Steps 1.2 to 3 are repeated for every moving average window. There is a single window unless ENABLE_MULTI_SCALE_WINDOW is True
+				for avg_cycles in get_avg_windows():
+					window_features = None if features is None else feature_window.select_window(features, get_avg_windows(), avg_cycles)
+					report_suffix = "" if avg_cycles == AVG_CYCLES else "_avg_" + str(avg_cycles)	# Weights and accuracy of other windows are written to separate files
+
+					# Step 1.2: Train and test
+					log.write("Process #" + str(ID) +"\tTesting and training\n")
+					print("Process #" + str(ID) +"\tTesting and training")
+
+					accuracy = 0
+					if(features is None):
+						accuracy, false_positives, false_negatives, weights_and_biases = store_train_and_test(job_store_path, labels, avg_cycles, job, log, ID)
+					elif(ENABLE_VECTORIZED_TRAINING):
+						accuracy, false_positives, false_negatives, weights_and_biases = vectorized_train_and_test(cycles, window_features, labels, job, log, ID)
+					else:
+						if(ENABLE_DEDUPLICATION):	# Only the unique samples are converted to rows
+							unique_cycles, unique_features, unique_labels, test_indices, train_indices, test_counts, train_counts = split_columns(cycles, window_features, labels, log, ID)
+							rows = feature_store.columns_to_rows(unique_cycles, unique_features, unique_labels)
+							test, train = feature_dataset.take_rows(rows, test_indices), feature_dataset.take_rows(rows, train_indices)
+							test_counts, train_counts = test_counts.tolist(), train_counts.tolist()
+						else:
+							test, train = test_train_splitter(feature_store.columns_to_rows(cycles, window_features, labels))
+							test_counts, train_counts = None, None
+						accuracy, false_positives, false_negatives, weights_and_biases = train_and_test(test, train, job, log, ID, test_counts, train_counts)
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 2.1: Write weights
+					log.write("Process #" + str(ID) +"\tWriting weights\n")
+					print("Process #" + str(ID) +"\tWriting weights")
+					weights_file_path = working_directory + "/weights" + report_suffix
+					with open(weights_file_path, "a") as weights_file:
+						lockf(weights_file, LOCK_EX)	# Acquire a lock
+						weights_file.write(", ".join(map(str, weights_and_biases)) + "\n")
+						lockf(weights_file, LOCK_UN)	# Release lock
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 2.2: Write accuracy
+					log.write("Process #" + str(ID) +"\tWriting accuracy\n")
+					print("Process #" + str(ID) +"\tWriting accuracy")
+					accuracy_file_path = working_directory + "/accuracy_report" + report_suffix
+					with open(accuracy_file_path, "a") as accuracy_file:
+						lockf(accuracy_file, LOCK_EX)	# Acquire lock
+						accuracy_file.write(str(job) + "\t: " + str(accuracy) + ", " + str(false_positives) + ", " + str(false_negatives) + "\n")
+						lockf(accuracy_file, LOCK_UN)	# Release lock
+					#--------------------------------------------------------------------------------------------------------------------------
+
+					# Step 3: Store accuracy
+					log.write("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy) + "\n")
+					print("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy))
+
+					log.write("Process #" + str(ID) +"\tStoring accuracy\n")
+					print("Process #" + str(ID) +"\tStoring accuracy")
+					with accuracy_lock:
+						accuracy_dict[(job, avg_cycles)] = accuracy
+					#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
 				log.write("Process #" + str(ID) +"\tCompleted job " + str(job) + "\n")
@@ -1005,6 +1163,111 @@ def worker_train(ID, jobs, working_directory, accuracy_dict, accuracy_lock):
 
 
 
+"""
+Splits the jobs into shards with about the same number of samples (largest jobs first, each to the shard with the fewest samples)
+Args:
+	job_names					: List of jobs
+	per_router_features_dir		: Directory with the store of every job
+	num_shards					: Number of shards
+Rets:
+	List of num_shards lists of jobs
+"""
+def shard_jobs(job_names, per_router_features_dir, num_shards):
+	shards = [[] for shard_idx in range(num_shards)]
+	shard_rows = [0] * num_shards
+	job_rows = {job : feature_store.get_rows(per_router_features_dir + "/" + job) for job in job_names}
+	for job in sorted(job_names, key = lambda job : (-job_rows[job], job)):
+		shard_idx = shard_rows.index(min(shard_rows))
+		shards[shard_idx].append(job)
+		shard_rows[shard_idx] += job_rows[job]
+	return shards
+
+
+
+# Train the perceptrons of a shard of jobs together in every process (refer to perceptron_trainer.train_many())
+# The jobs are split into as many shards as processes (refer to shard_jobs()), and the samples of the routers of a shard are stacked
+# i.e. every step of training is a batched matrix product over all of them instead of a Python loop per router
+# JOINT_TRAINING_BLOCK_SIZE samples of every router are predicted together. A block of 1 sample is same as train_weights() for every router
+# Larger blocks are much faster but the learnt weights vary more on small datasets (same as TRAINING_BLOCK_SIZE)
+ENABLE_JOINT_TRAINING = False
+JOINT_TRAINING_BLOCK_SIZE = 8
+"""
+Method called by processes to generate the weights of a shard of jobs together.
+The method does the following:
+1.) Reads the features of all the jobs of its shard
+2.) Trains the perceptrons of all the jobs of the shard together
+3.) Tests every job and writes the learnt weights and accuracy to the same files as worker_train()
+4.) Store accuracy
+Args:
+	Same as worker_train()
+Rets:
+	None
+"""
+def worker_train_joint(ID, jobs, working_directory, accuracy_dict, accuracy_lock):
+	with open(working_directory + "/worker_logs_train/worker_" + str(ID), "w", buffering = 1) as log:	# Open file for log
+		log.write("Process #" + str(ID) + "\tStarting...\n")
+		print("Process #" + str(ID) + "\tStarting...")
+
+		# Step 1: Read the features of all the jobs of the shard
+		log.write("Process #" + str(ID) +"\tParsing feature files\n")
+		print("Process #" + str(ID) +"\tParsing feature files")
+		job_features = {}	# {job : (cycles, features, labels)}
+		try:
+			shard = jobs.get(timeout = 0.1) # Fetch the shard of jobs of this process
+		except Empty:
+			shard = []
+		for job in shard:
+			cycles, features, labels = feature_store.read(working_directory + "/per_router_features/" + job)
+			feature_store.check_parsed_features(working_directory + "/per_router_features/" + job, USED_IDX)	# Features which weren't parsed are 0
+			if(len(cycles) == 0): # Skip if no features are available
+				log.write("Process #" + str(ID) +"\tNothing to do! Completed job " + str(job) + "\n")
+				continue
+			job_features[job] = (cycles, features, labels)
+		router_dirs = sorted(job_features)
+		#--------------------------------------------------------------------------------------------------------------------------
+
+		# Steps 2 to 4 are repeated for every moving average window. There is a single window unless ENABLE_MULTI_SCALE_WINDOW is True
+		for avg_cycles in get_avg_windows():
+			report_suffix = "" if avg_cycles == AVG_CYCLES else "_avg_" + str(avg_cycles)	# Weights and accuracy of other windows are written to separate files
+
+			# Step 2: Train all the jobs together
+			log.write("Process #" + str(ID) +"\tTraining " + str(len(router_dirs)) + " jobs together\n")
+			print("Process #" + str(ID) +"\tTraining " + str(len(router_dirs)) + " jobs together")
+			splits = {}	# {job : (cycles, features, labels, test_indices, train_indices, test_counts, train_counts)}
+			for job in router_dirs:
+				cycles, features, labels = job_features[job]
+				splits[job] = split_columns(cycles, feature_window.select_window(features, get_avg_windows(), avg_cycles), labels, log, ID)
+			datasets = [(splits[job][1][splits[job][4]], splits[job][2][splits[job][4]]) for job in router_dirs]
+			train_counts = None if not ENABLE_DEDUPLICATION else [splits[job][6] for job in router_dirs]
+			learnt = perceptron_trainer.train_many(datasets, USED_IDX, EPOCHS, LEARNING_RATE, JOINT_TRAINING_BLOCK_SIZE, train_counts, log, get_early_stopping_patience(), EARLY_STOPPING_DELTA, VALIDATION_RATIO, TRAINING_MODE)
+			#--------------------------------------------------------------------------------------------------------------------------
+
+			# Step 3: Test and write weights and accuracy
+			log.write("Process #" + str(ID) +"\tWriting weights and accuracy\n")
+			print("Process #" + str(ID) +"\tWriting weights and accuracy")
+			with open(working_directory + "/weights" + report_suffix, "a") as weights_file, open(working_directory + "/accuracy_report" + report_suffix, "a") as accuracy_file:
+				lockf(weights_file, LOCK_EX)	# Acquire locks. Other processes write the weights and accuracy of their shards to the same files
+				lockf(accuracy_file, LOCK_EX)
+				for job, (bias, weights, epochs) in zip(router_dirs, learnt):
+					cycles, features, labels, test_indices, train_indices, test_counts, train_counts = splits[job]
+					accuracy, false_positives, false_negatives = perceptron_trainer.test(features[test_indices], labels[test_indices], bias, weights, USED_IDX, test_counts)
+					weights_and_biases = get_weights_header(job) + [bias] + weights
+					weights_file.write(", ".join(map(str, weights_and_biases)) + "\n")
+					accuracy_file.write(str(job) + "\t: " + str(accuracy) + ", " + str(false_positives) + ", " + str(false_negatives) + "\n")
+					log.write("Process #" + str(ID) +"\tAccuracy for " + job + " is " + str(accuracy) + " after " + str(epochs) + " out of " + str(EPOCHS) + " epochs\n")
+
+					# Step 4: Store accuracy
+					with accuracy_lock:
+						accuracy_dict[(job, avg_cycles)] = accuracy
+				lockf(accuracy_file, LOCK_UN)	# Release locks
+				lockf(weights_file, LOCK_UN)
+			#--------------------------------------------------------------------------------------------------------------------------
+
+		log.write("Process #" + str(ID) + "\tExiting...\n")
+		print("Process #" + str(ID) + "\tExiting...")
+
+
+
 def main():
 	print("Running training")
 	
@@ -1038,8 +1301,8 @@ def main():
 	# Start feature generation step
 	print("Starting feature generation")
 
-	# Create files to lock onto later
-	print("Creating per port feature files")
+	# Create stores to append onto later
+	print("Creating per port feature stores")
 
 	feature_file_names = set()
 	# Initially add all ports
@@ -1067,8 +1330,7 @@ def main():
 		feature_file_names.remove(feature_file_name_to_be_removed)
 
 	for feature_file_name in feature_file_names:
-		cmd = "touch " + dir_name + "/per_port_features/" + feature_file_name
-		os.system(cmd)
+		feature_store.create(dir_name + "/per_port_features/" + feature_file_name, USED_FEATURES)	# Features which aren't parsed are recorded in the manifest
 
 	# Generate jobs
 	print("Generating jobs...")
@@ -1089,11 +1351,19 @@ def main():
 					jobs.put((pair, router))
 	print("Done!")
 
+	# Generate baseline features once for all the jobs
+	print("Generating baseline features")
+	feature_file_path_baseline = generate_baseline(benchmark_name, dir_name)
+	print("Done!")
+
 	# Create processes and generate features
 	print("Starting processes")
 	num_processes = int(sys.argv[2])
+	writer, writer_process = None, None
+	if(ENABLE_FEATURE_WRITER):
+		writer, writer_process = feature_writer.start_writer(dir_name + "/worker_logs_gen/writer")
 	for ID in range(num_processes):
-		process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, ))
+		process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, feature_file_path_baseline, writer, ))
 		process.start()
 		processes.append(process)
 	
@@ -1103,6 +1373,18 @@ def main():
 	processes.clear()
 	print("Done!")
 
+	# Wait for the writer to write all the blocks
+	if(ENABLE_FEATURE_WRITER):
+		print("Waiting for writer")
+		feature_writer.stop_writer(writer, writer_process)
+		print("Done!")
+
+	# Fold the shards written by every worker into the manifest of every port
+	print("Compacting per port features")
+	for feature_file_name in os.listdir(dir_name + "/per_port_features"):
+		feature_store.compact(dir_name + "/per_port_features/" + feature_file_name)
+	print("Done!")
+
 	# Merge port level features to create router level features
 	print("Starting merging")
 
@@ -1139,14 +1421,18 @@ def main():
 	# Generate jobs
 	print("Generating jobs")
 	per_router_features_dir = dir_name + "/per_router_features"
-	for file_name in os.listdir(per_router_features_dir):
-		jobs.put(file_name)
+	num_processes = int(sys.argv[3])
+	if(ENABLE_JOINT_TRAINING):	# Every process trains a shard of jobs together
+		for shard in shard_jobs(os.listdir(per_router_features_dir), per_router_features_dir, num_processes):
+			jobs.put(shard)
+	else:
+		for file_name in os.listdir(per_router_features_dir):
+			jobs.put(file_name)
 	print("Done!")
 
 	# Create processes and start training
-	num_processes = int(sys.argv[3])
 	for ID in range(num_processes):
-		process = mp.Process(target = worker_train, args = (ID, jobs, dir_name, accuracy, accuracy_lock, ))
+		process = mp.Process(target = worker_train_joint if ENABLE_JOINT_TRAINING else worker_train, args = (ID, jobs, dir_name, accuracy, accuracy_lock, ))
 		process.start()
 		processes.append(process)
 
@@ -1158,15 +1444,20 @@ def main():
 
 	# Find average accuracy
 	print("Calculating net accuracy")
-	total_jobs = 0
-	total_accuracy = 0
-	accuracy_net = 0
-	for job in accuracy:
-		total_jobs += 1
-		total_accuracy += accuracy[job]
-	if(total_jobs != 0):
-		accuracy_net = total_accuracy / total_jobs
-	print("Accuracy achieved is: " + str(accuracy_net) + "%")
+	for avg_cycles in get_avg_windows():
+		total_jobs = 0
+		total_accuracy = 0
+		accuracy_net = 0
+		for job, job_avg_cycles in accuracy.keys():
+			if(job_avg_cycles == avg_cycles):
+				total_jobs += 1
+				total_accuracy += accuracy[(job, job_avg_cycles)]
+		if(total_jobs != 0):
+			accuracy_net = total_accuracy / total_jobs
+		if(avg_cycles == AVG_CYCLES):
+			print("Accuracy achieved is: " + str(accuracy_net) + "%")
+		else:
+			print("Accuracy achieved with moving average of size " + str(avg_cycles) + " is: " + str(accuracy_net) + "%")
 
 	print("Done!")
 
@@ -12,6 +12,10 @@ import sys						# Used to read sys args
 from copy import deepcopy as cp	# Used to copy arrays
 from random import shuffle 		# Used to mix data around
 import os						# Used to remove training_report file
+import feature_parser			# Used to parse feature files
+import feature_window			# Used to take moving average of features
+import feature_dataset			# Used to merge and split datasets without copying
+import perceptron_trainer		# Used for early stopping and modes of training
 
 # Definitions for directions
 DIRECTIONS 		= 6
@@ -113,6 +117,8 @@ PARSED_STALLED_FLITS			= 3
 PARSED_TRANSMITTED_FLITS		= 4
 PARSED_BUFFER_WAITING_TIME		= 5
 PARSED_ANNOTATION				= 6
+# Format of feature file. Binary files (FEATURES_FORMAT_BIN) are memory mapped instead of being parsed (refer to feature_parser.py)
+FEATURES_FORMAT = feature_parser.FEATURES_FORMAT_TEXT
 """
 Parses the features from given file and generates data for given router and ports
 Args:
@@ -133,69 +139,17 @@ Rets:
 		buffer_waiting_time		: Average waiting time for all transmitted flits at current cycle
 """
 def parse_features(feature_file, router_and_ports):
-	all_info = {}	# This dictionary stores the parsed data
-
-	# Read data from csv file
 	print("Reading from file :", feature_file)
-	with open(feature_file, 'r') as csv_in:
-		current_info = csv_in.readline()
-		while current_info:
-			data = current_info.split(", ") # data temporarily stores the parsed features. It's of the type list
-			data = list(map(int, data))	# Map everything to integers
-			# Calculate the router index in the format (router_x, router_y)
-			router_id = data[ROUTER_ID] 
-			router_x = router_id % DIM_X
-			router_y = router_id // DIM_X
-			router = (router_x, router_y)
-
-			cycle = data[CYCLE] # Extract out the cycle
-
-			# Iterate over all ports and add data to router_info if needed
-			for port in range(DIRECTIONS):
-				start_index = PORT_FEATURE_OFFSET + (port * PORT_FEATURE_COUNT) # This is the index of first feature for port (inclusive)
-				end_index = start_index + PORT_FEATURE_COUNT  # This is the last index for features of port (exclusive)
-				value = data[start_index : end_index] # Extract out features
-
-				# Insert data into to all_info
-				router_port = (router, port) # This is used as the key in all_info
-				if(router_port not in all_info):
-					all_info[router_port] = [] # Create a list if one doesn't exist yet
-				all_info[router_port].append([cycle] + value) # Insert the value i.e features
-
-			current_info = csv_in.readline()	# Read next line
+	router_ids = feature_parser.get_projection(router_and_ports, None, DIM_X)[0]	# Only the routers on the path and the routers connected to them are converted
+	cycles, router_ids, features = feature_parser.load_features(feature_file, router_ids, None, FEATURES_FORMAT)
 	print("Done!")
 
 	# Generate output dictionary
 	print("Generating router_info")
+	paired = feature_parser.pair_ports(cycles, router_ids, features, router_and_ports, DIM_X)
 	router_info = {}	 # Initialize output dictionary
 	for router_port in router_and_ports:
-		router_info[router_port] = [] # Initialize entry in all info
-
-		other_router = get_connected_router_and_port(router_port) # Get connected router
-
-		assert(len(all_info[other_router]) == len(all_info[router_port]))
-		enteries = len(all_info[router_port])	 # Get total number of enteries
-		for idx in range(enteries):
-			current_cycle_entry = []
-			assert(all_info[other_router][idx][CURRENT_CYCLE] == all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Start inserting parameters
-			# Cycle
-			current_cycle_entry.append(all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Rx features
-			current_cycle_entry.append(all_info[router_port][idx][BUFFER_STATUS])
-			current_cycle_entry.append(all_info[router_port][idx][CYCLES_SINCE_LAST_FLIT])
-			
-			# Tx features
-			current_cycle_entry.append(all_info[other_router][idx][STALLED_FLITS])
-			current_cycle_entry.append(all_info[other_router][idx][TRANSMITTED_FLITS])
-			if(all_info[other_router][idx][TRANSMITTED_FLITS] == 0):	# Check if no flits were transmitted
-				current_cycle_entry.append(0)	# No flits transmitteed i.e 0 wating time
-			else:
-				current_cycle_entry.append(all_info[other_router][idx][CUMULATIVE_LATENCY] / all_info[other_router][idx][TRANSMITTED_FLITS])	# Buffer waiting time = total time the flits waited / No. of flits
-
-			router_info[router_port].append(current_cycle_entry) # Insert in router info
+		router_info[router_port] = feature_parser.columns_to_entries(paired[router_port])
 	print("Done!")
 	return router_info
 
@@ -227,31 +181,11 @@ def pre_process(router_info):
 	# 	[0, 0, 1] : avg is 1-0/1 = 1
 	# 	[0, 1, 3] : avg is 3-0/2 =  3/2 (Notice instread of 2, we inserted 2 + window[-1])
 	# 	[1, 3, 5] : avg is 5-1/3 = 4/3 (Notice instread of 3, we inserted 3 + window[-1])
-	# This makes the time complexity independent of AVG_CYCLES
+	# This makes the time complexity independent of AVG_CYCLES. The cumulative sums of all the ports are computed together (refer to feature_window.py)
 
 	# Start moving average process
 	print("Taking moving average of size", AVG_CYCLES)
-	for router_port in router_info:
-		windows = {	# initialize windows
-			PARSED_BUFFER_STATUS 			: [0] * AVG_CYCLES,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: [0] * AVG_CYCLES,
-			PARSED_STALLED_FLITS			: [0] * AVG_CYCLES,
-			PARSED_TRANSMITTED_FLITS		: [0] * AVG_CYCLES,
-			PARSED_BUFFER_WAITING_TIME		: [0] * AVG_CYCLES
-		}
-
-		current_number_of_elements_in_window = 0
-		for entry_idx in range(len(router_info[router_port])): # Iterate over sample points
-			for feature in windows: # Iterate over every feature
-				windows[feature].pop(0)	# remove the first element 
-				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature] # Calculate the value to be added
-				windows[feature].append(value_to_insert)	# Insert the value
-				current_number_of_elements_in_window += 1
-				current_number_of_elements_in_window = min(current_number_of_elements_in_window, AVG_CYCLES) # This ensures that when taling average, we divide by the correct no. of elements
-				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window	# Calculate average
-
-				router_info[router_port][entry_idx][feature] = avg	# Update to average value
-	
+	router_info = feature_window.average_router_info(router_info, [AVG_CYCLES])	# All the ports are averaged in a single pass
 	print("Done!")
 	return router_info
 
@@ -295,8 +229,7 @@ def merge_info(set_1, set_2):
 	print("Merging....")
 	merged = {}
 	for router_port in set_1:
-		merged[router_port] = cp(set_1[router_port])	# Add enteries from set 1
-		merged[router_port].extend(cp(set_2[router_port]))	# Add enteries from set 2
+		merged[router_port] = feature_dataset.concatenate([set_1[router_port], set_2[router_port]])	# Rows are shared with both the sets
 
 	print("Done!")
 	return merged
@@ -312,38 +245,14 @@ Args:
 Rets:
 	test	: Testing part of data
 	train	: Training part of data
-	The format for both is same as input
+	The format for both is same as input. The rows aren't copied
 """
 def test_train_splitter(current_info):
-	# Split the data into satured and unsatured to ensure better mixing
-	# Initialize both sets	
-	saturated = [] 
-	unsaturated = []
-
-	# Add data to saturated and unsatured sets
-	for info in current_info:
-		if(info[PARSED_ANNOTATION] == SATURATED):
-			saturated.append(cp(info))
-		else:
-			unsaturated.append(cp(info))
-
-	# Make test and train sets
-	test = []
-	train = []
-
-	# Add saturated datapoints
-	split_index = int(TRAINING_RATIO * len(saturated))
-	train += saturated[:split_index]
-	test += saturated[split_index:]
-
-	# Add unsaturated datapoints
-	split_index = int(TRAINING_RATIO * len(unsaturated))
-	train += unsaturated[:split_index]
-	test += unsaturated[split_index:]	
-
-	# Shuffle the test and train sets
-	shuffle(test)
-	shuffle(train)
+	# Split the saturated and unsaturated datapoints separately to ensure better mixing
+	# Only the indices are shuffled. The rows of test and train sets are shared with current_info
+	test_indices, train_indices = feature_dataset.split_indices([info[PARSED_ANNOTATION] for info in current_info], TRAINING_RATIO)
+	test = feature_dataset.take_rows(current_info, test_indices)
+	train = feature_dataset.take_rows(current_info, train_indices)
 
 	return test, train
 
@@ -369,6 +278,18 @@ def predict(bias, weights, vector):
 # Learning parameters
 EPOCHS = 5000
 LEARNING_RATE = 0.00005
+# Early stopping (refer to perceptron_trainer.create_early_stopping()). Training stops before EPOCHS once the error hasn't improved by
+# a fraction EARLY_STOPPING_DELTA for EARLY_STOPPING_PATIENCE epochs. The error is the squared error of training, or the error on
+# VALIDATION_RATIO of the training samples if it isn't 0 (these samples are held out of training)
+ENABLE_EARLY_STOPPING = False
+EARLY_STOPPING_PATIENCE = 50
+EARLY_STOPPING_DELTA = 0.01
+VALIDATION_RATIO = 0.0
+# Mode of training i.e. the weights which are kept (refer to perceptron_trainer.py)
+#	PERCEPTRON_PLAIN	: Weights after the last update
+#	PERCEPTRON_POCKET	: Weights of the epoch with the lowest error on training (or validation) samples
+#	PERCEPTRON_AVERAGED	: Average of weights after every sample
+TRAINING_MODE = perceptron_trainer.PERCEPTRON_PLAIN
 """
 Learns the weights for percepton
 Args:
@@ -380,6 +301,15 @@ Rets:
 def train_weights(train):
 	bias = 0.0
 	weights = [0] * PARSED_FEATURE_COUNT
+	stopping = perceptron_trainer.create_early_stopping(EARLY_STOPPING_PATIENCE, EARLY_STOPPING_DELTA) if ENABLE_EARLY_STOPPING else None
+	validation = None
+	if(stopping is not None and VALIDATION_RATIO > 0):	# Hold out validation samples
+		validation_indices, train_indices = feature_dataset.split_indices([data_point[-1] for data_point in train], 1 - VALIDATION_RATIO)
+		validation = feature_dataset.take_rows(train, validation_indices)
+		train = feature_dataset.take_rows(train, train_indices)
+	sum_bias, sum_weights, occurrences = 0.0, [0] * PARSED_FEATURE_COUNT, 0	# Sums of weights after every sample for PERCEPTRON_AVERAGED
+	pocket = (float("inf"), bias, list(weights))	# (error, bias, weights) of the best epoch for PERCEPTRON_POCKET
+	model = (bias, weights)	# Initial weights if no epoch runs
 	for epoch in range(EPOCHS):	# Iterate over all epochs
 		print("Running epoch:", epoch + 1, "out of", EPOCHS, end = "")
 		shuffle(train)	# Shuffle dataset on each pass
@@ -392,9 +322,29 @@ def train_weights(train):
 			bias += LEARNING_RATE * error # Update bias
 			for w_idx in range(len(weights)):	# Update weights
 				weights[w_idx] += LEARNING_RATE * error * data_features[w_idx]
+			if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+				sum_bias += bias
+				for w_idx in range(len(weights)):
+					sum_weights[w_idx] += weights[w_idx]
+				occurrences += 1
 			# print(bias, weights)
 		print(" Error:", sq_error, '\t\t\t\t\t', end = "\r")
+
+		# Weights learnt till now
+		if(TRAINING_MODE == perceptron_trainer.PERCEPTRON_POCKET):
+			error = 100 - test_weights(train if validation is None else validation, weights, bias)
+			if(error < pocket[0]):
+				pocket = (error, bias, list(weights))
+			model = pocket[1:]
+		elif(TRAINING_MODE == perceptron_trainer.PERCEPTRON_AVERAGED):
+			model = (sum_bias / max(occurrences, 1), [weight / max(occurrences, 1) for weight in sum_weights])	# There are no occurrences if train is empty
+		else:
+			model = (bias, weights)
+		if(stopping is not None and perceptron_trainer.update_early_stopping(stopping, sq_error if validation is None else 100 - test_weights(validation, model[1], model[0]))):
+			break
 	print()
+	print("Trained for", epoch + 1, "out of", EPOCHS, "epochs")
+	bias, weights = model
 	return bias, weights
 
 
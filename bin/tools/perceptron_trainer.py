@@ -0,0 +1,499 @@
+"""
+This module implements a vectorized perceptron trainer used by the router server scripts instead of train_weights() and test_weights().
+The update rule is the same as train_weights() i.e. for every misclassified sample
+	bias += learning_rate * error, weights[idx] += learning_rate * error * feature[idx] for idx in used_idx
+The samples are processed in blocks (mini batches) of block_size samples. All the samples of a block are predicted with the
+weights at the start of the block and their updates are added together, hence
+	1.) block_size = 1 has exactly the semantics of train_weights() i.e. every sample sees the updates of all earlier samples
+	2.) Larger blocks replace the per sample Python loop by a matrix vector product and a vector matrix product per block.
+		The updates of a block are delayed by at most block_size samples. The learnt weights vary more if an epoch has only a
+		few blocks, hence large blocks should only be used for large datasets
+A weighted sample (refer to feature_dataset.deduplicate()) is trained as its copies presented one after the other (same as train_weights())
+i.e. the copies update the weights till the prediction flips, and the number of such updates is calculated from the activation (refer to get_updates()).
+This is an approximation of training on the samples repeated as many times as their count, where the copies are spread over the shuffled epoch.
+PERCEPTRON_AVERAGED also counts the weights after the last update of a weighted sample once per copy.
+The samples of a feature store can be trained on without reading them into memory via train_store() and test_store(), which gather every
+shuffled block from the shards (refer to feature_store.iter_minibatches()).
+Several datasets (e.g. all the routers) can be trained together with train_many(), which advances all of them in the same loop.
+Training can stop before the last epoch once the error of an epoch hasn't improved for a few epochs (refer to create_early_stopping()).
+The weights which are returned depend on the mode of training
+	1.) PERCEPTRON_PLAIN	: The weights after the last update (same as train_weights())
+	2.) PERCEPTRON_POCKET	: The weights at the end of the epoch with the lowest error on the training (or validation) samples
+	3.) PERCEPTRON_AVERAGED	: The average of the weights after every sample, which is much more stable on data which isn't linearly separable
+All the modes learn a single bias and weight vector, hence the rows of the weights file have the same format.
+The features and annotations are NumPy arrays i.e. the columns of a feature store. The learnt weights have the same format
+as train_weights(), hence the rows of the weights file are unchanged.
+The module can be imported by tools in this directory via the following line
+	import perceptron_trainer
+"""
+
+import numpy as np		# Used to train and test
+import feature_dataset	# Used to hold out validation samples
+import feature_store	# Used to read blocks of samples of stores
+
+# Default number of samples which are predicted together
+TRAINER_BLOCK_SIZE = 256
+
+# Default minimum relative improvement of error for early stopping
+EARLY_STOPPING_DELTA = 0.01
+
+# Modes of training
+PERCEPTRON_PLAIN	= "plain"		# Weights after the last update
+PERCEPTRON_POCKET	= "pocket"		# Weights of the epoch with the lowest error
+PERCEPTRON_AVERAGED	= "averaged"	# Average of weights after every sample
+
+
+
+"""
+Generates the predictions of a perceptron
+Args:
+	bias		: Bias
+	weights		: Array of weights of used features
+	features	: Array of shape (samples, len(weights)) with the used features
+Rets:
+	Array of predictions (1.0 if activated else 0.0)
+"""
+def predict(bias, weights, features):
+	return (features @ weights + bias >= 0.0).astype(np.float64)
+
+
+
+"""
+Creates the state of early stopping. Training stops once the error hasn't improved by a fraction delta of the best error
+for patience epochs in a row. The error is the squared error of an epoch or the error on validation samples.
+Args:
+	patience	: Number of epochs without improvement after which training stops
+	delta		: Minimum relative improvement of error
+Rets:
+	stopping	: Dictionary with the following format
+		{"patience" : patience, "delta" : delta, "best" : Lowest error till now, "stale_epochs" : No. of epochs since the lowest error}
+"""
+def create_early_stopping(patience, delta = EARLY_STOPPING_DELTA):
+	assert(patience > 0)
+	return {"patience" : patience, "delta" : delta, "best" : np.inf, "stale_epochs" : 0}
+
+
+
+"""
+Updates the state of early stopping with the error of an epoch
+Args:
+	stopping	: State as returned by create_early_stopping() (Not preserved)
+	error		: Error of the epoch
+Rets:
+	True if training should stop
+"""
+def update_early_stopping(stopping, error):
+	if(error < stopping["best"] * (1 - stopping["delta"]) or stopping["best"] == np.inf):
+		stopping["best"] = error
+		stopping["stale_epochs"] = 0
+	else:
+		stopping["stale_epochs"] += 1
+	return stopping["stale_epochs"] >= stopping["patience"]
+
+
+
+"""
+Holds out validation samples of a dataset for early stopping. The split is stratified (refer to feature_dataset.split_indices())
+Args:
+	features			: Array of shape (samples, feature_count)
+	labels				: Array of annotation of every sample
+	counts				: Array of number of occurrences of every sample
+	validation_ratio	: Fraction of samples of every class which are held out
+Rets:
+	train		: (features, labels, counts) of samples which are trained on
+	validation	: (features, labels, counts) of held out samples
+"""
+def split_validation(features, labels, counts, validation_ratio):
+	validation_indices, train_indices = feature_dataset.split_indices(labels, 1 - validation_ratio)
+	return (features[train_indices], labels[train_indices], counts[train_indices]), (features[validation_indices], labels[validation_indices], counts[validation_indices])
+
+
+
+"""
+Generates the number of misclassified samples
+Args:
+	bias		: Bias
+	weights		: Array of weights of used features
+	features	: Array of shape (samples, len(weights)) with the used features
+	labels		: Array of annotation of every sample
+	counts		: Array of number of occurrences of every sample
+Rets:
+	Number of misclassified occurrences of samples
+"""
+def get_error(bias, weights, features, labels, counts):
+	return float(counts[predict(bias, weights, features) != labels].sum())
+
+
+
+"""
+Generates the updates of a block of samples. A sample with n occurrences updates the weights as its copies would if they were
+presented one after the other i.e. till the prediction flips, which is at most n updates (same as train_weights()).
+It isn't the same as training on the n copies in a shuffled order, where the other samples update the weights between the copies.
+Args:
+	errors			: Array of error of every sample (annotation - prediction)
+	activations		: Array of activation of every sample
+	features		: Array of shape (errors.shape, len(weights)) with the used features
+	counts			: Array of number of occurrences of every sample
+	learning_rate	: Learning rate
+Rets:
+	Array of error times number of updates of every sample
+"""
+def get_updates(errors, activations, features, counts, learning_rate):
+	steps = learning_rate * (1 + (features ** 2).sum(axis = -1))	# Change of activation per update
+	flip_updates = np.where(errors > 0, np.ceil(-activations / steps), np.floor(activations / steps) + 1)
+	return errors * np.minimum(counts, np.maximum(flip_updates, 1))
+
+
+
+"""
+Generates a source of blocks of samples which are held in memory (refer to train_blocks())
+Args:
+	data	: Array of shape (samples, used features + 2) with the used features, annotation and number of occurrences of every sample
+Rets:
+	get_blocks	: Function which takes an array of index of samples and a block size, and generates the blocks of data of these samples
+"""
+def get_array_blocks(data):
+	return lambda indices, block_size : (np.take(data, indices[start : start + block_size], axis = 0) for start in range(0, len(indices), block_size))
+
+
+
+"""
+Generates a source of blocks of samples which are gathered from a feature store only when they're needed (refer to feature_store.iter_minibatches())
+Args:
+	store_path		: Path of store
+	store_indices	: Array of index of samples of store (in the order of feature_store.read()) which form the dataset
+	used_idx		: List of index of features used by the perceptron
+	transform		: Function applied to the features of every block before the used features are selected. None if not required
+Rets:
+	get_blocks	: Same as get_array_blocks(). Every sample occurs once
+"""
+def get_store_blocks(store_path, store_indices, used_idx, transform = None):
+	def get_blocks(indices, block_size):
+		for cycles, features, labels in feature_store.iter_minibatches(store_path, store_indices[indices], block_size):
+			if(transform is not None):
+				features = transform(features)
+			yield np.column_stack((np.asarray(features, dtype = np.float64)[:, used_idx], labels, np.ones(len(labels))))
+	return get_blocks
+
+
+
+# Number of samples which are predicted together while calculating the error of all the samples of a source
+EVALUATION_BLOCK_SIZE = 1 << 16
+"""
+Generates the number of misclassified samples of a source of blocks (refer to get_error())
+Args:
+	bias		: Bias
+	weights		: Array of weights of used features
+	get_blocks	: Source of blocks as returned by get_array_blocks() or get_store_blocks()
+	samples		: Number of samples of source
+Rets:
+	Number of misclassified occurrences of samples
+"""
+def get_blocks_error(bias, weights, get_blocks, samples):
+	return sum(get_error(bias, weights, block[:, : -2], block[:, -2], block[:, -1]) for block in get_blocks(np.arange(samples), EVALUATION_BLOCK_SIZE))
+
+
+
+"""
+Places the learnt weights of used features in a list of weights of all the features
+Args:
+	weights			: Array of learnt weights of used features
+	used_idx		: List of index of features used by the perceptron
+	feature_count	: Number of features
+Rets:
+	learnt_weights	: List of feature_count weights. The weights of unused features are 0
+"""
+def get_learnt_weights(weights, used_idx, feature_count):
+	learnt_weights = [0] * feature_count
+	for idx, weight in zip(used_idx, np.asarray(weights).tolist()):
+		learnt_weights[idx] = weight
+	return learnt_weights
+
+
+
+"""
+Learns the bias and weights of a perceptron from a source of blocks of samples. It's used by train() and train_store().
+Args:
+	get_blocks		: Source of blocks of training samples as returned by get_array_blocks() or get_store_blocks()
+	samples			: Number of training samples
+	used_count		: Number of used features
+	epochs			: Number of passes over the samples
+	learning_rate	: Learning rate
+	block_size		: Number of samples which are predicted together
+	log				: File to print log to. None if nothing is logged
+	patience		: Number of epochs without improvement of error after which training stops. None to train for all the epochs
+	delta			: Minimum relative improvement of error
+	validation		: (get_blocks, samples) of held out samples to calculate the error for early stopping. None to use the squared error of training
+	mode			: PERCEPTRON_PLAIN, PERCEPTRON_POCKET or PERCEPTRON_AVERAGED
+Rets:
+	bias	: Learnt bias
+	weights	: Array of learnt weights of used features
+	epochs	: Number of epochs which were run
+"""
+def train_blocks(get_blocks, samples, used_count, epochs, learning_rate, block_size, log, patience, delta, validation, mode):
+	stopping = None if patience is None else create_early_stopping(patience, delta)
+	bias = 0.0
+	weights = np.zeros(used_count)
+	sum_bias, sum_weights, occurrences = 0.0, np.zeros(used_count), 0.0	# Sums of weights after every sample for PERCEPTRON_AVERAGED
+	pocket = (np.inf, bias, weights.copy())	# (error, bias, weights) of the best epoch for PERCEPTRON_POCKET
+	for epoch in range(epochs):
+		if(log is not None):
+			log.write("Running epoch: " + str(epoch + 1) + " out of " + str(epochs) + ":\t")
+		sq_error = 0.0
+		for block in get_blocks(np.random.permutation(samples), block_size):	# Shuffle dataset on each pass
+			block_features = block[:, : -2]
+			activations = block_features @ weights + bias
+			errors = block[:, -2] - (activations >= 0.0)	# Same as predict()
+			updates = get_updates(errors, activations, block_features, block[:, -1], learning_rate)	# Occurrences of a sample update till the prediction flips
+			sq_error += updates @ errors
+			bias += learning_rate * updates.sum()
+			weights += learning_rate * (updates @ block_features)
+			if(mode == PERCEPTRON_AVERAGED):	# The weights are same for all the samples of a block
+				block_occurrences = block[:, -1].sum()
+				sum_bias += block_occurrences * bias
+				sum_weights += block_occurrences * weights
+				occurrences += block_occurrences
+		if(log is not None):
+			log.write(str(sq_error) + "\n")
+
+		# Weights learnt till now
+		if(mode == PERCEPTRON_POCKET):
+			error = get_blocks_error(bias, weights, *(validation if validation is not None else (get_blocks, samples)))
+			if(error < pocket[0]):
+				pocket = (error, bias, weights.copy())
+			model = pocket[1:]
+		elif(mode == PERCEPTRON_AVERAGED):
+			model = (sum_bias / max(occurrences, 1), sum_weights / max(occurrences, 1))
+		else:
+			model = (bias, weights)
+		if(stopping is not None and update_early_stopping(stopping, sq_error if validation is None else get_blocks_error(*model, *validation))):
+			break
+
+	if(epochs > 0):
+		bias, weights = model
+	return float(bias), weights, epoch + 1 if epochs > 0 else 0
+
+
+
+"""
+Learns the bias and weights of a perceptron
+Args:
+	features		: Array of shape (samples, feature_count)
+	labels			: Array of annotation of every sample
+	used_idx		: List of index of features used by the perceptron
+	epochs			: Number of passes over the samples
+	learning_rate	: Learning rate
+	block_size		: Number of samples which are predicted together
+	sample_weights	: Array of number of occurrences of every sample. None if every sample occurs once
+	log				: File to print log to. None if nothing is logged
+	patience		: Number of epochs without improvement of error after which training stops (refer to create_early_stopping()). None to train for all the epochs
+	delta			: Minimum relative improvement of error
+	validation_ratio: Fraction of samples which are held out to calculate the error for early stopping. The squared error of training is used if 0
+	mode			: PERCEPTRON_PLAIN, PERCEPTRON_POCKET or PERCEPTRON_AVERAGED
+Rets:
+	bias	: Learnt bias
+	weights	: List of feature_count learnt weights. The weights of unused features are 0
+	epochs	: Number of epochs which were run
+"""
+def train(features, labels, used_idx, epochs, learning_rate, block_size = TRAINER_BLOCK_SIZE, sample_weights = None, log = None, patience = None, delta = EARLY_STOPPING_DELTA, validation_ratio = 0.0, mode = PERCEPTRON_PLAIN):
+	assert(mode in [PERCEPTRON_PLAIN, PERCEPTRON_POCKET, PERCEPTRON_AVERAGED])
+	feature_count = np.shape(features)[1]
+	features = np.asarray(features, dtype = np.float64)[:, used_idx]
+	labels = np.asarray(labels, dtype = np.float64)
+	counts = np.ones(len(labels)) if sample_weights is None else np.asarray(sample_weights, dtype = np.float64)
+	validation = None
+	if(patience is not None and validation_ratio > 0):
+		(features, labels, counts), validation = split_validation(features, labels, counts, validation_ratio)
+		validation = (get_array_blocks(np.column_stack(validation)), len(validation[1]))
+	data = np.column_stack((features, labels, counts))	# A single array is shuffled much faster than its columns
+
+	bias, weights, epochs = train_blocks(get_array_blocks(data), len(data), len(used_idx), epochs, learning_rate, block_size, log, patience, delta, validation, mode)
+	return bias, get_learnt_weights(weights, used_idx, feature_count), epochs
+
+
+
+"""
+Learns the bias and weights of a perceptron on samples of a feature store without reading them into memory. Same as train() otherwise.
+Every epoch gathers the shuffled blocks directly from the shards (the referenced rows of a virtual store are read in place), hence only
+a block of samples is held in memory. The validation samples are held out by a stratified split of the index of samples.
+Args:
+	store_path		: Path of store. It must not be empty
+	indices			: Array of index of samples of store (in the order of feature_store.read()) which are trained on
+	used_idx		: List of index of features used by the perceptron
+	epochs, learning_rate, block_size, log, patience, delta, validation_ratio, mode	: Same as train()
+	transform		: Function applied to the features of every block (e.g. normalization and selection of window). None if not required
+Rets:
+	Same as train()
+"""
+def train_store(store_path, indices, used_idx, epochs, learning_rate, block_size = TRAINER_BLOCK_SIZE, log = None, patience = None, delta = EARLY_STOPPING_DELTA, validation_ratio = 0.0, mode = PERCEPTRON_PLAIN, transform = None):
+	assert(mode in [PERCEPTRON_PLAIN, PERCEPTRON_POCKET, PERCEPTRON_AVERAGED])
+	first_features = next(feature_store.iter_minibatches(store_path, np.zeros(1, dtype = np.intp), 1))[1]	# The number of features is known after the transform
+	feature_count = np.shape(first_features if transform is None else transform(first_features))[1]
+	indices = np.asarray(indices, dtype = np.intp)
+	validation = None
+	if(patience is not None and validation_ratio > 0):	# Same split as split_validation()
+		validation_positions, train_positions = feature_dataset.split_indices(feature_store.read_column(store_path, "labels")[indices], 1 - validation_ratio)
+		validation = (get_store_blocks(store_path, indices[validation_positions], used_idx, transform), len(validation_positions))
+		indices = indices[train_positions]
+
+	bias, weights, epochs = train_blocks(get_store_blocks(store_path, indices, used_idx, transform), len(indices), len(used_idx), epochs, learning_rate, block_size, log, patience, delta, validation, mode)
+	return bias, get_learnt_weights(weights, used_idx, feature_count), epochs
+
+
+
+"""
+Learns the bias and weights of a perceptron for every dataset at once. Same as train() on every dataset, but the datasets are
+advanced together i.e. a block has block_size samples of every dataset and is predicted and updated with batched matrix products
+(np.matmul over an array of shape (datasets, block_size, features)).
+Hence the Python loop runs once for all the datasets and block_size = 1 trains all of them with exactly the semantics of train_weights().
+The samples of all the datasets are held once in a single array without padding. Every dataset is shuffled independently on each pass
+by permuting its indices, and a block gathers only its samples. Datasets which are shorter than the current block are masked i.e. their
+missing samples have no weight and never update the weights.
+Args:
+	datasets		: List of (features, labels) as passed to train()
+	used_idx		: List of index of features used by the perceptrons
+	epochs			: Number of passes over the samples
+	learning_rate	: Learning rate
+	block_size		: Number of samples of every dataset which are predicted together
+	sample_weights	: List of array of number of occurrences of every sample of every dataset. None if every sample occurs once
+	log				: File to print log to. The squared error of all the datasets is logged. None if nothing is logged
+	patience, delta, validation_ratio	: Early stopping as in train(). A dataset which stops isn't updated any more
+	mode			: PERCEPTRON_PLAIN, PERCEPTRON_POCKET or PERCEPTRON_AVERAGED
+Rets:
+	List of (bias, weights, epochs) of every dataset as returned by train()
+"""
+def train_many(datasets, used_idx, epochs, learning_rate, block_size = TRAINER_BLOCK_SIZE, sample_weights = None, log = None, patience = None, delta = EARLY_STOPPING_DELTA, validation_ratio = 0.0, mode = PERCEPTRON_PLAIN):
+	assert(mode in [PERCEPTRON_PLAIN, PERCEPTRON_POCKET, PERCEPTRON_AVERAGED])
+	stoppings = [None if patience is None else create_early_stopping(patience, delta) for dataset in datasets]
+	validations = [None] * len(datasets)
+	train_indices = [np.arange(len(labels)) for features, labels in datasets]	# Index of samples of every dataset which are trained on
+	for dataset_idx, (features, labels) in enumerate(datasets):
+		if(patience is not None and validation_ratio > 0):	# Hold out validation samples (refer to split_validation())
+			validation_indices, train_indices[dataset_idx] = feature_dataset.split_indices(labels, 1 - validation_ratio)
+			counts = np.ones(len(labels)) if sample_weights is None else np.asarray(sample_weights[dataset_idx], dtype = np.float64)
+			validations[dataset_idx] = (np.asarray(features, dtype = np.float64)[validation_indices][:, used_idx], np.asarray(labels, dtype = np.float64)[validation_indices], counts[validation_indices])
+	lengths = np.array([len(indices) for indices in train_indices], dtype = np.intp)
+	offsets = np.concatenate(([0], np.cumsum(lengths)[: -1])).astype(np.intp)	# Index of first sample of every dataset in data
+
+	data = np.empty((int(lengths.sum()), len(used_idx) + 2))	# Samples of all the datasets are placed one after the other
+	columns = []	# (features, labels, counts) of every dataset. They are views of data
+	for dataset_idx, (features, labels) in enumerate(datasets):
+		indices = train_indices[dataset_idx]
+		dataset_data = data[offsets[dataset_idx] : offsets[dataset_idx] + lengths[dataset_idx]]
+		dataset_data[:, : -2] = np.asarray(features)[indices[:, None], used_idx]	# Only the used features of the samples are gathered
+		dataset_data[:, -2] = np.asarray(labels)[indices]
+		dataset_data[:, -1] = 1.0 if sample_weights is None else np.asarray(sample_weights[dataset_idx])[indices]
+		columns.append((dataset_data[:, : -2], dataset_data[:, -2], dataset_data[:, -1]))
+
+	samples = int(lengths.max(initial = 0))
+	last_samples = np.maximum(lengths - 1, 0)
+	order = np.empty(len(data), dtype = np.intp)	# Shuffled index of samples of every dataset (in its own part of data)
+	bias = np.zeros(len(datasets))
+	weights = np.zeros((len(datasets), len(used_idx)))
+	sum_bias, sum_weights, occurrences = np.zeros(len(datasets)), np.zeros((len(datasets), len(used_idx))), np.zeros(len(datasets))	# PERCEPTRON_AVERAGED
+	pocket_errors, pocket_bias, pocket_weights = np.full(len(datasets), np.inf), bias.copy(), weights.copy()	# PERCEPTRON_POCKET
+	model_bias, model_weights = bias, weights	# Weights learnt till now
+	dataset_epochs = [epochs] * len(datasets)
+	active = list(range(len(datasets)))	# Datasets which haven't stopped
+	for epoch in range(epochs):
+		if(len(active) == 0):
+			break
+		if(log is not None):
+			log.write("Running epoch: " + str(epoch + 1) + " out of " + str(epochs) + ":\t")
+		for dataset_idx in range(len(datasets)):	# Shuffle every dataset on each pass
+			order[offsets[dataset_idx] : offsets[dataset_idx] + lengths[dataset_idx]] = offsets[dataset_idx] + np.random.permutation(lengths[dataset_idx])
+		sq_errors = np.zeros(len(datasets))
+		for start in range(0, samples, block_size):
+			positions = np.arange(start, min(start + block_size, samples))
+			block = np.take(data, np.take(order, offsets[:, None] + np.minimum(positions, last_samples[:, None]), mode = "clip"), axis = 0)	# Shape (datasets, block, features + 2). Empty datasets are clipped and masked
+			block_features = block[..., : -2]
+			block_counts = block[..., -1] * (positions < lengths[:, None])	# Datasets which are shorter than the block are masked
+			activations = np.matmul(block_features, weights[:, :, None])[..., 0] + bias[:, None]	# A matrix vector product per dataset
+			errors = block[..., -2] - (activations >= 0.0)	# Same as predict()
+			updates = get_updates(errors, activations, block_features, block_counts, learning_rate)	# Occurrences of a sample update till the prediction flips
+			sq_errors += (updates * errors).sum(axis = 1)
+			bias += learning_rate * updates.sum(axis = 1)
+			weights += learning_rate * np.matmul(updates[:, None, :], block_features)[:, 0, :]	# A vector matrix product per dataset
+			if(mode == PERCEPTRON_AVERAGED):	# Stopped datasets and masked samples have no occurrences
+				block_occurrences = block_counts.sum(axis = 1)
+				sum_bias += block_occurrences * bias
+				sum_weights += block_occurrences[:, None] * weights
+				occurrences += block_occurrences
+		if(log is not None):
+			log.write(str(sq_errors.sum()) + "\n")
+
+		# Weights learnt till now
+		if(mode == PERCEPTRON_POCKET):
+			for dataset_idx in active:
+				error = get_error(bias[dataset_idx], weights[dataset_idx], *(validations[dataset_idx] if validations[dataset_idx] is not None else columns[dataset_idx]))
+				if(error < pocket_errors[dataset_idx]):
+					pocket_errors[dataset_idx], pocket_bias[dataset_idx], pocket_weights[dataset_idx] = error, bias[dataset_idx], weights[dataset_idx]
+			model_bias, model_weights = pocket_bias, pocket_weights
+		elif(mode == PERCEPTRON_AVERAGED):
+			model_bias, model_weights = sum_bias / np.maximum(occurrences, 1), sum_weights / np.maximum(occurrences, 1)[:, None]
+
+		if(patience is not None):
+			for dataset_idx in list(active):
+				error = sq_errors[dataset_idx] if validations[dataset_idx] is None else get_error(model_bias[dataset_idx], model_weights[dataset_idx], *validations[dataset_idx])
+				if(update_early_stopping(stoppings[dataset_idx], error)):
+					columns[dataset_idx][2][:] = 0.0	# Samples of a stopped dataset have no weight
+					dataset_epochs[dataset_idx] = epoch + 1
+					active.remove(dataset_idx)
+
+	learnt = []
+	for dataset_idx, (dataset_bias, dataset_weights) in enumerate(zip(model_bias.tolist(), model_weights.tolist())):
+		learnt.append((dataset_bias, get_learnt_weights(dataset_weights, used_idx, np.shape(datasets[0][0])[1]), dataset_epochs[dataset_idx]))
+	return learnt
+
+
+
+"""
+Tests the learnt bias and weights
+Args:
+	features		: Array of shape (samples, feature_count)
+	labels			: Array of annotation of every sample
+	bias			: Learnt bias
+	weights			: List of feature_count learnt weights
+	used_idx		: List of index of features used by the perceptron
+	sample_weights	: Array of number of occurrences of every sample. None if every sample occurs once
+Rets:
+	accuracy		: A value between 0 and 100 describing the accuracy of the model
+	false_positives	: Percentage of predictions which were false positives
+	false_negatives	: Percentage of predictions which were false negatives
+"""
+def test(features, labels, bias, weights, used_idx, sample_weights = None):
+	features = np.asarray(features, dtype = np.float64)
+	labels = np.asarray(labels, dtype = np.float64)
+	counts = np.ones(len(labels)) if sample_weights is None else np.asarray(sample_weights, dtype = np.float64)
+	predictions = predict(bias, np.asarray(weights, dtype = np.float64)[used_idx], features[:, used_idx])
+
+	total = counts.sum()
+	correct = counts[predictions == labels].sum()
+	false_positives = counts[predictions > labels].sum()
+	false_negatives = counts[predictions < labels].sum()
+	return float(correct * 100 / total), float(false_positives * 100 / total), float(false_negatives * 100 / total)
+
+
+
+"""
+Tests the learnt bias and weights on samples of a feature store without reading them into memory. Same as test() otherwise.
+Args:
+	store_path	: Path of store
+	indices		: Array of index of samples of store (in the order of feature_store.read()) which are tested on
+	bias		: Learnt bias
+	weights		: List of feature_count learnt weights
+	used_idx	: List of index of features used by the perceptron
+	transform	: Function applied to the features of every block as in train_store(). None if not required
+Rets:
+	Same as test()
+"""
+def test_store(store_path, indices, bias, weights, used_idx, transform = None):
+	weights = np.asarray(weights, dtype = np.float64)[used_idx]
+	total, correct, false_positives, false_negatives = 0.0, 0.0, 0.0, 0.0
+	for block in get_store_blocks(store_path, np.asarray(indices, dtype = np.intp), used_idx, transform)(np.arange(len(indices)), EVALUATION_BLOCK_SIZE):
+		predictions = predict(bias, weights, block[:, : -2])
+		total += len(block)
+		correct += np.count_nonzero(predictions == block[:, -2])
+		false_positives += np.count_nonzero(predictions > block[:, -2])
+		false_negatives += np.count_nonzero(predictions < block[:, -2])
+	return float(correct * 100 / total), float(false_positives * 100 / total), float(false_negatives * 100 / total)
@@ -16,6 +16,13 @@ from queue import Empty						# Used for Empty exception
 from copy import deepcopy as cp				# Used to copy arrays
 from random import shuffle 					# Used to mix data around
 from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock files
+from noxim_cache import run_noxim, start_noxim	# Used to run noxim via cache of simulation results or in background
+import feature_store						# Used to read and write per port and per router features
+import feature_parser						# Used to parse feature files generated by noxim
+import feature_stream						# Used to consume features while noxim runs
+import feature_window						# Used to take moving average of features
+import feature_dataset						# Used to merge and split datasets without copying
+import feature_writer						# Used to write per port features from a dedicated process
 
 # Dimensions of grid. It's used to calculate index of router
 DIM_X = 8
@@ -117,6 +124,20 @@ PARSED_STALLED_FLITS			= 3
 PARSED_TRANSMITTED_FLITS		= 4
 PARSED_BUFFER_WAITING_TIME		= 5
 PARSED_ANNOTATION				= 6
+
+# Parsed features (0 based index excluding cycle) which are read from feature files. Other features are set to 0
+# It must include the used_idx of perceptron. Set to None to read all the features
+USED_FEATURES = [0,1,4]
+
+# Options to reduce the size of feature files generated by noxim
+FEATURE_INTERVAL				= 1		# Features are generated every FEATURE_INTERVAL cycles
+ENABLE_FEATURE_ROUTER_FILTER	= True	# If True, attack features are generated only for the routers needed by the path
+FEATURES_FORMAT					= feature_parser.FEATURES_FORMAT_TEXT	# Format of feature files. Binary files (FEATURES_FORMAT_BIN) are memory mapped instead of being parsed
+ENABLE_FEATURE_STREAM			= False	# If True, attack features are streamed through a FIFO and processed while noxim runs
+ENABLE_FEATURE_WRITER			= True	# If True, per port features are coalesced and written by a dedicated writer process (refer to feature_writer.py)
+ENABLE_VIRTUAL_DATASETS		= True	# If True, merged features are references to the per port features instead of copies (refer to feature_store.link())
+# NOTE: Virtual datasets only remove the copies written by the merge stages. Training still reads all the samples of a job into memory
+# (refer to feature_store.read()) i.e. it doesn't draw minibatches from the references, hence the memory needed by training is unchanged
 """
 Parses the features from given file and generates data for given router and ports
 Args:
@@ -139,80 +160,40 @@ Rets:
 		buffer_waiting_time		: Average waiting time for all transmitted flits at current cycle
 """
 def parse_features(feature_file, router_and_ports, log, ID):
-	all_info = {}	# This dictionary stores the parsed data
-
-	# Read data from csv file
-	log.write("Process #" + str(ID) + "\tReading from file: " + feature_file + "\n")
-	print("Process #" + str(ID) + "\tReading from file: " + feature_file)
-	with open(feature_file, 'r') as csv_in:
-		current_info = csv_in.readline()
-		while current_info:
-			data = current_info.split(", ") # data temporarily stores the parsed features. It's of the type list
-			data = list(map(int, data))	# Map everything to integers
-			# Calculate the router index in the format (router_x, router_y)
-			router_id = data[ROUTER_ID] 
-			router_x = router_id % DIM_X
-			router_y = router_id // DIM_X
-			router = (router_x, router_y)
-
-			cycle = data[CYCLE] # Extract out the cycle
-
-			# Iterate over all ports and add data to router_info if needed
-			for port in range(DIRECTIONS):
-				start_index = PORT_FEATURE_OFFSET + (port * PORT_FEATURE_COUNT) # This is the index of first feature for port (inclusive)
-				end_index = start_index + PORT_FEATURE_COUNT  # This is the last index for features of port (exclusive)
-				value = data[start_index : end_index] # Extract out features
-
-				# Insert data into to all_info
-				router_port = (router, port) # This is used as the key in all_info
-				if(router_port not in all_info):
-					all_info[router_port] = [] # Create a list if one doesn't exist yet
-				all_info[router_port].append([cycle] + value) # Insert the value i.e features
-
-			current_info = csv_in.readline()	# Read next line
-
-	# Generate output dictionary
-	log.write("Process #" + str(ID) + "\tGenerating Router info\n")
-	print("Process #" + str(ID) + "\tGenerating Router info")
-	router_info = {}	 # Initialize output dictionary
-	for router_port in router_and_ports:
-		router_info[router_port] = [] # Initialize entry in all info
-
-		other_router = get_connected_router_and_port(router_port) # Get connected router
-
-		assert(len(all_info[other_router]) == len(all_info[router_port]))
-		enteries = len(all_info[router_port])	 # Get total number of enteries
-		for idx in range(enteries):
-			current_cycle_entry = []
-			assert(all_info[other_router][idx][CURRENT_CYCLE] == all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Start inserting parameters
-			# Cycle
-			current_cycle_entry.append(all_info[router_port][idx][CURRENT_CYCLE])
-			
-			# Rx features
-			current_cycle_entry.append(all_info[router_port][idx][BUFFER_STATUS])
-			current_cycle_entry.append(all_info[router_port][idx][CYCLES_SINCE_LAST_FLIT])
-			
-			# Tx features
-			current_cycle_entry.append(all_info[other_router][idx][STALLED_FLITS])
-			current_cycle_entry.append(all_info[other_router][idx][TRANSMITTED_FLITS])
-			if(all_info[other_router][idx][TRANSMITTED_FLITS] == 0):	# Check if no flits were transmitted
-				current_cycle_entry.append(0)	# No flits transmitteed i.e 0 wating time
-			else:
-				current_cycle_entry.append(all_info[other_router][idx][CUMULATIVE_LATENCY] / all_info[other_router][idx][TRANSMITTED_FLITS])	# Buffer waiting time = total time the flits waited / No. of flits
-
-			router_info[router_port].append(current_cycle_entry) # Insert in router info
-	return router_info
+	return feature_parser.parse_features(feature_file, router_and_ports, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT)	# Only routers on the path and columns of USED_FEATURES are converted
 
 
 
 # Length of moving average window
 AVG_CYCLES = 5
 ENABLE_AVG_WINDOW = True
+# Lengths of moving average windows which are taken together and stored as extra columns (refer to feature_window.py)
+# Used only if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW are True. Must contain AVG_CYCLES, whose features are tested by router_meta_merge_tester.py
+MULTI_SCALE_AVG_CYCLES = [1, 5, 25, 100]
+ENABLE_MULTI_SCALE_WINDOW = False
+# Half life (in samples) of exponential moving average. If ENABLE_EMA is True, it's taken instead of the moving window average
+# Only O(1) state is kept for every feature, hence streamed features (ENABLE_FEATURE_STREAM) are averaged in constant memory
+EMA_HALF_LIFE = 5
+ENABLE_EMA = False
+"""
+Generates the lengths of moving average windows taken by pre_process()
+Args:
+	None
+Rets:
+	List of lengths of windows
+"""
+def get_avg_windows():
+	avg_windows = MULTI_SCALE_AVG_CYCLES if ENABLE_AVG_WINDOW and ENABLE_MULTI_SCALE_WINDOW and not ENABLE_EMA else [AVG_CYCLES]
+	assert(AVG_CYCLES in avg_windows)
+	return avg_windows
+
+
+
 """
 Modifies the data in router info.
 Currently configured to take a moving window average on various parameters. The size of window is AVG_CYCLES
+If ENABLE_MULTI_SCALE_WINDOW is True, the averages of every window in MULTI_SCALE_AVG_CYCLES are taken from the same cumulative sums
+If ENABLE_EMA is True, an exponential moving average with half life of EMA_HALF_LIFE samples is taken instead
 Args:
 	router_info	: Input data (Not preserved)
 	log			: File to print log to
@@ -221,10 +202,16 @@ Rets:
 	router_info	: Output data
 The input and output formats are
 	{((router_x, router_Y), port)	:	[[cycle, buffer_status, cycles_since_last_flit, stalled_flits, transmitted flits, buffer_waiting_time], ...], ...}
+	With multiple windows, the features of every window are placed one after the other in the order of MULTI_SCALE_AVG_CYCLES
 """
 def pre_process(router_info, log, ID):
 	log.write("Process #" + str(ID) + "\tPre-processing data\n")
 	print("Process #" + str(ID) + "\tPre-processing data")
+	if(ENABLE_EMA):
+		log.write("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE) + "\n")
+		print("Process #" + str(ID) + "\tTaking exponential moving average with half life of " + str(EMA_HALF_LIFE))
+		return feature_window.ema_router_info(router_info, EMA_HALF_LIFE)
+
 	if(not ENABLE_AVG_WINDOW):	# Return without doing anything if not enabled
 		return router_info
 
@@ -235,32 +222,13 @@ def pre_process(router_info, log, ID):
 	# 	[0, 0, 1] : avg is 1-0/1 = 1
 	# 	[0, 1, 3] : avg is 3-0/2 =  3/2 (Notice instread of 2, we inserted 2 + window[-1])
 	# 	[1, 3, 5] : avg is 5-1/3 = 4/3 (Notice instread of 3, we inserted 3 + window[-1])
-	# This makes the time complexity independent of AVG_CYCLES
+	# This makes the time complexity independent of AVG_CYCLES. The cumulative sums of all the ports are computed together (refer to feature_window.py)
 
 	# Start moving average process
-	log.write("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES) + "\n")
-	print("Process #" + str(ID) + "\tTaking moving average of size " + str(AVG_CYCLES))
-	for router_port in router_info:
-		windows = {	# initialize windows
-			PARSED_BUFFER_STATUS 			: [0] * AVG_CYCLES,
-			PARSED_CYCLES_SINCE_LAST_FLIT	: [0] * AVG_CYCLES,
-			PARSED_STALLED_FLITS			: [0] * AVG_CYCLES,
-			PARSED_TRANSMITTED_FLITS		: [0] * AVG_CYCLES,
-			PARSED_BUFFER_WAITING_TIME		: [0] * AVG_CYCLES
-		}
-
-		current_number_of_elements_in_window = 0
-		for entry_idx in range(len(router_info[router_port])): # Iterate over sample points
-			for feature in windows: # Iterate over every feature
-				windows[feature].pop(0)	# remove the first element 
-				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature] # Calculate the value to be added
-				windows[feature].append(value_to_insert)	# Insert the value
-				current_number_of_elements_in_window += 1
-				current_number_of_elements_in_window = min(current_number_of_elements_in_window, AVG_CYCLES) # This ensures that when taling average, we divide by the correct no. of elements
-				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window	# Calculate average
-
-				router_info[router_port][entry_idx][feature] = avg	# Update to average value
-	
+	avg_windows = get_avg_windows()
+	log.write("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)) + "\n")
+	print("Process #" + str(ID) + "\tTaking moving average of size " + ", ".join(map(str, avg_windows)))
+	router_info = feature_window.average_router_info(router_info, avg_windows)	# All the ports are averaged in a single pass
 	return router_info
 
 
@@ -308,8 +276,7 @@ def merge_info(set_1, set_2, log, ID):
 	print("Process #" + str(ID) + "\tMerging")
 	merged = {}
 	for router_port in set_1:
-		merged[router_port] = cp(set_1[router_port])	# Add enteries from set 1
-		merged[router_port].extend(cp(set_2[router_port]))	# Add enteries from set 2
+		merged[router_port] = feature_dataset.concatenate([set_1[router_port], set_2[router_port]])	# Rows are shared with both the sets
 
 	return merged
 
@@ -406,11 +373,31 @@ def get_router_port_name(router_port):
 	return get_router_name(router_port[0]) + "." + str(router_port[1])
 
 
+"""
+Runs noxim once on the unmodified benchmark to generate the baseline features.
+The baseline traffic table is same for every attack pair, hence all the jobs share this feature file.
+Args:
+	benchmark_name		: Root name of the benchmark to use
+	working_directory	: Directory to store generated files
+Rets:
+	feature_file_path	: Path of the baseline feature file
+"""
+def generate_baseline(benchmark_name, working_directory):
+	source_file_path = working_directory + "/" + benchmark_name
+	feature_file_path = working_directory + "/unparsed_features/baseline"
+	log_file_path = working_directory + "/logs/baseline"
+
+	run_noxim(source_file_path, feature_file_path, log_file_path, DIM_X, DIM_Y, feature_parser.get_noxim_options(None, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))	# Baseline is shared by all the paths
+
+	return feature_file_path
+
+
+
 """
 Method called by processes to generate features.
 The method does the following:
-1.) Creates traffic tables for attack and baseline scenarios
-2.) Calls noxim to generate feature files
+1.) Creates traffic table for attack scenario
+2.) Calls noxim to generate attack feature file
 3.) Parses the feature files
 4.) Cleans and annotates feature files
 5.) Writes to per_port_features
@@ -419,10 +406,12 @@ Args:
 	jobs				: Queue of jobs to be completed
 	benchmark_name		: Root name of the benchmark to use
 	working_directory	: Directory to store generated files
+	feature_file_path_baseline	: Baseline feature file shared by all the jobs
+	writer				: Writer as returned by feature_writer.start_writer(). None if the workers write the shards themselves
 Rets:
 	None
 """
-def worker_gen(ID, jobs, benchmark_name, working_directory, pir):
+def worker_gen(ID, jobs, benchmark_name, working_directory, pir, feature_file_path_baseline, writer):
 	with open(working_directory + "/worker_logs_gen/worker_" + str(ID), "w", buffering = 1) as log:	# Open file for log
 		log.write("Process #" + str(ID) + "\tStarting...\n")
 		print("Process #" + str(ID) + "\tStarting...")
@@ -449,7 +438,6 @@ def worker_gen(ID, jobs, benchmark_name, working_directory, pir):
 				print("Process #" + str(ID) + "\tWriting traffic tables")
 				
 				source_file_path = working_directory + "/" + benchmark_name
-				baseline_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				attack_file_path = working_directory + "/traffic_tables/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
 				attack_string = str(src_idx) + "\t" + str(dst_idx) + "\t" + str(pir) + "\t"+ str(pir) + "\t1\t1000000\n"
@@ -459,44 +447,47 @@ def worker_gen(ID, jobs, benchmark_name, working_directory, pir):
 					with open(attack_file_path, "w") as attack_file:
 						attack_file.write(attack_string)
 						attack_file.writelines(lines)
+				#--------------------------------------------------------------------------------------------------------------------------
 
-				os.system("cp " + source_file_path  + " " + baseline_file_path)
+				# Step 2.1: Generating path
+				log.write("Process #" + str(ID) + "\tGenerating path\n")
+				print("Process #" + str(ID) + "\tGenerating path")
+				path = generate_path(list(src), list(dst))
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 2: Call noxim to generate features
+				# Step 2.2: Call noxim to generate features
 				log.write("Process #" + str(ID) + "\tCalling noxim\n")
 				print("Process #" + str(ID) + "\tCalling noxim")
 
-				feature_file_path_baseline = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				feature_file_path_attack = working_directory + "/unparsed_features/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 
-				log_file_path_baseline = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_baseline"
 				log_file_path_attack = working_directory + "/logs/" + get_router_name(src) + "_to_" + get_router_name(dst) + "_attack"
 				
-				cmd_baseline = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + baseline_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_baseline + " > " + log_file_path_baseline
-				cmd_attack = "./../noxim -topology MESH -dimx 8 -dimy 8 -traffic table " + attack_file_path + "  -config ./../../personal_configs/my_config.yaml -power ./../power.yaml -features " + feature_file_path_attack + " > " + log_file_path_attack
-
-				os.system(cmd_baseline)
-				os.system(cmd_attack)
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 3.1: Generating path
-				log.write("Process #" + str(ID) + "\tGenerating path\n")
-				print("Process #" + str(ID) + "\tGenerating path")
-				path = generate_path(list(src), list(dst))
+				feature_routers = path if ENABLE_FEATURE_ROUTER_FILTER else None
+				if(ENABLE_FEATURE_STREAM):	# Features are parsed, projected and averaged while noxim runs, hence no feature file is written
+					feature_file_path_attack += ".fifo"
+					feature_stream.create_fifo(feature_file_path_attack)
+					process = start_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT, True))
+					router_info_attack = feature_stream.stream_features(feature_file_path_attack, process, path, log, ID, DIM_X, USED_FEATURES, FEATURES_FORMAT, get_avg_windows() if ENABLE_AVG_WINDOW else None, EMA_HALF_LIFE if ENABLE_EMA else None)
+					os.remove(feature_file_path_attack)
+				elif(run_noxim(attack_file_path, feature_file_path_attack, log_file_path_attack, DIM_X, DIM_Y, feature_parser.get_noxim_options(feature_routers, FEATURE_INTERVAL, DIM_X, FEATURES_FORMAT))):
+					log.write("Process #" + str(ID) + "\tFetched attack features from cache\n")
+					print("Process #" + str(ID) + "\tFetched attack features from cache")
 				#--------------------------------------------------------------------------------------------------------------------------
 				
-				# Step 3.2: Parse features
+				# Step 3.1: Parse features
 				log.write("Process #" + str(ID) + "\tParsing features\n")
 				print("Process #" + str(ID) + "\tParsing features")
 				
 				router_info_baseline = parse_features(feature_file_path_baseline, path, log, ID)
-				router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
+				if(not ENABLE_FEATURE_STREAM):
+					router_info_attack = parse_features(feature_file_path_attack, path, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 3.3: Pre process data
+				# Step 3.2: Pre process data
 				router_info_baseline = pre_process(router_info_baseline, log, ID)
-				router_info_attack = pre_process(router_info_attack, log, ID)			
+				if(not ENABLE_FEATURE_STREAM):	# Streamed features are already averaged
+					router_info_attack = pre_process(router_info_attack, log, ID)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
 				# Step 4.1: Clean and annotate data
@@ -512,12 +503,12 @@ def worker_gen(ID, jobs, benchmark_name, working_directory, pir):
 				log.write("Process #" + str(ID) + "\tWriting per port feature\n")
 				print("Process #" + str(ID) + "\tWriting per port feature")
 				for router_port in router_info:
-					per_port_features_file_name = working_directory + "/per_port_features/" + get_router_port_name(router_port)
-					with open(per_port_features_file_name, "a") as per_port_file:
-						lockf(per_port_file, LOCK_EX)	# Acquire a lock
-						for entry in router_info[router_port]:
-							per_port_file.write(", ".join(map(str, entry)) + "\n")
-						lockf(per_port_file, LOCK_UN)	# Release the lock
+					per_port_features_store = working_directory + "/per_port_features/" + get_router_port_name(router_port)
+					cycles, features, labels = feature_store.rows_to_columns(router_info[router_port])
+					if(writer is not None):
+						feature_writer.put(writer, per_port_features_store, cycles, features, labels)	# Coalesced and written by the writer process
+					else:
+						feature_store.write_shard(per_port_features_store, "worker_" + str(ID), cycles, features, labels)	# Every worker writes its own shards, hence no lock is needed
 				#--------------------------------------------------------------------------------------------------------------------------
 
 				# Log completing the job
@@ -578,43 +569,45 @@ def get_output_ports(router):
 Reads the features of provided ports
 Checks if these ports exist
 If they exist, their features are add to a common pool
-These features are then shuffled
+These features are then shuffled and written to the merged store
+The shuffle is out of core i.e. only a bounded number of samples is held in memory (refer to feature_store.shuffle())
+If ENABLE_VIRTUAL_DATASETS is True, the merged store only refers to the samples of ports instead
 Args:
 	ports	: The ports whose data is to be merged. The format is
 	[((router_x, router_y), port), ...]
 	working_directory	: The directory in which the code generated files
+	merged_store_path	: Path of store to write the merged features to
 Rets:
 	Used port	: A comma seperated string which is a list of ports used. An example is:
 	"1_1.2, 1_1.3"
-	All data	: This is accumaled data from all ports
 """
-def merge_ports(ports, working_directory):
+def merge_ports(ports, working_directory, merged_store_path):
 	directory_base_name = working_directory + "/per_port_features/" # This is the path to seach individual port files in
 
 	used_ports = "" # Initialize the list of used ports
 
-	all_data = [] # This is the list of 
+	port_store_paths = [] # This is the list of stores of all ports
 
 	# Accumalate data
 	for port in ports: # Iterate over ports
 		file_name = get_router_port_name(port)
-		file_path = directory_base_name + file_name	# Generate the full name to open the file
-		if(os.path.isfile(file_path)):
+		file_path = directory_base_name + file_name	# Generate the full name to open the store
+		if(feature_store.exists(file_path)):
 			used_ports += file_name + ", "
-			with open(file_path, 'r') as data_file:
-				lines = data_file.readlines()	# Read the data from file
-				for line in lines:
-					data = list(map(float, (line.split(","))))
-					all_data.append(data)	 # Add lines to all data
+			port_store_paths.append(file_path)	# Add store to all data
 
 	# Remove the last comma from used_port string
 	if(len(used_ports) > 2):	# Ensure that string isn't empty
 		used_ports = used_ports[:-2]
 
-	# Shuffle all the data
-	shuffle(all_data)
+	# Shuffle all the data and write it
+	if(ENABLE_VIRTUAL_DATASETS):	# Only references are written. The samples are shuffled by test_train_splitter() while training
+		feature_store.create(merged_store_path)
+		feature_store.link(port_store_paths, merged_store_path)
+	else:
+		feature_store.shuffle(port_store_paths, merged_store_path)
 
-	return used_ports, all_data
+	return used_ports
 
 
 
@@ -622,11 +615,9 @@ def merge_ports(ports, working_directory):
 Method called by processes to merge features.
 The method does the following:
 1.) Finds list of all ports which are input to current router
-2.) Merges the features of input ports and shuffles it
-3.) Writes to router input features
-4.) Finds list of all ports which are output to current router
-5.) Merges the features of output ports and shuffles it
-6.) Writes to router output features
+2.) Merges the features of input ports, shuffles it and writes to router input features
+3.) Finds list of all ports which are output to current router
+4.) Merges the features of output ports, shuffles it and writes to router output features
 Args:
 	ID					: Process ID
 	jobs				: Queue of jobs to be completed
@@ -654,46 +645,30 @@ def worker_merge(ID, jobs, working_directory):
 				input_ports = get_input_ports(job)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 2: Merge input port features
-				log.write("Process #" + str(ID) + "\tMerging input port features\n")
-				print("Process #" + str(ID) + "\tMerging input port features")
-				used_ports, merged_inputs = merge_ports(input_ports, working_directory)
+				# Step 2: Merge and store input port features
+				log.write("Process #" + str(ID) + "\tMerging and storing input port features\n")
+				print("Process #" + str(ID) + "\tMerging and storing input port features")
+				file_name = get_router_name(job) + "_in"
+				full_path_name = working_directory + "/per_router_features/" + file_name
+				used_ports = merge_ports(input_ports, working_directory, full_path_name)
 				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
 				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
-				# Step 3: Write input features
-				log.write("Process #" + str(ID) + "\tStoring input port features\n")
-				print("Process #" + str(ID) + "\tStoring input port features")
-				file_name = get_router_name(job) + "_in"
-				full_path_name = working_directory + "/per_router_features/" + file_name
-				with open(full_path_name, 'w') as input_features_file:
-					for entry in merged_inputs:
-						input_features_file.write(", ".join(map(str, entry)) + "\n")
-				#--------------------------------------------------------------------------------------------------------------------------
-
-				# Step 4: Get list of output ports
+				# Step 3: Get list of output ports
 				log.write("Process #" + str(ID) + "\tGenerating list of output ports\n")
 				print("Process #" + str(ID) + "\tGenerating list of output ports")
 				output_ports = get_output_ports(job)
 				#--------------------------------------------------------------------------------------------------------------------------
 
-				# Step 5: Merge output port features
-				log.write("Process #" + str(ID) + "\tMerging output port features\n")
-				print("Process #" + str(ID) + "\tMerging output port features")
-				used_ports, merged_outputs = merge_ports(output_ports, working_directory)
-				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
-				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
-				#--------------------------------------------------------------------------------------------------------------------------
-				
-				# Step 6: Write output features
-				log.write("Process #" + str(ID) + "\tStoring output port features\n")
-				print("Process #" + str(ID) + "\tStoring output port features")
+				# Step 4: Merge and store output port features
+				log.write("Process #" + str(ID) + "\tMerging and storing output port features\n")
+				print("Process #" + str(ID) + "\tMerging and storing output port features")
 				file_name = get_router_name(job) + "_out"
 				full_path_name = working_directory + "/per_router_features/" + file_name
-				with open(full_path_name, 'w') as output_features_file:
-					for entry in merged_outputs:
-						output_features_file.write(", ".join(map(str, entry)) + "\n")
+				used_ports = merge_ports(output_ports, working_directory, full_path_name)
+				log.write("Process #" + str(ID) + "\tUsed ports: " + used_ports + "\n")
+				print("Process #" + str(ID) + "\tUsed ports: " + used_ports)
 				#--------------------------------------------------------------------------------------------------------------------------
 				
 				# Log completing the job
@@ -734,9 +709,11 @@ def worker_meta_merge(ID, jobs, list_of_benchmarks, working_directory):
 				merged_file_name = working_directory + "/per_router_features/" + job
 				for benchmark in list_of_benchmarks:
 					benchmark_feature_file = working_directory + "/" + benchmark + "/per_router_features/" + job
-					if(os.path.isfile(benchmark_feature_file)):
-						cmd = "cat " + benchmark_feature_file + " >> " + merged_file_name
-						os.system(cmd)
+					if(feature_store.exists(benchmark_feature_file)):
+						if(ENABLE_VIRTUAL_DATASETS):
+							feature_store.link([benchmark_feature_file], merged_file_name, benchmark)	# Only references to the shards are added
+						else:
+							feature_store.extend(benchmark_feature_file, merged_file_name, benchmark)	# Shards are copied as is
 
 				# Log completing the job
 				log.write("Process #" + str(ID) +"\tCompleted job " + str(job) + "\n")
@@ -787,8 +764,8 @@ def main():
 		# Start feature generation step
 		print("Starting feature generation")
 
-		# Create files to lock onto later
-		print("Creating per port feature files")
+		# Create stores to append onto later
+		print("Creating per port feature stores")
 
 		feature_file_names = set()
 		# Initially add all ports
@@ -816,8 +793,7 @@ def main():
 			feature_file_names.remove(feature_file_name_to_be_removed)
 
 		for feature_file_name in feature_file_names:
-			cmd = "touch " + dir_name + "/per_port_features/" + feature_file_name
-			os.system(cmd)
+			feature_store.create(dir_name + "/per_port_features/" + feature_file_name, USED_FEATURES)	# Features which aren't parsed are recorded in the manifest
 
 		# Generate jobs
 		print("Generating jobs...")
@@ -837,12 +813,20 @@ def main():
 						jobs.put((pair, router))
 		print("Done!")
 
+		# Generate baseline features once for all the jobs
+		print("Generating baseline features")
+		feature_file_path_baseline = generate_baseline(benchmark_name, dir_name)
+		print("Done!")
+
 		# Create processes and generate features
 		print("Starting processes")
 		num_processes = int(sys.argv[2])
 		pir = sys.argv[4]
+		writer, writer_process = None, None
+		if(ENABLE_FEATURE_WRITER):
+			writer, writer_process = feature_writer.start_writer(dir_name + "/worker_logs_gen/writer")
 		for ID in range(num_processes):
-			process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, pir, ))
+			process = mp.Process(target = worker_gen, args = (ID, jobs, benchmark_name, dir_name, pir, feature_file_path_baseline, writer, ))
 			process.start()
 			processes.append(process)
 		
@@ -852,6 +836,18 @@ def main():
 		processes.clear()
 		print("Done!")
 
+		# Wait for the writer to write all the blocks
+		if(ENABLE_FEATURE_WRITER):
+			print("Waiting for writer")
+			feature_writer.stop_writer(writer, writer_process)
+			print("Done!")
+
+		# Fold the shards written by every worker into the manifest of every port
+		print("Compacting per port features")
+		for feature_file_name in os.listdir(dir_name + "/per_port_features"):
+			feature_store.compact(dir_name + "/per_port_features/" + feature_file_name)
+		print("Done!")
+
 		# Merge port level features to create router level features
 		print("Starting merging")
 
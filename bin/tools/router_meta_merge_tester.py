@@ -13,6 +13,8 @@ import sys									# Used to get command line arguments
 import multiprocessing as mp				# Used to parallelize workload
 from queue import Empty						# Used for Empty exception
 from fcntl import lockf, LOCK_EX, LOCK_UN	# Used to lock files
+import feature_store						# Used to read per router features
+import feature_window						# Used to select the features of a moving average window
 
 
 # Dimensions of grid. It's used to calculate index of router
@@ -20,6 +22,12 @@ DIM_X = 8
 DIM_Y = 8
 # Note that the grid has origin at the top left corner and the coordinates increase in bottom right direction
 
+# Moving average windows of the per router features (same as the script which generated them)
+# The weights are tested on the features of AVG_CYCLES. The other windows are used only if the features have multiple windows
+AVG_CYCLES = 5
+MULTI_SCALE_AVG_CYCLES = [1, 5, 25, 100]
+
+# NOTE: The features are never normalized here. If the training script normalized them, the normalization is already folded into the weights file
 
 
 """
@@ -49,7 +57,7 @@ FLOAT_COMPARE_ZERO = 0.0001
 Gives the accuracy by running the test cases.
 Args:	
 	weights_and_bias	: (bias, weight1, ..., weight5)
-	path				: Path of feature file
+	path				: Path of feature store
 Rets:
 	accuracy			: Accuracy achieved
 	false_positive		: False positive in %
@@ -69,13 +77,9 @@ def get_accuracy(weights_and_bias, path):
 	weights = weights_and_bias[1:]
 
 	# Iterate over every test case
-	for line in open(path):
-		data_str = line.split(",")
-		data = [float(d) for d in data_str]	 # Convert to float
-		
-		parsed_features = data[1:-1]
-		annotation = data[-1]
-
+	cycles, features, labels = feature_store.read(path)
+	features = feature_window.select_window(features, MULTI_SCALE_AVG_CYCLES, AVG_CYCLES)
+	for parsed_features, annotation in zip(features.tolist(), labels.tolist()):
 		total += 1
 		prediction = predict(bias, weights, parsed_features) # Predict based on current weights and bias
 		if(abs(prediction - annotation) < FLOAT_COMPARE_ZERO):
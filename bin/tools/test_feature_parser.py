@@ -0,0 +1,100 @@
+"""
+Checks that the vectorized parser of feature_parser.py returns the same router_info as the line by line parser (parse_features_text())
+on a synthetic feature file, in text and binary format and with a projection of features.
+The checks can be run via the following command
+	python3 -m pytest -q path/to/this/file
+"""
+
+import os							# Used to discard logs
+import pytest						# Used for fixtures
+import feature_parser				# Module under test
+import parse_features_benchmark		# Used to generate synthetic feature files
+
+# Number of cycles of the synthetic feature file
+CYCLES = 300
+
+# Ports on the path of an attack from router (0, 3) to router (7, 5)
+ROUTER_AND_PORTS = [((0, 3), feature_parser.DIRECTION_LOCAL)] + [((router_x, 3), feature_parser.DIRECTION_WEST) for router_x in range(1, 8)] + \
+	[((7, router_y), feature_parser.DIRECTION_NORTH) for router_y in (4, 5)] + [((7, 5), feature_parser.DIRECTION_PE)]
+
+
+
+"""
+Writes the synthetic feature file in text and binary format
+Args:
+	tmp_path_factory	: Factory of temporary directories of pytest
+Rets:
+	(text_file, binary_file)	: Paths of feature files
+"""
+@pytest.fixture(scope = "module")
+def feature_files(tmp_path_factory):
+	directory = tmp_path_factory.mktemp("features")
+	text_file = str(directory / "features.txt")
+	binary_file = str(directory / "features.bin")
+	parse_features_benchmark.generate_feature_file(text_file, CYCLES)
+	parse_features_benchmark.write_binary_feature_file(text_file, binary_file)
+	return text_file, binary_file
+
+
+
+"""
+Runs a parser without logs
+Args:
+	parser				: Parser to run
+	feature_file		: Name of feature file
+	kwargs				: Additional arguments of parser
+Rets:
+	router_info	: Output of parser
+"""
+def parse(parser, feature_file, **kwargs):
+	with open(os.devnull, "w") as log:
+		return parser(feature_file, ROUTER_AND_PORTS, log, 0, **kwargs)
+
+
+
+"""
+Checks that all the features of a text file are the same as the line by line parser
+"""
+def test_parse_features_matches_text(feature_files):
+	text_file, binary_file = feature_files
+	expected = parse(feature_parser.parse_features_text, text_file)
+	assert(all(len(expected[router_port]) == CYCLES for router_port in ROUTER_AND_PORTS))
+	assert(parse(feature_parser.parse_features, text_file) == expected)
+
+
+
+"""
+Checks that the routers are found by a scan of all the lines if the file isn't known to be sorted by router
+"""
+def test_unsorted_parse_features_matches_text(feature_files, monkeypatch):
+	text_file, binary_file = feature_files
+	monkeypatch.setattr(feature_parser, "SORTED_FEATURE_FILES", False)
+	assert(parse(feature_parser.parse_features, text_file) == parse(feature_parser.parse_features_text, text_file))
+
+
+
+"""
+Checks that a projection only keeps the used features and that the other features are 0
+"""
+def test_projected_parse_features_matches_text(feature_files):
+	text_file, binary_file = feature_files
+	used_features = parse_features_benchmark.USED_FEATURES
+	expected = parse(feature_parser.parse_features_text, text_file)
+	for entries in expected.values():
+		for entry in entries:
+			for feature in range(feature_parser.PARSED_FEATURE_COUNT):
+				if(feature not in used_features):
+					entry[1 + feature] = 0	# The first column is cycle
+	assert(parse(feature_parser.parse_features, text_file, used_features = used_features) == expected)
+
+
+
+"""
+Checks that a binary file gives the same router_info as the text file it was converted from
+"""
+def test_binary_parse_features_matches_text(feature_files):
+	text_file, binary_file = feature_files
+	expected = parse(feature_parser.parse_features_text, text_file)
+	assert(parse(feature_parser.parse_features, binary_file, features_format = feature_parser.FEATURES_FORMAT_BIN) == expected)
+	projected = parse(feature_parser.parse_features, text_file, used_features = parse_features_benchmark.USED_FEATURES)
+	assert(parse(feature_parser.parse_features, binary_file, used_features = parse_features_benchmark.USED_FEATURES, features_format = feature_parser.FEATURES_FORMAT_BIN) == projected)
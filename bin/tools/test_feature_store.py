@@ -0,0 +1,93 @@
+"""
+Checks the claims of feature_store.py on synthetic stores i.e.
+	1.) shuffle() writes a permutation of the samples of the sources, in memory and out of core
+	2.) The order of shuffle() is uniformly random (every sample is equally likely at every position) also when it's out of core
+	3.) Virtual stores and iter_minibatches() read the same samples as the stores they refer to
+The checks can be run via the following command
+	python3 -m pytest -q path/to/this/file
+"""
+
+import numpy as np		# Used to generate synthetic samples
+import feature_store	# Module under test
+
+# Number of shuffles of the check of uniformity, and the bound of its chi-square statistic (the 99.9th percentile is about 59.7 for 30 degrees of freedom)
+UNIFORMITY_SHUFFLES		= 600
+UNIFORMITY_CHI_SQUARE	= 60.0
+
+
+
+"""
+Writes a store with a shard of samples for every given length. The cycles of the samples are unique, hence they identify the samples.
+Args:
+	store_path	: Path of store
+	lengths		: List of number of samples of every shard
+	first_cycle	: Cycle of the first sample
+Rets:
+	None
+"""
+def make_store(store_path, lengths, first_cycle = 0):
+	feature_store.create(store_path)
+	for length in lengths:
+		cycles = np.arange(first_cycle, first_cycle + length, dtype = np.int32)
+		features = np.stack([cycles * (feature + 1) for feature in range(feature_store.FEATURE_COUNT)], axis = 1)
+		feature_store.append(store_path, cycles, features, (cycles % 2).astype(np.uint8))
+		first_cycle += length
+
+
+
+"""
+Checks that shuffle() writes every sample of the sources once, with its features and annotation, in memory and out of core
+"""
+def test_shuffle_is_permutation(tmp_path, monkeypatch):
+	src_paths = [str(tmp_path / "a"), str(tmp_path / "b")]
+	make_store(src_paths[0], [100, 0, 57])
+	make_store(src_paths[1], [300], 1000)
+	expected = [np.concatenate(columns) for columns in zip(*[feature_store.read(src_path) for src_path in src_paths])]
+	row_size = feature_store.get_row_dtype(feature_store.FEATURE_COUNT).itemsize
+	for budget in [feature_store.SHUFFLE_MEMORY_BUDGET, 50 * row_size]:	# The smaller budget needs 19 buckets
+		monkeypatch.setattr(feature_store, "SHUFFLE_MEMORY_BUDGET", budget)
+		feature_store.shuffle(src_paths, str(tmp_path / "shuffled"))
+		cycles, features, labels = feature_store.read(str(tmp_path / "shuffled"))
+		order = np.argsort(cycles)
+		assert(not np.array_equal(cycles, expected[0]))
+		assert(all(np.array_equal(column[order], expected_column) for column, expected_column in zip((cycles, features, labels), expected)))
+
+
+
+"""
+Checks that the out of core shuffle puts every sample at every position equally often (chi-square test of the counts of positions)
+"""
+def test_shuffle_is_uniform(tmp_path, monkeypatch):
+	samples = 6
+	make_store(str(tmp_path / "src"), [2, 4])
+	monkeypatch.setattr(feature_store, "SHUFFLE_MEMORY_BUDGET", feature_store.get_row_dtype(feature_store.FEATURE_COUNT).itemsize * 4)	# 3 buckets
+	np.random.seed(0)
+	positions = np.zeros((samples, samples))	# [sample, position]
+	for shuffle_idx in range(UNIFORMITY_SHUFFLES):
+		feature_store.shuffle([str(tmp_path / "src")], str(tmp_path / "shuffled"))
+		positions[feature_store.read_column(str(tmp_path / "shuffled"), "cycles"), np.arange(samples)] += 1
+	expected = UNIFORMITY_SHUFFLES / samples
+	assert(((positions - expected) ** 2 / expected).sum() < UNIFORMITY_CHI_SQUARE)
+
+
+
+"""
+Checks that a virtual store, read_column() and iter_minibatches() read the same samples as the stores they refer to
+"""
+def test_virtual_store_and_minibatches(tmp_path, monkeypatch):
+	src_paths = [str(tmp_path / "a"), str(tmp_path / "b")]
+	make_store(src_paths[0], [10, 0, 25])
+	make_store(src_paths[1], [40, 5], 100)
+	feature_store.create(str(tmp_path / "virtual"))
+	feature_store.link(src_paths, str(tmp_path / "virtual"))
+	expected = [np.concatenate(columns) for columns in zip(*[feature_store.read(src_path) for src_path in src_paths])]
+	columns = feature_store.read(str(tmp_path / "virtual"))
+	assert(all(np.array_equal(column, expected_column) for column, expected_column in zip(columns, expected)))
+	assert(all(np.array_equal(feature_store.read_column(str(tmp_path / "virtual"), name), expected_column) for name, expected_column in zip(feature_store.COLUMNS, expected)))
+
+	monkeypatch.setattr(feature_store, "MAX_MAPPED_SHARDS", 1)	# Shards are released and mapped again
+	indices = np.random.default_rng(0).permutation(len(expected[0]))
+	for block_size in [1, 7, len(indices)]:
+		blocks = list(feature_store.iter_minibatches(str(tmp_path / "virtual"), indices, block_size))
+		assert(all(len(block[0]) <= block_size for block in blocks))
+		assert(all(np.array_equal(np.concatenate(block_columns), expected_column[indices]) for block_columns, expected_column in zip(zip(*blocks), expected)))
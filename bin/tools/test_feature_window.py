@@ -0,0 +1,120 @@
+"""
+Checks that the moving averages of feature_window.py reproduce the original pre_process() of the server scripts
+and that the batch, incremental and multi-scale versions agree with each other.
+The checks can be run via the following command
+	python3 -m pytest -q path/to/this/file
+"""
+
+import numpy as np		# Used to generate synthetic features
+import feature_parser	# Used for number of parsed features
+import feature_window	# Module under test
+
+# Lengths of windows which are checked
+WINDOWS = [2, 3, 10, 64]
+
+
+
+"""
+Takes the moving average of router_info as the original pre_process() of the server scripts did. It's the reference of the checks.
+Args:
+	router_info	: Input data (Not preserved). Format is same as feature_window.apply_router_info()
+	avg_cycles	: Length of moving average window
+Rets:
+	router_info	: The features of every sample are replaced by their averages
+"""
+def original_pre_process(router_info, avg_cycles):
+	for router_port in router_info:
+		windows = {feature : [0] * avg_cycles for feature in range(1, 1 + feature_parser.PARSED_FEATURE_COUNT)}
+
+		current_number_of_elements_in_window = 0
+		for entry_idx in range(len(router_info[router_port])):
+			for feature in windows:
+				windows[feature].pop(0)
+				value_to_insert = windows[feature][-1] + router_info[router_port][entry_idx][feature]
+				windows[feature].append(value_to_insert)
+				current_number_of_elements_in_window += 1
+				current_number_of_elements_in_window = min(current_number_of_elements_in_window, avg_cycles)
+				avg = (windows[feature][-1] - windows[feature][0]) / current_number_of_elements_in_window
+
+				router_info[router_port][entry_idx][feature] = avg
+
+	return router_info
+
+
+
+"""
+Generates router_info with random integer features. Two of the ports have the same number of samples, hence they're averaged together.
+Args:
+	seed	: Seed of generator
+Rets:
+	router_info	: {((router_x, router_Y), port) : [[cycle, features..., annotation], ...], ...}
+"""
+def make_router_info(seed):
+	rng = np.random.default_rng(seed)
+	router_info = {}
+	for port, samples in enumerate([150, 150, 37, 1, 0]):
+		features = rng.integers(0, 1000, (samples, feature_parser.PARSED_FEATURE_COUNT)).tolist()
+		router_info[((port, 0), 0)] = [[1000 + entry_idx] + entry + [float(entry_idx % 2)] for entry_idx, entry in enumerate(features)]
+	return router_info
+
+
+
+"""
+Checks that a single window is bit exact with the original pre_process()
+"""
+def test_average_router_info_matches_original():
+	for avg_cycles in WINDOWS:
+		expected = original_pre_process(make_router_info(avg_cycles), avg_cycles)
+		assert(feature_window.average_router_info(make_router_info(avg_cycles), [avg_cycles]) == expected)
+
+
+
+"""
+Checks that a window of a single cycle gives the samples as is
+"""
+def test_single_cycle_window_is_identity():
+	router_info = make_router_info(1)
+	expected = {router_port : [[float(value) for value in entry] for entry in entries] for router_port, entries in make_router_info(1).items()}
+	assert(feature_window.average_router_info(router_info, [1]) == expected)
+
+
+
+"""
+Checks that multi-scale windows give the features of every window one after the other, same as the single windows
+"""
+def test_multi_scale_windows_match_single_windows():
+	values = np.random.default_rng(0).integers(0, 1000, (3, 200, feature_parser.PARSED_FEATURE_COUNT)).astype(np.float64)
+	averages = feature_window.moving_average(values, WINDOWS)
+	for window_idx, avg_cycles in enumerate(WINDOWS):
+		window_averages = feature_window.select_window(averages.reshape(-1, averages.shape[-1]), WINDOWS, avg_cycles)
+		assert(np.array_equal(window_averages, feature_window.moving_average(values, [avg_cycles]).reshape(-1, feature_parser.PARSED_FEATURE_COUNT)))
+
+
+
+"""
+Checks that the incremental window on consecutive blocks of samples is bit exact with the batch version
+"""
+def test_average_window_matches_moving_average():
+	values = np.random.default_rng(1).integers(0, 1000, (300, feature_parser.PARSED_FEATURE_COUNT)).astype(np.float64)
+	window = feature_window.create_window(WINDOWS)
+	blocks = [feature_window.average_window(window, values[start : end]) for start, end in [(0, 1), (1, 50), (50, 51), (51, 300)]]
+	assert(np.array_equal(np.concatenate(blocks), feature_window.moving_average(values[None], WINDOWS)[0]))
+
+
+
+"""
+Checks that the exponential moving average on consecutive blocks of samples agrees with the recurrence
+"""
+def test_average_ema_matches_recurrence():
+	half_life = 8
+	values = np.random.default_rng(2).integers(0, 1000, (500, feature_parser.PARSED_FEATURE_COUNT)).astype(np.float64)
+	ema = feature_window.create_ema(half_life)
+	averages = np.concatenate([feature_window.average_ema(ema, values[start : start + 70]) for start in range(0, len(values), 70)])
+
+	decay = 0.5 ** (1.0 / half_life)
+	expected = np.empty_like(values)
+	value = np.zeros(feature_parser.PARSED_FEATURE_COUNT)
+	for entry_idx in range(len(values)):
+		value = decay * value + (1 - decay) * values[entry_idx]
+		expected[entry_idx] = value / (1 - decay ** (entry_idx + 1))
+	assert(np.allclose(averages, expected, rtol = 1e-9))
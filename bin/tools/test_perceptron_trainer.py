@@ -0,0 +1,146 @@
+"""
+Checks the equivalences claimed by perceptron_trainer.py on synthetic datasets i.e.
+	1.) train() with block_size = 1 learns the same weights as train_weights() of the router scripts (also with weighted samples)
+	2.) train_many() learns the same weights for every dataset as train() on that dataset
+	3.) train_store() and test_store() on a (virtual) feature store are the same as train() and test() on the samples read into memory
+The shuffles are replaced by the identity for 1.) and 2.), as the trainers draw their random orders differently.
+The checks can be run via the following command
+	python3 -m pytest -q path/to/this/file
+"""
+
+import io												# Used to discard logs
+import numpy as np										# Used to generate synthetic datasets
+import pytest											# Used for fixtures
+import feature_dataset									# Used to split datasets
+import feature_parser									# Used for number of parsed features
+import feature_store									# Used to write synthetic stores
+import perceptron_trainer								# Module under test
+import perceptron_server_router_meta_merge as pipeline	# Used for train_weights()
+
+# Modes of training and early stopping ((patience, validation_ratio)) which are checked
+MODES				= [perceptron_trainer.PERCEPTRON_PLAIN, perceptron_trainer.PERCEPTRON_POCKET, perceptron_trainer.PERCEPTRON_AVERAGED]
+EARLY_STOPPINGS		= [(None, 0.0), (2, 0.0), (2, 0.25)]
+USED_IDX			= [0, 1, 4]
+EPOCHS				= 8
+LEARNING_RATE		= 0.001
+
+
+
+"""
+Generates a synthetic dataset which isn't linearly separable
+Args:
+	samples	: Number of samples
+	seed	: Seed of generator
+Rets:
+	features	: Array of shape (samples, PARSED_FEATURE_COUNT)
+	labels		: Array of annotation of every sample
+"""
+def make_dataset(samples, seed):
+	rng = np.random.default_rng(seed)
+	features = rng.integers(0, 20, (samples, feature_parser.PARSED_FEATURE_COUNT)).astype(np.float64)
+	labels = (features[:, 0] - features[:, 1] + 0.5 * features[:, 4] + rng.normal(0, 3, samples) > 5).astype(np.float64)
+	return features, labels
+
+
+
+"""
+Replaces the shuffles of both the trainers by the identity
+Args:
+	monkeypatch	: Fixture of pytest
+Rets:
+	None
+"""
+@pytest.fixture
+def identity_shuffles(monkeypatch):
+	monkeypatch.setattr(np.random, "permutation", lambda values : np.arange(values) if np.ndim(values) == 0 else np.array(values))
+	monkeypatch.setattr(pipeline, "shuffle", lambda values : None)
+
+
+
+"""
+Checks that train() with block_size = 1 learns the same weights as train_weights() in every mode, with and without weighted samples
+"""
+def test_train_matches_train_weights(identity_shuffles, monkeypatch):
+	features, labels = make_dataset(300, 0)
+	monkeypatch.setattr(pipeline, "USED_IDX", USED_IDX)
+	monkeypatch.setattr(pipeline, "EPOCHS", EPOCHS)
+	monkeypatch.setattr(pipeline, "LEARNING_RATE", LEARNING_RATE)
+	for counts in [None, np.arange(len(labels)) % 4 + 1]:
+		for mode in MODES:
+			for patience, validation_ratio in EARLY_STOPPINGS:
+				monkeypatch.setattr(pipeline, "TRAINING_MODE", mode)
+				monkeypatch.setattr(pipeline, "ENABLE_EARLY_STOPPING", patience is not None)
+				monkeypatch.setattr(pipeline, "EARLY_STOPPING_PATIENCE", patience)
+				monkeypatch.setattr(pipeline, "VALIDATION_RATIO", validation_ratio)
+				rows = feature_store.columns_to_rows(np.arange(len(labels)), features, labels)
+				bias, weights = pipeline.train_weights(rows, io.StringIO(), 0, None if counts is None else counts.tolist())
+				learnt_bias, learnt_weights, epochs = perceptron_trainer.train(features, labels, USED_IDX, EPOCHS, LEARNING_RATE, 1, counts, None, patience, pipeline.EARLY_STOPPING_DELTA, validation_ratio, mode)
+				assert(learnt_bias == pytest.approx(bias, rel = 1e-9, abs = 1e-12))
+				assert(learnt_weights == pytest.approx(weights, rel = 1e-9, abs = 1e-12))
+
+
+
+"""
+Checks that train_many() learns the same weights and runs the same epochs for every dataset as train() on that dataset.
+The datasets have different lengths (including an empty one), hence the shorter datasets are masked in the later blocks.
+"""
+def test_train_many_matches_train(identity_shuffles):
+	datasets = [make_dataset(samples, seed) for seed, samples in enumerate([120, 0, 75, 1, 200])]
+	counts = [np.arange(len(labels)) % 3 + 1 for features, labels in datasets]
+	for block_size in [1, 4, 64]:
+		for mode in MODES:
+			for patience, validation_ratio in EARLY_STOPPINGS:
+				for sample_weights in [None, counts]:
+					learnt = perceptron_trainer.train_many(datasets, USED_IDX, EPOCHS, LEARNING_RATE, block_size, sample_weights, None, patience, perceptron_trainer.EARLY_STOPPING_DELTA, validation_ratio, mode)
+					for dataset_idx, (features, labels) in enumerate(datasets):
+						bias, weights, epochs = perceptron_trainer.train(features, labels, USED_IDX, EPOCHS, LEARNING_RATE, block_size, None if sample_weights is None else sample_weights[dataset_idx], None, patience, perceptron_trainer.EARLY_STOPPING_DELTA, validation_ratio, mode)
+						assert(learnt[dataset_idx][2] == epochs)
+						assert(learnt[dataset_idx][0] == pytest.approx(bias, rel = 1e-9, abs = 1e-12))
+						assert(learnt[dataset_idx][1] == pytest.approx(weights, rel = 1e-9, abs = 1e-12))
+
+
+
+"""
+Writes a virtual store which refers to several stores with several shards each
+Args:
+	tmp_path	: Temporary directory of pytest
+Rets:
+	store_path	: Path of virtual store
+"""
+@pytest.fixture
+def virtual_store(tmp_path):
+	src_paths = []
+	for src_idx, samples in enumerate([90, 0, 130, 60]):
+		src_path = str(tmp_path / ("port_" + str(src_idx)))
+		feature_store.create(src_path)
+		for shard_idx in range(2 if samples > 0 else 0):
+			features, labels = make_dataset(samples // (shard_idx + 1), 10 * src_idx + shard_idx)
+			feature_store.append(src_path, np.arange(len(labels), dtype = np.int32), features.astype(np.int32), labels.astype(np.uint8))
+		src_paths.append(src_path)
+	store_path = str(tmp_path / "router")
+	feature_store.create(store_path)
+	feature_store.link(src_paths, store_path)
+	return store_path
+
+
+
+"""
+Checks that training and testing on blocks gathered from a store is the same as on the samples read into memory
+"""
+def test_train_store_matches_train(virtual_store, monkeypatch):
+	monkeypatch.setattr(feature_store, "MAX_MAPPED_SHARDS", 2)	# Shards are released and mapped again
+	cycles, features, labels = feature_store.read(virtual_store)
+	assert(np.array_equal(feature_store.read_column(virtual_store, "labels"), labels))
+	transform = lambda block : 0.5 * block
+	for block_size in [1, 16]:
+		for mode in MODES:
+			for patience, validation_ratio in EARLY_STOPPINGS:
+				np.random.seed(block_size)
+				test_indices, train_indices = feature_dataset.split_indices(labels, 0.8)
+				expected = perceptron_trainer.train(transform(features[train_indices]), labels[train_indices], USED_IDX, EPOCHS, LEARNING_RATE, block_size, None, None, patience, perceptron_trainer.EARLY_STOPPING_DELTA, validation_ratio, mode)
+				np.random.seed(block_size)
+				test_indices, train_indices = feature_dataset.split_indices(feature_store.read_column(virtual_store, "labels"), 0.8)
+				learnt = perceptron_trainer.train_store(virtual_store, train_indices, USED_IDX, EPOCHS, LEARNING_RATE, block_size, None, patience, perceptron_trainer.EARLY_STOPPING_DELTA, validation_ratio, mode, transform)
+				assert(learnt == expected)
+				bias, weights, epochs = learnt
+				assert(perceptron_trainer.test_store(virtual_store, test_indices, bias, weights, USED_IDX, transform) == perceptron_trainer.test(transform(features[test_indices]), labels[test_indices], bias, weights, USED_IDX))
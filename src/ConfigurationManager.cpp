@@ -442,6 +442,24 @@ void checkConfiguration()
 	exit(1);
     }
 
+    if (GlobalParams::feature_interval < 1)
+    {
+	cerr << "Error: feature_interval must be greater than 0" << endl;
+	exit(1);
+    }
+
+    if (GlobalParams::feature_format != FEATURES_FORMAT_TEXT && GlobalParams::feature_format != FEATURES_FORMAT_BIN)
+    {
+	cerr << "Error: features_format must be either " << FEATURES_FORMAT_TEXT << " or " << FEATURES_FORMAT_BIN << endl;
+	exit(1);
+    }
+
+    if (GlobalParams::feature_stream && GlobalParams::feature_file_name == NO_FEATURES)
+    {
+	cerr << "Error: -features_stream needs a feature file (-features)" << endl;
+	exit(1);
+    }
+
     if (GlobalParams::ascii_monitor)
     {
 #ifdef DEBUG
@@ -601,7 +619,9 @@ void parseCmdLine(int arg_num, char *arg_vet[])
 		GlobalParams::simulation_time = atoi(arg_vet[++i]);
 	    else if (!strcmp(arg_vet[i], "-asciimonitor")) 
 		GlobalParams::ascii_monitor = true;
-	    else if (!strcmp(arg_vet[i], "-config") || !strcmp(arg_vet[i], "-power") || !strcmp(arg_vet[i], "-features") || !strcmp(arg_vet[i], "-weights") || !strcmp(arg_vet[i], "-accuracy"))
+	    else if (!strcmp(arg_vet[i], "-features_stream"))
+		GlobalParams::feature_stream = true;
+	    else if (!strcmp(arg_vet[i], "-config") || !strcmp(arg_vet[i], "-power") || !strcmp(arg_vet[i], "-features") || !strcmp(arg_vet[i], "-feature_routers") || !strcmp(arg_vet[i], "-feature_interval") || !strcmp(arg_vet[i], "-features_format") || !strcmp(arg_vet[i], "-weights") || !strcmp(arg_vet[i], "-accuracy"))
 		// -config is managed from configure function
 		// i++ skips the configuration file name 
 		i++;
@@ -675,6 +695,37 @@ void configure(int arg_num, char *arg_vet[]) {
         }
     }
 
+    GlobalParams::feature_routers.clear();	// All the routers are exported by default
+    for (int i = 1; i < arg_num; i++) {
+        if (!strcmp(arg_vet[i], "-feature_routers")) {
+            // Comma separated list of router IDs
+            char * router_id = strtok(arg_vet[++i], ",");
+            while (router_id != NULL) {
+                GlobalParams::feature_routers.push_back(atoi(router_id));
+                router_id = strtok(NULL, ",");
+            }
+            break;
+        }
+    }
+
+    GlobalParams::feature_interval = 1;	// Every cycle is exported by default
+    for (int i = 1; i < arg_num; i++) {
+        if (!strcmp(arg_vet[i], "-feature_interval")) {
+            GlobalParams::feature_interval = atoi(arg_vet[++i]);
+            break;
+        }
+    }
+
+    GlobalParams::feature_format = FEATURES_FORMAT_TEXT;
+    for (int i = 1; i < arg_num; i++) {
+        if (!strcmp(arg_vet[i], "-features_format")) {
+            GlobalParams::feature_format = arg_vet[++i];
+            break;
+        }
+    }
+
+    GlobalParams::feature_stream = false;	// Set by parseCmdLine()
+
     GlobalParams::weights_file_name = NO_LOCALIZATION;
     for (int i = 1; i < arg_num; i++) {
         if (!strcmp(arg_vet[i], "-weights")) {
@@ -17,6 +17,20 @@ void FeatureCollector::exportFeatures()
 {
 	if(GlobalParams::feature_file_name != NO_FEATURES)
 	{
+		if(GlobalParams::feature_stream)	// Features were already written. Open the file if no feature was generated so that the reader sees the end
+		{
+			if(!stream_file.is_open())
+				openStream();
+			stream_file.close();
+			return;
+		}
+
+		if(GlobalParams::feature_format == FEATURES_FORMAT_BIN)
+		{
+			exportFeaturesBinary();
+			return;
+		}
+
 		ofstream feature_file;
 		feature_file.open(GlobalParams::feature_file_name, ios::out | ios::trunc);	// Open a file to write data to
 
@@ -30,4 +44,54 @@ void FeatureCollector::exportFeatures()
 
 		feature_file.close();
 	}
-}
\ No newline at end of file
+}
+
+
+void FeatureCollector::exportFeaturesBinary()
+{
+	ofstream feature_file;
+	feature_file.open(GlobalParams::feature_file_name, ios::out | ios::trunc | ios::binary);	// Open a file to write data to
+
+	writeBinaryHeader(feature_file);
+
+	// Write records
+	map < int, vector < Feature_t > > :: iterator it = features.begin();
+	for(it = features.begin(); it != features.end(); it++)
+		for(Feature_t &f: it->second)
+			f.write(feature_file);
+
+	feature_file.close();
+}
+
+
+void FeatureCollector::writeBinaryHeader(ostream &os)
+{
+	os.write(FEATURES_MAGIC, 4);
+	write_int32(os, FEATURES_VERSION);
+	write_int32(os, GlobalParams::mesh_dim_x);
+	write_int32(os, GlobalParams::mesh_dim_y);
+	write_int32(os, GlobalParams::n_virtual_channels);
+	write_int32(os, TOTAL_DIRECTIONS);
+	write_int32(os, PORT_FEATURE_COUNT);
+	write_int32(os, 2 + TOTAL_DIRECTIONS * GlobalParams::n_virtual_channels * PORT_FEATURE_COUNT);
+}
+
+
+void FeatureCollector::openStream()
+{
+	stream_file.open(GlobalParams::feature_file_name, ios::out | ios::trunc | ios::binary);
+	if(GlobalParams::feature_format == FEATURES_FORMAT_BIN)
+		writeBinaryHeader(stream_file);
+}
+
+
+void FeatureCollector::streamFeature(Feature_t &f)
+{
+	if(!stream_file.is_open())
+		openStream();
+
+	if(GlobalParams::feature_format == FEATURES_FORMAT_BIN)
+		f.write(stream_file);
+	else
+		stream_file << f.print();
+}
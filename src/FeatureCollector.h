@@ -11,6 +11,28 @@ using namespace std;
 
 #define CYCLES_SINCE_LAST_FLIT_INITIAL 1000 // currently set as reset cycles
 
+/*
+Binary feature file (-features_format bin) has a header followed by fixed size records.
+Every value is a little endian 32 bit integer.
+Header: FEATURES_MAGIC, FEATURES_VERSION, dim_x, dim_y, virtual channels, TOTAL_DIRECTIONS, PORT_FEATURE_COUNT, fields per record
+Record: local_id, cycle, then PORT_FEATURE_COUNT fields for every VC of every port in the same order as print()
+In streaming mode (-features_stream) records are written cycle by cycle instead of router by router.
+*/
+#define FEATURES_MAGIC		"NXFB"
+#define FEATURES_VERSION	1
+#define PORT_FEATURE_COUNT	6	// Number of features of a VC of a port
+
+/*
+Writes a 32 bit integer in little endian order
+*/
+inline void write_int32(ostream &os, int value)
+{
+	char bytes[4];
+	for(int i = 0; i < 4; i++)
+		bytes[i] = (char)(((unsigned int)value >> (8 * i)) & 0xFF);
+	os.write(bytes, 4);
+}
+
 /*
 port_feature_t contains data for an particualar port of a particular router at a particular cycle.
 Different VCs can be accessed by different indexes of vector. 
@@ -69,6 +91,19 @@ typedef struct port_feature
 		}
 		return op;
 	}
+
+	void write(ostream &os)
+	{
+		for(int i = 0; i < GlobalParams::n_virtual_channels; i++)
+		{
+			write_int32(os, buffer_capacity[i]);
+			write_int32(os, buffer_status[i]);
+			write_int32(os, cycles_since_last_flit[i]);
+			write_int32(os, stalled_flits[i]);
+			write_int32(os, transmitted_flits[i]);
+			write_int32(os, cumulative_latency[i]);
+		}
+	}
 } port_feature_t;
 
 /*
@@ -106,6 +141,14 @@ typedef struct Feature
 		return info + "\n";
 	} 
 
+	void write(ostream &os)
+	{
+		write_int32(os, local_id);
+		write_int32(os, cycle);
+		for(int i = 0; i < TOTAL_DIRECTIONS; i++)
+			data[i].write(os);
+	}
+
 } Feature_t;
 
 
@@ -117,6 +160,16 @@ class FeatureCollector
 
 		void exportFeatures();	// TODO: exports features to text files
 
+		void exportFeaturesBinary();	// Exports features to a binary file
+
+		void writeBinaryHeader(ostream &os);	// Writes the header of binary feature file
+
+		void streamFeature(Feature_t &f);	// Writes a feature to the feature file (Used in streaming mode)
+
+		void openStream();	// Opens the feature file for streaming. It blocks till a reader opens the file if it's a FIFO
+
+		ofstream stream_file;	// Feature file used in streaming mode
+
 		map < int, vector < Feature_t > > features; // Map between local_id of router and its features.
 };
 
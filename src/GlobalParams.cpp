@@ -62,4 +62,8 @@ bool GlobalParams::ascii_monitor;
 int GlobalParams::channel_selection;
 string GlobalParams::weights_file_name;
 string GlobalParams::feature_file_name;
+vector<int> GlobalParams::feature_routers;
+int GlobalParams::feature_interval;
+string GlobalParams::feature_format;
+bool GlobalParams::feature_stream;
 string GlobalParams::accuracy_op_file_name;
\ No newline at end of file
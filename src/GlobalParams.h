@@ -103,6 +103,10 @@ using namespace std;
 #define NO_LOCALIZATION     "NO_LOCALIZATION"
 #define NO_ACCURACY_OP      "NO_ACCURACY_OP"
 
+// Formats of feature file
+#define FEATURES_FORMAT_TEXT    "text"
+#define FEATURES_FORMAT_BIN     "bin"
+
 typedef struct {
 	pair<double, double> ber;
 	int dataRate;
@@ -200,6 +204,10 @@ struct GlobalParams {
 	static int channel_selection;
 	static string weights_file_name;
 	static string feature_file_name;
+	static vector<int> feature_routers;	// Routers whose features are exported. Empty if all the routers are exported
+	static int feature_interval;	// Features are exported every feature_interval cycles
+	static string feature_format;	// Format of feature file i.e FEATURES_FORMAT_TEXT or FEATURES_FORMAT_BIN
+	static bool feature_stream;	// If true, features are written as soon as they are generated (Cycle by cycle)
 	static string accuracy_op_file_name;
 };
 
@@ -360,7 +360,16 @@ void Router::write_features()
 			current_features.data[DIRECTION_LOCAL+1].cycles_since_last_flit[vc] = pe->get_cycles_since_last_flit(vc);
 		}
 
-		// Store the features
+		// Store the features only for the exported routers and cycles
+		if(GlobalParams::feature_routers.size() > 0 && find(GlobalParams::feature_routers.begin(), GlobalParams::feature_routers.end(), local_id) == GlobalParams::feature_routers.end())
+			return;
+		if(current_features.cycle % GlobalParams::feature_interval != 0)
+			return;
+		if(GlobalParams::feature_stream)	// Write the features right away instead of storing them
+		{
+			fc->streamFeature(current_features);
+			return;
+		}
 		if(fc->features.find(local_id) == fc->features.end())   // First time insertion
 		{
 			vector < Feature_t > f_vect{current_features};